@@ -4,6 +4,8 @@ import os
 from typing import Dict, Any
 from src.rag import InsuranceRAGSystem
 from src.utils.config import get_config, DEBUG_MODE
+from src.utils.metrics import metrics
+from src.utils.chat_history import ChatHistory
 
 # 페이지 설정
 st.set_page_config(
@@ -120,9 +122,14 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# 세션 상태 초기화
-if 'messages' not in st.session_state:
-    st.session_state.messages = []
+config = get_config()
+
+# 세션 상태 초기화 (링 버퍼 대화 기록; 참고자료 본문은 청크 ID로 참조)
+if 'chat_history' not in st.session_state:
+    st.session_state.chat_history = ChatHistory(max_messages=config["chat_history_max_messages"])
+
+if 'history_pages' not in st.session_state:
+    st.session_state.history_pages = 1
 
 if 'rag_system' not in st.session_state:
     with st.spinner("🔧 RAG 시스템을 초기화하는 중..."):
@@ -133,6 +140,22 @@ if 'rag_system' not in st.session_state:
             st.error(f"❌ RAG 시스템 초기화 실패: {e}")
             st.stop()
 
+chat_history = st.session_state.chat_history
+
+# 캐시에서 밀려난 참고자료 본문은 로컬 청크 저장소에서 (네임스페이스, 청크 ID)로 다시 읽어옵니다.
+if chat_history.content_loader is None and getattr(st.session_state.rag_system, 'content_store', None) is not None:
+    rag_system = st.session_state.rag_system
+    
+    def _load_content(chunk_id, namespace):
+        # 저장소가 다시 읽혔을 수 있으므로 호출할 때의 저장소를 사용합니다.
+        content_store = rag_system.content_store
+        if content_store is None:
+            return None
+        position = content_store.position(chunk_id, namespace)
+        return content_store.text(position) if position is not None else None
+    
+    chat_history.content_loader = _load_content
+
 # 메인 헤더
 st.markdown('<h1 class="main-header">🏠 LIG 보험 약관 챗봇</h1>', unsafe_allow_html=True)
 
@@ -171,7 +194,8 @@ with st.sidebar:
         )
     
     if st.button("🗑️ 채팅 기록 지우기"):
-        st.session_state.messages = []
+        chat_history.clear()
+        st.session_state.history_pages = 1
         st.rerun()
 
 # 메인 콘텐츠 영역
@@ -184,7 +208,21 @@ with col1:
     chat_container = st.container()
     
     with chat_container:
-        for message in st.session_state.messages:
+        # 최근 페이지만 렌더링하여 대화가 길어져도 rerun 비용을 일정하게 유지
+        page_size = config["chat_history_page_size"]
+        visible_messages = chat_history.visible(page_size, st.session_state.history_pages)
+        
+        if len(visible_messages) < len(chat_history):
+            hidden = len(chat_history) - len(visible_messages)
+            if st.button(f"⬆️ 이전 대화 더 보기 ({hidden}개 숨김)", key="load_older"):
+                # 전체 기록을 보여주는 데 필요한 페이지 수를 넘지 않도록 제한
+                st.session_state.history_pages = min(st.session_state.history_pages + 1,
+                                                     -(-len(chat_history) // page_size))
+                st.rerun()
+        if chat_history.dropped:
+            st.caption(f"오래된 메시지 {chat_history.dropped}개는 기록 한도({config['chat_history_max_messages']}개)를 넘어 삭제되었습니다.")
+        
+        for message in visible_messages:
             if message["role"] == "user":
                 st.markdown(f'<div class="user-message">👤 {message["content"]}</div>', unsafe_allow_html=True)
             else:
@@ -194,12 +232,21 @@ with col1:
                 if "sources" in message:
                     with st.expander("📚 참고 자료 보기", expanded=False):
                         for i, source in enumerate(message["sources"], 1):
+                            # 쪽 범위와 조항 (메타데이터가 있는 저장본만)
+                            location = ""
+                            if source.get("page_start"):
+                                pages = source["page_start"] if source["page_start"] == source["page_end"] else f"{source['page_start']}-{source['page_end']}"
+                                location += f", {pages}쪽"
+                            if source.get("articles"):
+                                location += f", {' '.join(source['articles'])}"
+                            if source.get("references"):
+                                location += f", 같은 내용 {len(source['references'])}곳 더"
                             st.markdown(f"""
                             <div class="source-box">
                                 <strong style="color: #2E5CFF;">📄 참고자료 {i}</strong>
-                                <span style="font-size: 0.8rem; opacity: 0.7;">(점수: {source['score']:.3f}, 청크: {source['chunk_index']})</span>
+                                <span style="font-size: 0.8rem; opacity: 0.7;">(점수: {source['score']:.3f}, 청크: {source['chunk_index']}{location})</span>
                                 <hr style="margin: 8px 0; opacity: 0.3;">
-                                <div style="line-height: 1.5;">{source['content']}</div>
+                                <div style="line-height: 1.5;">{chat_history.source_content(source['id'], source.get('namespace'))}</div>
                             </div>
                             """, unsafe_allow_html=True)
 
@@ -243,8 +290,9 @@ debug_mode = st.sidebar.checkbox("🐛 디버그 모드", value=DEBUG_MODE)
 
 # 메시지 처리
 if submit_button and user_input.strip():
-    # 사용자 메시지 추가
-    st.session_state.messages.append({"role": "user", "content": user_input})
+    # 사용자 메시지 추가 (새 대화가 시작되면 펼친 이전 대화는 다시 접음)
+    chat_history.add_user(user_input)
+    st.session_state.history_pages = 1
     
     # 답변 생성
     with st.spinner("🔍 보험 약관을 검색하고 답변을 생성하는 중..."):
@@ -254,26 +302,29 @@ if submit_button and user_input.strip():
             
             result = st.session_state.rag_system.ask(user_input, use_langchain=use_langchain)
             
-            # 디버그 모드용 검색 결과 저장
+            # 디버그 모드용 검색 결과 저장 (본문 없이 청크 ID 참조만)
             if debug_mode:
-                st.session_state.last_search_results = result.get("sources", [])
+                st.session_state.last_search_results = chat_history.to_refs(result.get("sources", []))
                 st.session_state.last_query = user_input
                 st.session_state.last_answer_length = len(result["answer"])
                 st.session_state.last_langchain_used = result.get("langchain_used", False)
             
             # 봇 메시지 추가
-            bot_message = {
-                "role": "assistant", 
-                "content": result["answer"],
-                "sources": result["sources"],
-                "langchain_used": result.get("langchain_used", False)
-            }
-            st.session_state.messages.append(bot_message)
+            chat_history.add_assistant(
+                result["answer"],
+                sources=result["sources"],
+                langchain_used=result.get("langchain_used", False)
+            )
+            
+            if result.get("timed_out"):
+                st.warning("⏱️ 응답 시간이 초과되어 검색된 약관 내용으로 대신 답변했습니다.")
             
             # 디버그 정보 출력 (메인 화면에)
             if debug_mode:
                 langchain_status = "LangChain" if result.get("langchain_used", False) else "OpenAI API"
-                st.success(f"✅ 답변 생성 완료: {len(result['sources'])}개 참고자료, {len(result['answer'])}자 답변 ({langchain_status})")
+                usage = result.get("usage") or {}
+                token_info = f", 토큰 {usage['total_tokens']}개 (캐시 {usage['cached_tokens']}개)" if usage else ""
+                st.success(f"✅ 답변 생성 완료: {len(result['sources'])}개 참고자료, {len(result['answer'])}자 답변 ({langchain_status}{token_info})")
             
         except Exception as e:
             st.error(f"❌ 오류가 발생했습니다: {e}")
@@ -284,10 +335,7 @@ if submit_button and user_input.strip():
                 st.error("상세 오류 정보:")
                 st.code(traceback.format_exc())
             
-            st.session_state.messages.append({
-                "role": "assistant", 
-                "content": "죄송합니다. 시스템에 오류가 발생했습니다. 잠시 후 다시 시도해주세요."
-            })
+            chat_history.add_assistant("죄송합니다. 시스템에 오류가 발생했습니다. 잠시 후 다시 시도해주세요.")
     
     st.rerun()
 
@@ -313,17 +361,19 @@ if debug_mode:
         
         # 기본 상태 정보
         rag_info["시스템_초기화"] = "정상" if 'rag_system' in st.session_state else "실패"
-        rag_info["총_메시지_수"] = len(st.session_state.messages)
+        history_stats = chat_history.stats()
+        rag_info["총_메시지_수"] = history_stats["messages"]
+        rag_info["삭제된_메시지_수"] = history_stats["dropped"]
+        rag_info["캐시된_참고자료_본문_수"] = history_stats["cached_contents"]
         
         # 최근 질문/답변 정보
-        if st.session_state.messages:
-            user_messages = [msg for msg in st.session_state.messages if msg["role"] == "user"]
-            assistant_messages = [msg for msg in st.session_state.messages if msg["role"] == "assistant"]
-            rag_info["사용자_질문_수"] = len(user_messages)
-            rag_info["봇_응답_수"] = len(assistant_messages)
+        if chat_history:
+            rag_info["사용자_질문_수"] = history_stats["user"]
+            rag_info["봇_응답_수"] = history_stats["assistant"]
             
-            if user_messages:
-                rag_info["마지막_질문"] = user_messages[-1]["content"][:50] + "..."
+            last_user_message = chat_history.last("user")
+            if last_user_message:
+                rag_info["마지막_질문"] = last_user_message["content"][:50] + "..."
         
         # 검색 관련 정보
         if hasattr(st.session_state, 'last_search_results'):
@@ -340,6 +390,19 @@ if debug_mode:
         if hasattr(st.session_state, 'last_langchain_used'):
             rag_info["마지막_LangChain_사용"] = st.session_state.last_langchain_used
         
+        # 동일 질문 병합 정보
+        ask_calls = int(metrics.get("ask.calls"))
+        if ask_calls:
+            rag_info["요청_병합_비율"] = f"{metrics.ratio('ask.coalesced', 'ask.calls'):.1%} ({int(metrics.get('ask.coalesced'))}/{ask_calls})"
+        
+        # 점수 게이트 정보 (LLM 호출 생략 횟수)
+        if ask_calls:
+            rag_info["점수_게이트"] = {
+                "낮은_점수": int(metrics.get("ask.gate_low_score")),
+                "미리_계산된_답변": int(metrics.get("ask.gate_precomputed")),
+                "LLM_생성": int(metrics.get("ask.generated")),
+            }
+        
         # 네임스페이스 정보 (Pinecone)
         if 'rag_system' in st.session_state:
             try:
@@ -377,12 +440,14 @@ if debug_mode:
                     st.sidebar.write(f"**ID:** {result.get('id', 'N/A')}")
                     st.sidebar.write(f"**청크 인덱스:** {result.get('chunk_index', 'N/A')}")
                     st.sidebar.write(f"**소스:** {result.get('source', 'N/A')}")
-                    st.sidebar.write(f"**내용 (처음 200자):** {result.get('content', '')[:200]}...")
+                    st.sidebar.write(f"**문서 / 쪽:** {result.get('doc_id') or 'N/A'} / {result.get('page_start', 'N/A')}-{result.get('page_end', 'N/A')}")
+                    st.sidebar.write(f"**조항:** {', '.join(result.get('articles', [])) or 'N/A'}")
+                    st.sidebar.write(f"**내용 (처음 200자):** {chat_history.source_content(result.get('id', ''), result.get('namespace'))[:200]}...")
     
     # 최근 대화 이력
     with st.sidebar.expander("💬 최근 대화 요약"):
-        if st.session_state.messages:
-            recent_messages = st.session_state.messages[-6:]  # 최근 6개만
+        if chat_history:
+            recent_messages = chat_history.recent(6)  # 최근 6개만
             for i, msg in enumerate(recent_messages):
                 role_icon = "👤" if msg["role"] == "user" else "🤖"
                 content_preview = msg["content"][:100] + "..." if len(msg["content"]) > 100 else msg["content"]
@@ -392,14 +457,20 @@ if debug_mode:
         else:
             st.sidebar.write("아직 대화가 없습니다.")
     
-    # 필터링된 세션 상태 (UI 관련 제외)
+    # 필터링된 세션 상태 (UI 관련 제외; 큰 객체는 직렬화하지 않고 타입만 표시)
     with st.sidebar.expander("🔧 기술적 세션 정보"):
-        filtered_session = {
-            key: str(value)[:100] + "..." if len(str(value)) > 100 else value
-            for key, value in st.session_state.items()
-            if not key.startswith(('example_', 'FormSubmitter:')) and 
-               key not in ['rag_system', 'messages', 'user_input']
-        }
+        filtered_session = {}
+        for key, value in st.session_state.items():
+            if key.startswith(('example_', 'FormSubmitter:')) or key in ['rag_system', 'chat_history', 'user_input']:
+                continue
+            if isinstance(value, (bool, int, float)):
+                filtered_session[key] = value
+            elif isinstance(value, str):
+                filtered_session[key] = value[:100] + "..." if len(value) > 100 else value
+            elif isinstance(value, (list, tuple, dict)):
+                filtered_session[key] = f"{type(value).__name__}({len(value)})"
+            else:
+                filtered_session[key] = type(value).__name__
         if filtered_session:
             st.sidebar.json(filtered_session)
         else:
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Load Test Script
+부하 테스트 스크립트
+
+사용법:
+    python loadtest.py QUESTIONS [--qps QPS | --concurrency N] [--duration SECONDS | --requests N]
+                       [--url URL | --fake ...] [--output REPORT.json]
+
+예시:
+    # 로컬 가짜 Pinecone/OpenAI로 초당 20개 질문 (포아송 도착) 60초
+    python loadtest.py ./docs/faq_questions.txt --qps 20 --duration 60 --fake \\
+        --fake-search-latency lognormal:0.05,0.5 --fake-llm-latency lognormal:0.8,0.4
+
+    # 실행 중인 HTTP 서비스에 동시 사용자 16명으로 500개 요청
+    python loadtest.py traffic.jsonl --concurrency 16 --requests 500 --url http://127.0.0.1:8000
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# 프로젝트 루트를 Python 경로에 추가
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from src.service.loadtest import LoadTest, format_report, http_target, load_questions, system_target
+from src.utils.config import validate_config
+
+
+def parse_args():
+    """명령행 인자를 파싱합니다."""
+    parser = argparse.ArgumentParser(description="보험 약관 RAG 부하 테스트 (기록된 질문 재생)")
+    parser.add_argument("questions", help="질문 파일 (JSONL 또는 한 줄에 한 질문)")
+    rate = parser.add_mutually_exclusive_group(required=True)
+    rate.add_argument("--qps", type=float, help="open-loop 목표 초당 요청 수 (포아송 도착)")
+    rate.add_argument("--concurrency", type=int, help="closed-loop 동시 사용자 수")
+    parser.add_argument("--duration", type=float, help="실행 시간(초)")
+    parser.add_argument("--requests", type=int, help="보낼 요청 수 (--duration이 없으면 필수)")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="open-loop 최대 동시 요청 수")
+    parser.add_argument("--shuffle", action="store_true", help="질문 순서를 섞습니다")
+    parser.add_argument("--seed", type=int, help="도착 간격/질문 순서/장애 주입 난수 시드")
+    parser.add_argument("--url", help="HTTP 서비스 주소 (없으면 같은 프로세스에서 InsuranceRAGSystem.ask 호출)")
+    parser.add_argument("--timeout", type=float, help="요청별 ask() 마감 시간(초)")
+    parser.add_argument("--use-langchain", action="store_true", help="LangChain 경로로 답변 생성")
+    parser.add_argument("--no-precomputed", action="store_true", help="FAQ/미리 계산된 답변을 사용하지 않습니다")
+    parser.add_argument("--fake", action="store_true", help="로컬 가짜 Pinecone/OpenAI 사용 (--url 없을 때)")
+    parser.add_argument("--fake-search-latency", default="0.05", help="가짜 검색 지연(초) 또는 분포 (예: lognormal:0.05,0.5)")
+    parser.add_argument("--fake-llm-latency", default="0.5", help="가짜 답변 생성 지연(초) 또는 분포 (예: lognormal:0.5,0.4)")
+    parser.add_argument("--fake-error-rate", type=float, default=0.0, help="가짜 서비스 429 오류 비율")
+    parser.add_argument("--fake-timeout-rate", type=float, default=0.0, help="가짜 서비스 타임아웃 비율")
+    parser.add_argument("--output", help="보고서를 JSON으로 저장할 경로")
+    args = parser.parse_args()
+    if args.duration is None and args.requests is None:
+        parser.error("--duration 또는 --requests가 필요합니다.")
+    return args
+
+
+def main():
+    """메인 함수"""
+    args = parse_args()
+    questions = load_questions(args.questions)
+    print(f"📝 질문 {len(questions)}개 로드: {args.questions}")
+
+    options = {"use_langchain": args.use_langchain}
+    if args.timeout is not None:
+        options["timeout"] = args.timeout
+
+    if args.url:
+        if args.no_precomputed:
+            print("⚠️ --no-precomputed는 HTTP 대상에는 적용되지 않습니다.")
+        target = http_target(args.url, **options)
+        print(f"🎯 대상: {args.url}")
+    else:
+        if args.fake:
+            from src.rag.fakes import build_fake_system
+            system = build_fake_system(
+                search_latency=args.fake_search_latency,
+                llm_latency=args.fake_llm_latency,
+                error_rate=args.fake_error_rate,
+                timeout_rate=args.fake_timeout_rate,
+                seed=args.seed,
+            )
+        else:
+            validate_config()
+            from src.rag import InsuranceRAGSystem
+            system = InsuranceRAGSystem()
+        if args.no_precomputed:
+            options["use_precomputed"] = False
+        target = system_target(system, **options)
+        print(f"🎯 대상: InsuranceRAGSystem.ask ({'가짜 서비스' if args.fake else '실제 서비스'})")
+
+    load_test = LoadTest(target, questions, shuffle=args.shuffle, seed=args.seed)
+    if args.qps is not None:
+        report = load_test.run_open_loop(args.qps, duration=args.duration, requests=args.requests,
+                                         max_in_flight=args.max_in_flight)
+    else:
+        report = load_test.run_closed_loop(args.concurrency, duration=args.duration, requests=args.requests)
+
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 보고서 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+HTTP Query Service
+HTTP 질의 서비스 실행 스크립트
+
+사용법:
+    python serve.py [--host HOST] [--port PORT] [--workers N] [--fake]
+
+예시:
+    python serve.py --workers 4
+    python serve.py --fake --fake-llm-latency 0.8      # 로컬 가짜 Pinecone/OpenAI로 실행
+
+    curl -s localhost:8000/ask -d '{"question": "청약을 철회할 수 있나요?"}'
+    curl -sN localhost:8000/ask/stream -d '{"question": "보험금은 언제 지급되나요?"}'
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# 프로젝트 루트를 Python 경로에 추가
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.config import get_config, validate_config
+
+
+def parse_args():
+    config = get_config()
+    parser = argparse.ArgumentParser(description="보험 약관 RAG HTTP 질의 서비스")
+    parser.add_argument("--host", default=config["service_host"], help="바인드 주소")
+    parser.add_argument("--port", type=int, default=config["service_port"], help="포트")
+    parser.add_argument("--workers", type=int, default=config["service_workers"], help="워커 프로세스 수")
+    parser.add_argument("--fake", action="store_true", help="로컬 가짜 Pinecone/OpenAI 사용")
+    parser.add_argument("--fake-search-latency", default="0.05", help="가짜 검색 지연(초) 또는 분포 (예: lognormal:0.05,0.5)")
+    parser.add_argument("--fake-llm-latency", default="0.5", help="가짜 답변 생성 지연(초) 또는 분포 (예: lognormal:0.5,0.4)")
+    parser.add_argument("--fake-error-rate", type=float, default=0.0, help="가짜 서비스 429 오류 비율")
+    parser.add_argument("--fake-timeout-rate", type=float, default=0.0, help="가짜 서비스 타임아웃 비율")
+    return parser.parse_args()
+
+
+def main():
+    """메인 함수"""
+    args = parse_args()
+
+    # 엔진(Pinecone/OpenAI 클라이언트)은 fork 뒤에 각 워커에서 만듭니다.
+    if args.fake:
+        from src.rag.fakes import build_fake_system
+
+        def system_factory():
+            return build_fake_system(
+                search_latency=args.fake_search_latency,
+                llm_latency=args.fake_llm_latency,
+                error_rate=args.fake_error_rate,
+                timeout_rate=args.fake_timeout_rate,
+            )
+    else:
+        validate_config()
+        from src.rag import InsuranceRAGSystem
+        system_factory = InsuranceRAGSystem
+
+    from src.service import serve
+    serve(system_factory, host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,9 @@ Data Processing Module
 """
 
 from .ingestion import ingest_pdf_to_pinecone
-from .uploader import upload_to_pinecone
+from .uploader import delete_from_pinecone, list_chunk_ids, upload_to_pinecone, wait_for_namespace_count
+from .chunk_store import ChunkCorpus
+from .inverted_index import InvertedIndex
 
-__all__ = ["ingest_pdf_to_pinecone", "upload_to_pinecone"]
+__all__ = ["ingest_pdf_to_pinecone", "upload_to_pinecone", "delete_from_pinecone", "list_chunk_ids",
+           "wait_for_namespace_count", "ChunkCorpus", "InvertedIndex"]
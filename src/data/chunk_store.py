@@ -0,0 +1,442 @@
+"""
+Columnar Chunk Store
+컬럼형 청크 저장소 모듈
+
+청크 텍스트는 하나의 연속 UTF-8 버퍼와 오프셋 배열로, 메타데이터는 정수 배열로
+보관합니다. 레코드 딕셔너리는 업로드/검색 경계에서 필요할 때만 생성합니다.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import sys
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 저장 파일 레이아웃
+META_FILE = "meta.json"
+FORMAT_VERSION = 1
+
+# 정수 컬럼 (모두 int64; page_start/page_end는 1부터 시작하는 쪽 번호, 0이면 정보 없음)
+INT_COLUMNS = ("chunk_index", "chunk_size", "source_id", "page_start", "page_end")
+# 문자열 컬럼 (버퍼 + 오프셋; articles는 조항 목록을 ARTICLE_SEPARATOR로 이은 값,
+# references는 중복 제거로 합쳐진 다른 위치 목록의 JSON, namespace는 업로드한 Pinecone 네임스페이스)
+STRING_COLUMNS = ("text", "id", "doc_id", "articles", "references", "namespace")
+
+ARTICLE_SEPARATOR = "|"
+
+DEFAULT_SOURCE = "보험약관"
+DEFAULT_NAMESPACE = "default"
+
+
+class StringColumn:
+    """연속된 UTF-8 버퍼와 오프셋 배열로 문자열 목록을 보관합니다."""
+
+    def __init__(self, buffer, offsets: Sequence[int]):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, values: Sequence[str]) -> "StringColumn":
+        """문자열 목록으로 컬럼을 만듭니다."""
+        offsets = array("q", [0])
+        parts = []
+        position = 0
+        for value in values:
+            encoded = value.encode("utf-8")
+            parts.append(encoded)
+            position += len(encoded)
+            offsets.append(position)
+        return cls(b"".join(parts), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return str(self.buffer[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buffer) + len(self.offsets) * 8
+
+
+def to_upsert_record(chunk_id: str, text: str, metadata: Dict) -> Dict:
+    """청크 하나를 Pinecone upsert_records 형태로 만듭니다 (metadata는 바꾸지 않음)."""
+    record = {"id": chunk_id, "text": text}
+    record.update(metadata)
+    # 네임스페이스는 업로드 대상 자체이므로 메타데이터로 저장하지 않습니다.
+    record.pop("namespace", None)
+    if "references" in record:
+        # Pinecone 메타데이터는 문자열 목록만 허용하므로 참조는 ID 목록으로 저장합니다.
+        record["reference_ids"] = [ref["id"] for ref in record.pop("references")]
+    for key in ("articles", "doc_ids", "reference_ids"):
+        if key in record and not record[key]:
+            # Pinecone 메타데이터에는 빈 목록을 저장하지 않습니다.
+            del record[key]
+    return record
+
+
+class ChunkCorpus:
+    """컬럼형 청크 코퍼스
+
+    `len()`, 인덱싱, 순회를 지원하므로 기존 레코드 리스트 자리에 그대로 쓸 수 있으며,
+    레코드 딕셔너리는 접근 시점에만 만들어집니다.
+    """
+
+    def __init__(self, columns: Dict[str, StringColumn], ints: Dict[str, Sequence[int]],
+                 sources: List[str], _mmaps: Optional[List[mmap.mmap]] = None, _fingerprint: Optional[str] = None):
+        self.columns = columns
+        self.ints = ints
+        self.sources = sources
+        self._mmaps = _mmaps or []
+        self._fingerprint = _fingerprint
+        self._positions: Optional[Dict] = None
+        self._namespace_positions: Dict[Tuple[str, ...], Optional[frozenset]] = {}
+
+    @classmethod
+    def from_chunks(cls, chunks: Sequence[str], source: str = DEFAULT_SOURCE,
+                    id_prefix: str = "chunk_", doc_id: Optional[str] = None,
+                    pages: Optional[Sequence[Tuple[int, int]]] = None,
+                    articles: Optional[Sequence[Sequence[str]]] = None) -> "ChunkCorpus":
+        """청크 문자열 목록으로 코퍼스를 만듭니다.
+
+        doc_id, pages(청크별 (시작 쪽, 끝 쪽)), articles(청크별 조항 목록)를 주면
+        해당 메타데이터 컬럼도 함께 만듭니다.
+        """
+        columns = {
+            "text": StringColumn.from_strings(chunks),
+            "id": StringColumn.from_strings([f"{id_prefix}{i}" for i in range(len(chunks))]),
+        }
+        ints = {
+            "chunk_index": array("q", range(len(chunks))),
+            "chunk_size": array("q", (len(chunk) for chunk in chunks)),
+            "source_id": array("q", [0]) * len(chunks),
+        }
+        if doc_id is not None:
+            columns["doc_id"] = StringColumn.from_strings([doc_id] * len(chunks))
+        if pages is not None:
+            ints["page_start"] = array("q", (start for start, _ in pages))
+            ints["page_end"] = array("q", (end for _, end in pages))
+        if articles is not None:
+            columns["articles"] = StringColumn.from_strings(
+                [ARTICLE_SEPARATOR.join(chunk_articles) for chunk_articles in articles])
+        return cls(columns, ints, [source])
+
+    @classmethod
+    def concat(cls, corpora: Sequence["ChunkCorpus"]) -> "ChunkCorpus":
+        """여러 코퍼스(문서)를 하나로 합칩니다.
+
+        일부 코퍼스에만 있는 컬럼은 나머지 코퍼스의 청크를 빈 값(문자열 "", 정수 0)으로 채웁니다.
+        namespace 컬럼은 빈 값 대신 DEFAULT_NAMESPACE로 채웁니다.
+        """
+        corpora = [corpus for corpus in corpora if len(corpus)]
+        if not corpora:
+            return cls.from_chunks([])
+        if len(corpora) == 1:
+            return corpora[0]
+
+        string_names = list(dict.fromkeys(name for corpus in corpora for name in corpus.columns))
+        int_names = list(dict.fromkeys(name for corpus in corpora for name in corpus.ints))
+
+        sources: List[str] = []
+        columns = {}
+        for name in string_names:
+            missing = DEFAULT_NAMESPACE if name == "namespace" else ""
+            columns[name] = StringColumn.from_strings(
+                [corpus.columns[name][i] if name in corpus.columns else missing
+                 for corpus in corpora for i in range(len(corpus))])
+        ints = {name: array("q") for name in int_names}
+        for corpus in corpora:
+            source_ids = []
+            for source in corpus.sources:
+                if source not in sources:
+                    sources.append(source)
+                source_ids.append(sources.index(source))
+            for name in int_names:
+                if name not in corpus.ints:
+                    ints[name].extend([0] * len(corpus))
+                elif name == "source_id":
+                    ints[name].extend(source_ids[value] for value in corpus.ints[name])
+                else:
+                    ints[name].extend(corpus.ints[name])
+        return cls(columns, ints, sources)
+
+    def with_namespace(self, namespace: str) -> "ChunkCorpus":
+        """모든 청크의 namespace 컬럼을 namespace로 채운 코퍼스를 반환합니다 (다른 컬럼은 공유)."""
+        columns = dict(self.columns)
+        columns["namespace"] = StringColumn.from_strings([namespace] * len(self))
+        return ChunkCorpus(columns, dict(self.ints), list(self.sources))
+
+    @classmethod
+    def replace_namespace(cls, store: Optional["ChunkCorpus"], corpus: "ChunkCorpus",
+                          namespace: str) -> "ChunkCorpus":
+        """저장소(store)에서 namespace의 청크를 corpus로 바꾼 새 코퍼스를 반환합니다.
+
+        다른 네임스페이스의 청크는 그대로 유지하므로, 네임스페이스별로 나눠 업로드해도 로컬
+        저장소와 역색인은 모든 네임스페이스를 담습니다. namespace 컬럼이 없는 이전 저장본의
+        청크는 DEFAULT_NAMESPACE로 봅니다.
+        """
+        if store is None or not len(store):
+            return corpus.with_namespace(namespace)
+        kept = [i for i in range(len(store)) if store.namespace(i) != namespace]
+        return cls.concat([store.take(kept).with_namespace_column(), corpus.with_namespace(namespace)])
+
+    def with_namespace_column(self) -> "ChunkCorpus":
+        """namespace 컬럼이 없으면 DEFAULT_NAMESPACE로 채운 코퍼스를, 있으면 자신을 반환합니다."""
+        return self if "namespace" in self.columns else self.with_namespace(DEFAULT_NAMESPACE)
+
+    def take(self, positions: Sequence[int]) -> "ChunkCorpus":
+        """지정한 위치의 청크만 골라 새 코퍼스를 만듭니다 (ID와 메타데이터 유지)."""
+        columns = {name: StringColumn.from_strings([column[i] for i in positions])
+                   for name, column in self.columns.items()}
+        ints = {name: array("q", (values[i] for i in positions)) for name, values in self.ints.items()}
+        return ChunkCorpus(columns, ints, list(self.sources))
+
+    # ------------------------------------------------------------------
+    # 조회
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.columns["id"])
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.record(i) for i in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("청크 인덱스가 범위를 벗어났습니다.")
+        return self.record(key)
+
+    def chunk_id(self, i: int) -> str:
+        return self.columns["id"][i]
+
+    def namespace(self, i: int) -> str:
+        """i번째 청크를 업로드한 네임스페이스 (컬럼이 없으면 DEFAULT_NAMESPACE)"""
+        if "namespace" not in self.columns:
+            return DEFAULT_NAMESPACE
+        return self.columns["namespace"][i]
+
+    @property
+    def namespaces(self) -> List[str]:
+        """저장소에 있는 네임스페이스 목록 (저장 순서)"""
+        if "namespace" not in self.columns:
+            return [DEFAULT_NAMESPACE] if len(self) else []
+        return list(dict.fromkeys(self.namespace(i) for i in range(len(self))))
+
+    def positions_in(self, namespaces: Sequence[str]) -> Optional[frozenset]:
+        """namespaces에 속한 청크 위치 집합을 반환합니다. 모든 청크가 속하면 None을 반환합니다."""
+        key = tuple(namespaces)
+        if key not in self._namespace_positions:
+            if set(self.namespaces) <= set(key):
+                positions = None
+            else:
+                positions = frozenset(i for i in range(len(self)) if self.namespace(i) in key)
+            self._namespace_positions[key] = positions
+        return self._namespace_positions[key]
+
+    def text(self, i: int) -> str:
+        return self.columns["text"][i]
+
+    @property
+    def fingerprint(self) -> str:
+        """코퍼스를 구분하는 해시 (ID와 본문 기준). 저장본은 저장할 때 계산한 값을 그대로 씁니다."""
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=8)
+            digest.update(self.columns["id"].buffer)
+            digest.update(self.columns["text"].buffer)
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def content_hash(self, i: int) -> str:
+        """i번째 청크 본문의 해시를 반환합니다 (변경 감지용)."""
+        start, end = self.columns["text"].offsets[i], self.columns["text"].offsets[i + 1]
+        return hashlib.blake2b(self.columns["text"].buffer[start:end], digest_size=8).hexdigest()
+
+    def metadata(self, i: int) -> Dict:
+        """i번째 청크의 메타데이터를 반환합니다.
+
+        doc_id/page_start/page_end/articles는 해당 컬럼이 있는 저장본에서만 포함됩니다.
+        """
+        metadata = {
+            "source": self.sources[self.ints["source_id"][i]],
+            "chunk_index": self.ints["chunk_index"][i],
+            "chunk_size": self.ints["chunk_size"][i],
+        }
+        if "doc_id" in self.columns:
+            metadata["doc_id"] = self.columns["doc_id"][i]
+        if "page_start" in self.ints:
+            metadata["page_start"] = self.ints["page_start"][i]
+            metadata["page_end"] = self.ints["page_end"][i]
+        if "articles" in self.columns:
+            metadata["articles"] = self.articles(i)
+        if "namespace" in self.columns:
+            metadata["namespace"] = self.namespace(i)
+        if "references" in self.columns:
+            references = self.references(i)
+            metadata["references"] = references
+            doc_ids = [metadata.get("doc_id", "")] + [ref.get("doc_id", "") for ref in references]
+            metadata["doc_ids"] = sorted({doc_id for doc_id in doc_ids if doc_id})
+        return metadata
+
+    def references(self, i: int) -> List[Dict]:
+        """중복 제거로 i번째 청크에 합쳐진 다른 위치(id, doc_id, page_start, page_end) 목록을 반환합니다."""
+        if "references" not in self.columns:
+            return []
+        value = self.columns["references"][i]
+        return json.loads(value) if value else []
+
+    def articles(self, i: int) -> List[str]:
+        """i번째 청크에 해당하는 조항 목록을 반환합니다."""
+        if "articles" not in self.columns:
+            return []
+        value = self.columns["articles"][i]
+        return value.split(ARTICLE_SEPARATOR) if value else []
+
+    def record(self, i: int) -> Dict:
+        """i번째 청크를 기존 레코드 형태(id/content/metadata)로 반환합니다."""
+        return {
+            "id": self.chunk_id(i),
+            "content": self.text(i),
+            "metadata": self.metadata(i),
+        }
+
+    def upsert_record(self, i: int) -> Dict:
+        """i번째 청크를 Pinecone upsert_records 형태로 반환합니다."""
+        return to_upsert_record(self.chunk_id(i), self.text(i), self.metadata(i))
+
+    def upsert_batches(self, batch_size: int) -> Iterator[List[Dict]]:
+        """업로드용 레코드를 배치 단위로 생성합니다."""
+        for start in range(0, len(self), batch_size):
+            end = min(start + batch_size, len(self))
+            yield [self.upsert_record(i) for i in range(start, end)]
+
+    def position(self, chunk_id: str, namespace: Optional[str] = None) -> Optional[int]:
+        """청크 ID의 위치를 반환합니다. 없으면 None을 반환합니다.
+
+        네임스페이스마다 같은 ID가 있을 수 있으므로, namespace를 주면 그 네임스페이스의 청크를
+        찾습니다 (namespace 컬럼이 없는 저장본에서는 무시). 주지 않으면 처음 나오는 청크입니다.
+        """
+        if self._positions is None:
+            ids = self.columns["id"]
+            positions: Dict = {}
+            for i in range(len(ids)):
+                positions.setdefault(ids[i], i)
+            if "namespace" in self.columns:
+                for i in range(len(ids)):
+                    positions[(self.namespace(i), ids[i])] = i
+            self._positions = positions
+        if namespace is not None and "namespace" in self.columns:
+            return self._positions.get((namespace, chunk_id))
+        return self._positions.get(chunk_id)
+
+    @property
+    def nbytes(self) -> int:
+        """코퍼스가 차지하는 바이트 수를 반환합니다."""
+        total = sum(column.nbytes for column in self.columns.values())
+        return total + sum(len(values) * 8 for values in self.ints.values())
+
+    # ------------------------------------------------------------------
+    # 저장 / 로드
+    # ------------------------------------------------------------------
+    def save(self, path: str) -> None:
+        """코퍼스를 디렉터리에 저장합니다."""
+        os.makedirs(path, exist_ok=True)
+
+        for name, column in self.columns.items():
+            _write_bytes(os.path.join(path, f"{name}.bin"), column.buffer)
+            _write_bytes(os.path.join(path, f"{name}.offsets"), _to_bytes(column.offsets))
+        for name, values in self.ints.items():
+            _write_bytes(os.path.join(path, f"{name}.i64"), _to_bytes(values))
+
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "byteorder": sys.byteorder,
+            "count": len(self),
+            "string_columns": list(self.columns),
+            "int_columns": list(self.ints),
+            "sources": self.sources,
+            "fingerprint": self.fingerprint,
+        }
+        # 메타 파일을 마지막에 교체하여 불완전한 저장본이 로드되지 않도록 합니다.
+        tmp_path = os.path.join(path, META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(path, META_FILE))
+
+    @classmethod
+    def load(cls, path: str) -> "ChunkCorpus":
+        """저장된 코퍼스를 mmap으로 읽어옵니다."""
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"지원하지 않는 청크 저장소 형식입니다: {meta.get('format_version')}")
+        if meta.get("byteorder") != sys.byteorder:
+            raise ValueError("청크 저장소의 바이트 순서가 현재 시스템과 다릅니다.")
+
+        mmaps: List[mmap.mmap] = []
+        columns = {}
+        for name in meta["string_columns"]:
+            buffer = _map_file(os.path.join(path, f"{name}.bin"), mmaps)
+            offsets = _map_int64(os.path.join(path, f"{name}.offsets"), mmaps)
+            columns[name] = StringColumn(buffer, offsets)
+        ints = {name: _map_int64(os.path.join(path, f"{name}.i64"), mmaps)
+                for name in meta["int_columns"]}
+
+        # 지문은 저장할 때 계산해 두었으므로 시작 시 본문 전체를 다시 해시하지 않습니다.
+        return cls(columns, ints, meta["sources"], _mmaps=mmaps, _fingerprint=meta.get("fingerprint"))
+
+    def close(self) -> None:
+        """mmap으로 연 파일을 닫습니다."""
+        self.columns = {}
+        self.ints = {}
+        self._positions = None
+        self._namespace_positions = {}
+        for mapped in self._mmaps:
+            try:
+                mapped.close()
+            except BufferError:
+                # 아직 참조 중인 메모리뷰가 있으면 GC에 맡깁니다.
+                pass
+        self._mmaps = []
+
+
+def _to_bytes(values) -> bytes:
+    if isinstance(values, array):
+        return values.tobytes()
+    if isinstance(values, memoryview):
+        return values.tobytes()
+    return array("q", values).tobytes()
+
+
+def _write_bytes(path: str, data) -> None:
+    # 새 파일에 쓴 뒤 교체하여, 기존 파일을 mmap 중인 프로세스가 잘린 파일을 읽지 않도록 합니다.
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _map_file(path: str, mmaps: List[mmap.mmap]):
+    """파일을 읽기 전용으로 mmap합니다. 빈 파일은 빈 bytes를 반환합니다."""
+    if os.path.getsize(path) == 0:
+        return b""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    mmaps.append(mapped)
+    return mapped
+
+
+def _map_int64(path: str, mmaps: List[mmap.mmap]) -> Sequence[int]:
+    buffer = _map_file(path, mmaps)
+    if not buffer:
+        return array("q")
+    return memoryview(buffer).cast("q")
@@ -0,0 +1,170 @@
+"""
+Near-duplicate Chunk Elimination
+중복 청크 제거 모듈
+
+보험 약관은 상품/장마다 같은 정의 조항, 분쟁 조정 조항 등이 반복됩니다.
+MinHash 서명과 LSH 밴딩으로 코퍼스 전체에서 거의 같은 청크를 찾아 하나만 남기고,
+남긴 청크에 합쳐진 다른 위치(문서, 쪽) 목록을 기록합니다.
+
+MinHash는 해시 한 번으로 서명을 만드는 one-permutation hashing(빈 칸은 회전 방식으로
+채움)을 사용하여 외부 라이브러리 없이도 수집 단계에서 충분히 빠르게 동작합니다.
+"""
+
+import json
+import math
+import zlib
+from typing import Dict, List, Sequence, Set, Tuple
+
+from ..utils.tracing import span
+from .chunk_store import ARTICLE_SEPARATOR, ChunkCorpus, StringColumn
+
+# 임베딩 차원 (인덱스 크기 추정용)
+EMBEDDING_DIMENSIONS = {"multilingual-e5-large": 1024}
+DEFAULT_EMBEDDING_DIMENSION = 1024
+
+_HASH_MULTIPLIER = 0x9E3779B1
+_EMPTY = 1 << 32
+
+
+def shingle_hashes(text: str, size: int = 5) -> Set[int]:
+    """공백을 정리한 본문의 문자 size-gram을 32비트 해시 집합으로 만듭니다."""
+    text = " ".join(text.split())
+    if len(text) <= size:
+        return {zlib.crc32(text.encode("utf-8"))}
+    return {zlib.crc32(text[i:i + size].encode("utf-8")) for i in range(len(text) - size + 1)}
+
+
+def minhash_signature(hashes: Set[int], num_perm: int = 128) -> Tuple[int, ...]:
+    """one-permutation MinHash 서명을 만듭니다.
+
+    해시값을 num_perm개 칸에 나누어 칸마다 최솟값을 두고, 빈 칸은 오른쪽으로 가장 가까운
+    채워진 칸의 값(거리만큼 구분값을 더함)으로 채웁니다.
+    """
+    bins = [_EMPTY] * num_perm
+    for value in hashes:
+        value = (value * _HASH_MULTIPLIER) & 0xFFFFFFFF
+        slot, rank = value % num_perm, value // num_perm
+        if rank < bins[slot]:
+            bins[slot] = rank
+
+    if _EMPTY in bins:
+        dense = list(bins)
+        next_filled = None
+        # 역순으로 두 바퀴 돌며 각 빈 칸의 오른쪽(순환)으로 가장 가까운 채워진 칸을 찾습니다.
+        for step in range(2 * num_perm - 1, -1, -1):
+            slot = step % num_perm
+            if bins[slot] != _EMPTY:
+                next_filled = step
+            elif next_filled is not None and step < num_perm:
+                dense[slot] = bins[next_filled % num_perm] + (next_filled - step) * _EMPTY
+        bins = dense
+    return tuple(bins)
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    union = len(a | b)
+    return len(a & b) / union if union else 1.0
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # 먼저 나온 청크를 대표로 유지합니다.
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def find_duplicate_clusters(texts: Sequence[str], threshold: float = 0.85, num_perm: int = 128,
+                            bands: int = 16, shingle_size: int = 5) -> Dict[int, List[int]]:
+    """거의 같은 청크 묶음을 {대표 위치: [중복 위치, ...]}로 반환합니다 (중복이 있는 묶음만).
+
+    LSH 밴드가 하나라도 같은 청크를 후보로 보고, 실제 shingle 자카드 유사도가
+    threshold 이상인 경우만 같은 묶음으로 합칩니다.
+    """
+    if num_perm % bands:
+        raise ValueError("num_perm은 bands의 배수여야 합니다.")
+    rows = num_perm // bands
+
+    shingles = [shingle_hashes(text, shingle_size) for text in texts]
+    clusters = _UnionFind(len(texts))
+    buckets: Dict[Tuple[int, Tuple[int, ...]], int] = {}
+
+    for position, hashes in enumerate(shingles):
+        signature = minhash_signature(hashes, num_perm)
+        for band in range(bands):
+            key = (band, signature[band * rows:(band + 1) * rows])
+            first = buckets.setdefault(key, position)
+            if first == position or clusters.find(first) == clusters.find(position):
+                continue
+            # 버킷의 첫 청크와만 비교하므로 같은 문구가 많이 반복되어도 비교 횟수는 선형입니다.
+            if jaccard(shingles[first], hashes) >= threshold:
+                clusters.union(first, position)
+
+    groups: Dict[int, List[int]] = {}
+    for position in range(len(texts)):
+        root = clusters.find(position)
+        if root != position:
+            groups.setdefault(root, []).append(position)
+    return groups
+
+
+def deduplicate_corpus(corpus: ChunkCorpus, threshold: float = 0.85, num_perm: int = 128, bands: int = 16,
+                       shingle_size: int = 5, batch_size: int = 10,
+                       embedding_model: str = "multilingual-e5-large") -> Tuple[ChunkCorpus, Dict]:
+    """거의 같은 청크를 하나로 합친 코퍼스와 절감 보고서를 반환합니다.
+
+    남은 청크의 references 컬럼에 합쳐진 청크의 위치(id, doc_id, page_start, page_end)를,
+    articles 컬럼에 모든 위치의 조항을 합쳐 기록합니다.
+    """
+    texts = [corpus.text(i) for i in range(len(corpus))]
+    with span("ingest.dedup", sampled=True,
+              **{"ingest.chunks": len(texts), "dedup.threshold": threshold}) as dedup_span:
+        groups = find_duplicate_clusters(texts, threshold, num_perm, bands, shingle_size)
+        dedup_span.set_attributes({"dedup.clusters": len(groups),
+                                   "dedup.removed": sum(len(duplicates) for duplicates in groups.values())})
+    removed = {position for duplicates in groups.values() for position in duplicates}
+    kept = [position for position in range(len(corpus)) if position not in removed]
+
+    references = []
+    articles = []
+    for position in kept:
+        refs = []
+        merged_articles = corpus.articles(position)
+        for duplicate in groups.get(position, []):
+            metadata = corpus.metadata(duplicate)
+            ref = {"id": corpus.chunk_id(duplicate)}
+            for key in ("doc_id", "page_start", "page_end"):
+                if key in metadata:
+                    ref[key] = metadata[key]
+            refs.append(ref)
+            merged_articles += [a for a in corpus.articles(duplicate) if a not in merged_articles]
+        references.append(json.dumps(refs, ensure_ascii=False) if refs else "")
+        articles.append(ARTICLE_SEPARATOR.join(merged_articles))
+
+    deduplicated = corpus.take(kept)
+    deduplicated.columns["references"] = StringColumn.from_strings(references)
+    if "articles" in corpus.columns:
+        deduplicated.columns["articles"] = StringColumn.from_strings(articles)
+
+    dimension = EMBEDDING_DIMENSIONS.get(embedding_model, DEFAULT_EMBEDDING_DIMENSION)
+    text_bytes_saved = sum(len(texts[position].encode("utf-8")) for position in removed)
+    report = {
+        "chunks_before": len(corpus),
+        "chunks_after": len(deduplicated),
+        "duplicates_removed": len(removed),
+        "clusters": len(groups),
+        "text_bytes_saved": text_bytes_saved,
+        # 벡터(float32) + 본문 메타데이터 기준 인덱스 크기 절감 추정치
+        "index_bytes_saved": len(removed) * dimension * 4 + text_bytes_saved,
+        "batches_saved": math.ceil(len(corpus) / batch_size) - math.ceil(len(deduplicated) / batch_size),
+    }
+    return deduplicated, report
@@ -3,46 +3,91 @@ Data Ingestion Module
 데이터 수집 및 처리 모듈
 """
 
+import hashlib
 import os
-from typing import List, Dict
-from ..utils.config import get_config
-
-def create_records_from_chunks(chunks: List[str]) -> List[Dict]:
-    """청크들을 Pinecone 레코드 형태로 변환합니다."""
-    records = []
-    
-    for i, chunk in enumerate(chunks):
-        record = {
-            "id": f"chunk_{i}",
-            "content": chunk,
-            "metadata": {
-                "source": "보험약관",
-                "chunk_index": i,
-                "chunk_size": len(chunk)
-            }
-        }
-        records.append(record)
-    
-    return records
+import re
+from bisect import bisect_right
+from typing import List, Optional, Sequence, Tuple
+from ..utils.config import get_settings
+from ..utils.tracing import span
+from ..utils.text import ARTICLE_HEADING_PATTERN, normalize_article
+from .chunk_store import ChunkCorpus
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """PDF 파일에서 텍스트를 추출합니다."""
-    text = ""
+def create_records_from_chunks(chunks: List[str], doc_id: Optional[str] = None,
+                               pages: Optional[Sequence[Tuple[int, int]]] = None,
+                               articles: Optional[Sequence[Sequence[str]]] = None) -> ChunkCorpus:
+    """청크들을 Pinecone 레코드 형태의 컬럼형 코퍼스로 변환합니다.
+
+    반환값은 레코드 리스트처럼 `len()`/인덱싱/순회를 지원하며, 레코드 딕셔너리는
+    접근 시점에만 생성됩니다. doc_id를 주면 청크 ID가 "{doc_id}#chunk_{i}"가 되고,
+    pages(청크별 쪽 범위)와 articles(청크별 조항 목록)는 필터 검색용 메타데이터로 저장됩니다.
+    """
+    id_prefix = f"{doc_id}#chunk_" if doc_id else "chunk_"
+    return ChunkCorpus.from_chunks(chunks, id_prefix=id_prefix, doc_id=doc_id, pages=pages, articles=articles)
+
+def document_id(pdf_path: str) -> str:
+    """PDF 파일 이름으로 문서 ID를 만듭니다.
+
+    Pinecone 레코드 ID는 ASCII만 허용하므로 그 밖의 문자는 '_'로 바꾸고,
+    바뀐 경우 원래 이름의 해시를 붙여 서로 다른 문서가 같은 ID가 되지 않도록 합니다.
+    """
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    slug = re.sub(r'[^0-9A-Za-z_.-]+', '_', stem).strip('_')
+    if slug == stem:
+        return slug
+    digest = hashlib.blake2b(stem.encode("utf-8"), digest_size=4).hexdigest()
+    return f"{slug}_{digest}" if slug else digest
+
+def extract_pages_from_pdf(pdf_path: str) -> List[str]:
+    """PDF 파일에서 쪽별 텍스트를 추출합니다."""
+    pages = []
     try:
         import PyPDF2
         with open(pdf_path, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
             for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+                pages.append(page.extract_text() or "")
     except Exception as e:
         print(f"PDF 파일 읽기 오류: {e}")
-        return ""
+        return []
     
-    return text
+    return pages
+
+def extract_text_from_pdf(pdf_path: str) -> str:
+    """PDF 파일에서 텍스트를 추출합니다."""
+    return "".join(page + "\n" for page in extract_pages_from_pdf(pdf_path))
+
+def join_pages(pages: Sequence[str]) -> Tuple[str, List[int], List[int]]:
+    """쪽별 텍스트를 정리하여 하나로 잇습니다.
+
+    (본문, 각 쪽의 시작 오프셋, 각 쪽의 쪽 번호)를 반환합니다. 빈 쪽은 건너뛰며
+    쪽 번호는 1부터 시작합니다.
+    """
+    parts = []
+    starts = []
+    numbers = []
+    position = 0
+    for number, page in enumerate(pages, 1):
+        page = clean_text(page)
+        if not page:
+            continue
+        if parts:
+            position += 1  # 쪽 사이 줄바꿈
+        starts.append(position)
+        numbers.append(number)
+        parts.append(page)
+        position += len(page)
+    return "\n".join(parts), starts, numbers
+
+def find_article_headings(text: str) -> List[Tuple[int, str]]:
+    """본문에서 조항 제목("제15조(보험계약의 성립)")의 위치와 정규화된 조항을 찾습니다."""
+    return [
+        (match.start(), normalize_article(match.group(1), match.group(2)))
+        for match in ARTICLE_HEADING_PATTERN.finditer(text)
+    ]
 
 def clean_text(text: str) -> str:
     """텍스트를 정리합니다."""
-    import re
     # 불필요한 공백 제거
     text = re.sub(r'\n+', '\n', text)
     text = re.sub(r' +', ' ', text)
@@ -50,46 +95,77 @@ def clean_text(text: str) -> str:
     
     return text
 
-def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
-    """텍스트를 청킹합니다."""
-    import re
-    
-    chunks = []
-    text = clean_text(text)
+def chunk_text_with_spans(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[Tuple[str, int, int]]:
+    """정리된 텍스트를 청킹하고 각 청크의 (청크, 시작 오프셋, 끝 오프셋)을 반환합니다.
+
+    오버랩 부분의 시작 오프셋은 근사값입니다 (쪽/조항 매핑용).
+    """
+    spans = []
     
     # 문장 단위로 분할
     sentences = re.split(r'(?<=[.!?])\s+', text)
     
     current_chunk = ""
     current_size = 0
+    chunk_start = 0
+    chunk_end = 0
+    position = 0
     
     for sentence in sentences:
         sentence_size = len(sentence)
+        sentence_start = text.find(sentence, position)
+        if sentence_start < 0:
+            sentence_start = position
+        position = sentence_start + sentence_size
         
         if current_size + sentence_size > chunk_size and current_chunk:
-            chunks.append(current_chunk.strip())
+            spans.append((current_chunk.strip(), chunk_start, chunk_end))
             
             # 오버랩을 위해 마지막 부분을 유지
             overlap_text = current_chunk[-overlap:] if len(current_chunk) > overlap else current_chunk
             current_chunk = overlap_text + " " + sentence
             current_size = len(current_chunk)
+            chunk_start = max(chunk_start, sentence_start - len(overlap_text))
         else:
+            if not current_chunk.strip():
+                chunk_start = sentence_start
             current_chunk += " " + sentence
             current_size += sentence_size
+        chunk_end = position
     
     # 마지막 청크 추가
     if current_chunk.strip():
-        chunks.append(current_chunk.strip())
+        spans.append((current_chunk.strip(), chunk_start, chunk_end))
     
-    return [chunk for chunk in chunks if chunk.strip()]
+    return [span for span in spans if span[0].strip()]
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    """텍스트를 청킹합니다."""
+    return [chunk for chunk, _, _ in chunk_text_with_spans(clean_text(text), chunk_size, overlap)]
+
+def _page_of(offset: int, page_starts: List[int], page_numbers: List[int]) -> int:
+    if not page_numbers:
+        return 0
+    return page_numbers[max(0, bisect_right(page_starts, offset) - 1)]
+
+def _articles_in(start: int, end: int, positions: List[int], headings: List[Tuple[int, str]]) -> List[str]:
+    # 청크 시작 시점에 적용 중인 조항 + 청크 안에서 시작하는 조항
+    first = max(0, bisect_right(positions, start) - 1)
+    articles = []
+    for position, article in headings[first:]:
+        if position >= end:
+            break
+        if article not in articles:
+            articles.append(article)
+    return articles
 
 def process_pdf_for_rag(pdf_path: str, chunk_size: int = None, chunk_overlap: int = None) -> List[str]:
     """PDF 파일을 RAG를 위해 처리합니다."""
-    config = get_config()
+    settings = get_settings()
     if chunk_size is None:
-        chunk_size = config["chunk_size"]
+        chunk_size = settings.chunk_size
     if chunk_overlap is None:
-        chunk_overlap = config["chunk_overlap"]
+        chunk_overlap = settings.chunk_overlap
     
     print(f"PDF 파일 처리 중: {pdf_path}")
     
@@ -107,25 +183,63 @@ def process_pdf_for_rag(pdf_path: str, chunk_size: int = None, chunk_overlap: in
     
     return chunks
 
-def ingest_pdf_to_pinecone(pdf_path: str, index_name: str = None):
+def process_pdf_with_metadata(pdf_path: str, chunk_size: int = None, chunk_overlap: int = None) -> ChunkCorpus:
+    """PDF 파일을 청킹하고 문서 ID, 쪽 범위, 조항 메타데이터를 붙인 코퍼스를 만듭니다."""
+    settings = get_settings()
+    if chunk_size is None:
+        chunk_size = settings.chunk_size
+    if chunk_overlap is None:
+        chunk_overlap = settings.chunk_overlap
+    
+    print(f"PDF 파일 처리 중: {pdf_path}")
+    doc_id = document_id(pdf_path)
+    
+    with span("ingest.pdf", sampled=True, **{"ingest.doc_id": doc_id, "ingest.chunk_size": chunk_size,
+                                            "ingest.chunk_overlap": chunk_overlap}) as pdf_span:
+        # 쪽별 텍스트 추출
+        with span("ingest.extract") as extract_span:
+            pages = extract_pages_from_pdf(pdf_path)
+            text, page_starts, page_numbers = join_pages(pages)
+            extract_span.set_attributes({"ingest.pages": len(pages), "ingest.text_chars": len(text)})
+        if not text:
+            print("텍스트 추출 실패")
+            return ChunkCorpus.from_chunks([])
+        
+        print(f"추출된 텍스트 길이: {len(text)} 문자 ({len(pages)}쪽)")
+        
+        # 청킹 + 쪽/조항 매핑
+        with span("ingest.chunk"):
+            spans = chunk_text_with_spans(text, chunk_size, chunk_overlap)
+            headings = find_article_headings(text)
+            positions = [position for position, _ in headings]
+            
+            chunks = [chunk for chunk, _, _ in spans]
+            page_ranges = [
+                (_page_of(start, page_starts, page_numbers), _page_of(max(start, end - 1), page_starts, page_numbers))
+                for _, start, end in spans
+            ]
+            articles = [_articles_in(start, end, positions, headings) for _, start, end in spans]
+        pdf_span.set_attributes({"ingest.chunks": len(chunks), "ingest.articles": len(headings)})
+        print(f"생성된 청크 수: {len(chunks)} (조항 제목 {len(headings)}개 감지)")
+        
+        return create_records_from_chunks(chunks, doc_id=doc_id, pages=page_ranges, articles=articles)
+
+def ingest_pdf_to_pinecone(pdf_path: str, index_name: str = None) -> ChunkCorpus:
     """PDF 파일을 처리하여 Pinecone용 레코드로 변환합니다."""
-    config = get_config()
+    settings = get_settings()
     if index_name is None:
-        index_name = config["pinecone_index_name"]
+        index_name = settings.pinecone_index_name
     
     print(f"PDF 파일 처리 시작: {pdf_path}")
     
-    # PDF에서 청크 추출
-    chunks = process_pdf_for_rag(pdf_path)
+    # PDF에서 청크 추출 (쪽/조항 메타데이터 포함)
+    records = process_pdf_with_metadata(pdf_path)
     
-    if not chunks:
+    if not records:
         print("청크 추출 실패")
-        return []
-    
-    print(f"총 {len(chunks)} 개의 청크가 생성되었습니다.")
+        return records
     
-    # 레코드 형태로 변환
-    records = create_records_from_chunks(chunks)
+    print(f"총 {len(records)} 개의 청크가 생성되었습니다.")
     
     print(f"Pinecone 인덱스에 {len(records)}개 레코드 업로드를 시작합니다...")
     
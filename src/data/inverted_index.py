@@ -0,0 +1,300 @@
+"""
+Local Inverted Index
+로컬 역색인 모듈
+
+청크 본문의 문자 바이그램(한국어는 띄어쓰기 단위가 길고 조사가 붙으므로 형태소 분석 없이도
+부분 일치가 잘 되는 문자 n-gram 사용)과 조항 제목("제15조")으로 역색인을 만듭니다.
+네트워크 호출 없이 조항 정확 조회와 BM25 키워드 검색을 제공합니다.
+
+색인은 청크 저장소와 같은 디렉터리에 컬럼형(정렬된 용어 + 포스팅 배열)으로 저장하며
+mmap으로 읽습니다. 용어 조회는 정렬된 용어 컬럼에 대한 이진 탐색입니다.
+"""
+
+import json
+import math
+import os
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from typing import AbstractSet, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ..utils.text import ARTICLE_REFERENCE_PATTERN, find_article_references
+from ..utils.tracing import span
+from .chunk_store import ChunkCorpus, StringColumn, _map_file, _map_int64, _to_bytes, _write_bytes
+from .ingestion import find_article_headings
+
+INDEX_PREFIX = "lexical"
+INDEX_META_FILE = f"{INDEX_PREFIX}.meta.json"
+INDEX_FORMAT_VERSION = 1
+
+# 조항 제목 용어 접두사 (본문 n-gram과 섞이지 않도록)
+ARTICLE_TERM_PREFIX = "§"
+
+# BM25 파라미터
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD_PATTERN = re.compile(r'\w+')
+
+# 조항/용어 조회 질문에서 조항/용어 외에 올 수 있는 표현과 조사 (is_lookup_query)
+LOOKUP_WORDS = frozenset({
+    "내용", "전문", "원문", "조항", "조문", "정의", "뜻", "의미", "뭐", "뭔가요", "뭔지", "무엇", "무엇인가요",
+    "무엇입니까", "어떻게", "되어", "되어있나요", "돼있나요", "있나요", "알려줘", "알려주세요", "보여줘",
+    "보여주세요", "찾아줘", "찾아주세요", "설명", "설명해줘", "설명해주세요", "좀", "please",
+})
+LOOKUP_PARTICLES = frozenset("은는이가을를의에요야죠")
+# 인용된 정의 용어 ("해지환급금", 「보험가입금액」 등)
+_QUOTED_PATTERN = re.compile(r'["“「『\']([^"”」』\']{2,40})["”」』\']')
+
+
+def lexical_terms(text: str) -> List[str]:
+    """본문을 색인 용어(단어별 문자 바이그램, 한 글자 단어는 그대로)로 나눕니다."""
+    terms = []
+    for word in _WORD_PATTERN.findall(text.lower()):
+        if len(word) == 1:
+            terms.append(word)
+        else:
+            terms.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return terms
+
+
+def article_term(article: str) -> str:
+    return ARTICLE_TERM_PREFIX + article
+
+
+def quoted_phrases(query: str) -> List[str]:
+    """질문에서 따옴표/낫표로 인용한 용어를 찾습니다."""
+    return [phrase.strip() for phrase in _QUOTED_PATTERN.findall(query) if phrase.strip()]
+
+
+def corpus_fingerprint(corpus: ChunkCorpus) -> str:
+    """색인이 어떤 코퍼스로 만들어졌는지 확인하는 해시 (ChunkCorpus.fingerprint)"""
+    return corpus.fingerprint
+
+
+def is_lookup_query(query: str) -> bool:
+    """질문이 조항이나 인용 용어 자체를 찾는 질문인지 확인합니다.
+
+    조항/인용 용어를 빼고 남은 단어가 "내용", "뭐야", "알려주세요" 같은 조회 표현(과 조사)뿐이면
+    True입니다 (예: "제15조 내용", "'해지환급금'이 뭐예요?"). "제15조에 따라 해지하면 환급금은?"처럼
+    다른 내용을 묻는 질문은 False입니다.
+    """
+    rest = _QUOTED_PATTERN.sub(" ", ARTICLE_REFERENCE_PATTERN.sub(" ", query))
+    if rest == query:
+        return False
+    for word in _WORD_PATTERN.findall(rest.lower()):
+        while word and word not in LOOKUP_WORDS and word[-1] in LOOKUP_PARTICLES:
+            word = word[:-1]
+        if word and word not in LOOKUP_WORDS:
+            return False
+    return True
+
+
+class InvertedIndex:
+    """정렬된 용어 컬럼과 포스팅(청크 위치, 용어 빈도) 배열로 이루어진 역색인"""
+
+    def __init__(self, terms: StringColumn, posting_offsets: Sequence[int], postings: Sequence[int],
+                 frequencies: Sequence[int], doc_lengths: Sequence[int], fingerprint: str = "",
+                 _mmaps: Optional[list] = None):
+        self.terms = terms
+        self.posting_offsets = posting_offsets
+        self.postings = postings
+        self.frequencies = frequencies
+        self.doc_lengths = doc_lengths
+        self.fingerprint = fingerprint
+        self._mmaps = _mmaps or []
+        total = sum(doc_lengths)
+        self.avg_doc_length = total / len(doc_lengths) if len(doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, corpus: ChunkCorpus) -> "InvertedIndex":
+        """코퍼스로 역색인을 만듭니다."""
+        with span("ingest.lexical_index", sampled=True, **{"ingest.chunks": len(corpus)}) as index_span:
+            index: Dict[str, Dict[int, int]] = {}
+            doc_lengths = array("q")
+
+            for i in range(len(corpus)):
+                terms = lexical_terms(corpus.text(i))
+                doc_lengths.append(len(terms))
+                for term in terms:
+                    counts = index.setdefault(term, {})
+                    counts[i] = counts.get(i, 0) + 1
+
+                # 조항 제목: 저장된 메타데이터를 우선 사용하고, 없으면 청크 안의 제목을 찾습니다.
+                articles = corpus.articles(i) or [article for _, article in find_article_headings(corpus.text(i))]
+                for article in articles:
+                    index.setdefault(article_term(article), {})[i] = 1
+
+            sorted_terms = sorted(index)
+            posting_offsets = array("q", [0])
+            postings = array("q")
+            frequencies = array("q")
+            for term in sorted_terms:
+                for position, count in sorted(index[term].items()):
+                    postings.append(position)
+                    frequencies.append(count)
+                posting_offsets.append(len(postings))
+
+            index_span.set_attribute("lexical.terms", len(sorted_terms))
+            return cls(StringColumn.from_strings(sorted_terms), posting_offsets, postings, frequencies,
+                       doc_lengths, fingerprint=corpus_fingerprint(corpus))
+
+    # ------------------------------------------------------------------
+    # 조회
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def _row(self, term: str) -> Optional[int]:
+        row = bisect_left(self.terms, term)
+        if row < len(self.terms) and self.terms[row] == term:
+            return row
+        return None
+
+    def posting_list(self, term: str) -> Tuple[Sequence[int], Sequence[int]]:
+        """용어의 (청크 위치 목록, 용어 빈도 목록)을 반환합니다."""
+        row = self._row(term)
+        if row is None:
+            return (), ()
+        start, end = self.posting_offsets[row], self.posting_offsets[row + 1]
+        return self.postings[start:end], self.frequencies[start:end]
+
+    def lookup_articles(self, articles: Iterable[str]) -> List[int]:
+        """조항 제목이 포함된 청크 위치를 문서 순서대로 반환합니다."""
+        positions = set()
+        for article in articles:
+            positions.update(self.posting_list(article_term(article))[0])
+        return sorted(positions)
+
+    def find_phrase(self, phrase: str, corpus: ChunkCorpus) -> List[int]:
+        """용어가 본문에 그대로 들어 있는 청크 위치를 반환합니다.
+
+        바이그램 포스팅의 교집합으로 후보를 좁힌 뒤 본문에서 확인합니다.
+        """
+        terms = set(lexical_terms(phrase))
+        if not terms:
+            return []
+        candidates = None
+        for term in sorted(terms, key=lambda t: len(self.posting_list(t)[0])):
+            positions = set(self.posting_list(term)[0])
+            candidates = positions if candidates is None else candidates & positions
+            if not candidates:
+                return []
+        needle = phrase.lower()
+        return sorted(position for position in candidates if needle in corpus.text(position).lower())
+
+    def search(self, query: str, top_k: int = 5, candidates: Optional[Iterable[int]] = None,
+               within: Optional[AbstractSet[int]] = None) -> List[Tuple[int, float]]:
+        """BM25 점수 기준 상위 top_k개의 (청크 위치, 점수)를 반환합니다.
+
+        candidates를 주면 해당 청크만 점수를 매기며, 일치하는 용어가 없는 후보도 0점으로
+        포함합니다. within을 주면 그 밖의 청크(예: 검색 대상이 아닌 네임스페이스)는 제외합니다.
+        질문에 언급된 조항의 제목이 있는 청크는 가산점을 받습니다.
+        """
+        allowed = set(candidates) if candidates is not None else None
+        if within is not None:
+            allowed = allowed & within if allowed is not None else within
+        n = len(self)
+        scores: Dict[int, float] = {}
+
+        query_terms = set(lexical_terms(query))
+        for term in query_terms:
+            positions, frequencies = self.posting_list(term)
+            if not len(positions):
+                continue
+            idf = math.log(1 + (n - len(positions) + 0.5) / (len(positions) + 0.5))
+            for position, frequency in zip(positions, frequencies):
+                if allowed is not None and position not in allowed:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[position] / (self.avg_doc_length or 1))
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        for position in self.lookup_articles(find_article_references(query)):
+            if allowed is None or position in allowed:
+                scores[position] = scores.get(position, 0.0) + max(1.0, math.log(n + 1))
+
+        if candidates is not None:
+            for position in allowed:
+                scores.setdefault(position, 0.0)
+
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+
+    @property
+    def nbytes(self) -> int:
+        return self.terms.nbytes + 8 * (len(self.posting_offsets) + len(self.postings)
+                                        + len(self.frequencies) + len(self.doc_lengths))
+
+    # ------------------------------------------------------------------
+    # 저장 / 로드
+    # ------------------------------------------------------------------
+    def save(self, path: str) -> None:
+        """청크 저장소 디렉터리에 색인을 저장합니다."""
+        os.makedirs(path, exist_ok=True)
+        prefix = os.path.join(path, INDEX_PREFIX)
+        _write_bytes(f"{prefix}.terms.bin", self.terms.buffer)
+        _write_bytes(f"{prefix}.terms.offsets", _to_bytes(self.terms.offsets))
+        _write_bytes(f"{prefix}.posting_offsets.i64", _to_bytes(self.posting_offsets))
+        _write_bytes(f"{prefix}.postings.i64", _to_bytes(self.postings))
+        _write_bytes(f"{prefix}.frequencies.i64", _to_bytes(self.frequencies))
+        _write_bytes(f"{prefix}.doc_lengths.i64", _to_bytes(self.doc_lengths))
+
+        meta = {
+            "format_version": INDEX_FORMAT_VERSION,
+            "byteorder": sys.byteorder,
+            "count": len(self),
+            "terms": len(self.terms),
+            "fingerprint": self.fingerprint,
+        }
+        tmp_path = os.path.join(path, INDEX_META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(path, INDEX_META_FILE))
+
+    @classmethod
+    def load(cls, path: str) -> "InvertedIndex":
+        """저장된 색인을 mmap으로 읽어옵니다."""
+        with open(os.path.join(path, INDEX_META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        if meta.get("format_version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"지원하지 않는 역색인 형식입니다: {meta.get('format_version')}")
+        if meta.get("byteorder") != sys.byteorder:
+            raise ValueError("역색인의 바이트 순서가 현재 시스템과 다릅니다.")
+
+        mmaps: list = []
+        prefix = os.path.join(path, INDEX_PREFIX)
+        terms = StringColumn(_map_file(f"{prefix}.terms.bin", mmaps), _map_int64(f"{prefix}.terms.offsets", mmaps))
+        return cls(
+            terms,
+            _map_int64(f"{prefix}.posting_offsets.i64", mmaps),
+            _map_int64(f"{prefix}.postings.i64", mmaps),
+            _map_int64(f"{prefix}.frequencies.i64", mmaps),
+            _map_int64(f"{prefix}.doc_lengths.i64", mmaps),
+            fingerprint=meta.get("fingerprint", ""),
+            _mmaps=mmaps,
+        )
+
+    @classmethod
+    def load_or_build(cls, path: str, corpus: ChunkCorpus) -> "InvertedIndex":
+        """저장된 색인이 코퍼스와 일치하면 읽어오고, 없거나 다르면 메모리에서 새로 만듭니다."""
+        if os.path.exists(os.path.join(path, INDEX_META_FILE)):
+            try:
+                index = cls.load(path)
+                if index.fingerprint == corpus_fingerprint(corpus):
+                    return index
+                index.close()
+            except (OSError, ValueError) as e:
+                print(f"역색인 로드 오류: {e}")
+        return cls.build(corpus)
+
+    def close(self) -> None:
+        """mmap으로 연 파일을 닫습니다."""
+        self.terms = StringColumn(b"", array("q", [0]))
+        self.posting_offsets = self.postings = self.frequencies = self.doc_lengths = array("q")
+        for mapped in self._mmaps:
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+        self._mmaps = []
@@ -0,0 +1,350 @@
+"""
+Checkpointed Upload Jobs
+재개 가능한 업로드 작업 모듈
+
+업로드할 레코드를 배치 단위로 로컬 JSONL 샤드에 먼저 기록하고, Pinecone이 확인(ack)한
+배치 번호를 로그에 남깁니다. 중간에 프로세스가 죽거나 서킷이 열려 중단되어도 같은 작업을
+다시 실행하면 확인되지 않은 배치부터 이어서 올립니다. 실패한 배치는 dead-letter 파일에
+기록되어 나중에 그 배치만 다시 시도할 수 있습니다.
+
+작업 디렉터리 레이아웃:
+    job.json            작업 정보 (마지막에 기록되며, 이 파일이 있어야 유효한 작업)
+    shards/NNNNN.jsonl  한 줄에 배치 하나 {"batch": n, "records": [...]}
+    shards.staging/     작업을 만드는 동안 샤드를 먼저 기록하는 임시 디렉터리
+    acks.log            확인된 배치 번호 (한 줄에 하나, 추가 전용)
+    dead_letter.jsonl   실패한 배치 {"batch": n, "error": "...", "time": ...} (추가 전용)
+    chunk_store/        모든 배치가 확인된 뒤 로컬 청크 저장소로 반영할 코퍼스 (선택)
+
+로컬 청크 저장소와 인덱스에서 지울 이전 청크 ID도 작업 정보에 함께 기록하므로, 업로드가
+중간에 실패해도 다음 실행(--resume 포함)에서 업로드를 마친 뒤 같은 정리를 할 수 있습니다.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from ..utils.deadline import DeadlineExceeded
+from ..utils.metrics import metrics
+from ..utils.resilience import CircuitOpenError, Dependency
+from ..utils.tracing import SPAN_KIND_CLIENT, span
+from .chunk_store import META_FILE, ChunkCorpus
+
+JOB_FILE = "job.json"
+ACK_LOG = "acks.log"
+DEAD_LETTER_FILE = "dead_letter.jsonl"
+SHARD_DIR = "shards"
+STAGING_DIR = "shards.staging"
+LOCAL_STORE_DIR = "chunk_store"
+JOB_FORMAT_VERSION = 1
+
+
+class UnfinishedJobError(RuntimeError):
+    """끝나지 않은 다른 업로드 작업을 덮어쓰려 할 때 발생합니다."""
+
+
+class UploadJob:
+    """디렉터리 하나에 기록되는 체크포인트 업로드 작업"""
+
+    def __init__(self, path: str, info: Dict[str, Any]):
+        self.path = path
+        self.info = info
+
+    # ------------------------------------------------------------------
+    # 생성 / 열기
+    # ------------------------------------------------------------------
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return os.path.exists(os.path.join(path, JOB_FILE))
+
+    @classmethod
+    def open(cls, path: str) -> "UploadJob":
+        """기존 작업을 엽니다."""
+        with open(os.path.join(path, JOB_FILE), encoding="utf-8") as f:
+            info = json.load(f)
+        if info.get("format_version") != JOB_FORMAT_VERSION:
+            raise ValueError(f"지원하지 않는 업로드 작업 형식입니다: {info.get('format_version')}")
+        return cls(path, info)
+
+    @classmethod
+    def create(cls, path: str, batches: Iterable[List[Dict]], index_name: str, namespace: str,
+               batches_per_shard: int = 100, resume: bool = True, stale_ids: Iterable[str] = (),
+               local_store: Optional[ChunkCorpus] = None) -> "UploadJob":
+        """배치들을 샤드에 기록하여 새 작업을 만듭니다.
+
+        배치는 메모리에 모으지 않고 임시 샤드 디렉터리에 바로 기록하면서 지문을 계산합니다.
+        resume=True이고 같은 레코드/인덱스/네임스페이스로 만든 작업이 이미 있으면
+        새로 만들지 않고 기존 작업을 반환합니다 (확인된 배치는 건너뜀). 다른 레코드의 작업이
+        아직 끝나지 않았으면(남은 배치나 dead-letter가 있음) 지우지 않고 UnfinishedJobError를
+        던지며, resume=False면 기존 작업을 버리고 새로 만듭니다.
+
+        stale_ids는 업로드를 마친 뒤 네임스페이스에서 지울 청크 ID, local_store는 업로드를 마친 뒤
+        로컬 청크 저장소로 반영할 코퍼스입니다. 기존 작업을 이어서 실행할 때 코퍼스는 새로 기록하고
+        stale_ids는 기존 작업의 값을 유지합니다 (로컬 저장소가 그대로이므로 같은 값).
+        """
+        staging_dir = os.path.join(path, STAGING_DIR)
+        _remove_shards(staging_dir)
+        os.makedirs(staging_dir, exist_ok=True)
+
+        digest = hashlib.blake2b(f"{index_name}\n{namespace}\n".encode("utf-8"), digest_size=16)
+        shards = []
+        batch_count = 0
+        record_count = 0
+        shard_file = None
+        try:
+            for number, batch in enumerate(batches):
+                if number % batches_per_shard == 0:
+                    if shard_file is not None:
+                        _close_synced(shard_file)
+                    shards.append(f"{number // batches_per_shard:05d}.jsonl")
+                    shard_file = open(os.path.join(staging_dir, shards[-1]), "w", encoding="utf-8")
+                line = json.dumps({"batch": number, "records": batch}, ensure_ascii=False) + "\n"
+                digest.update(line[:-1].encode("utf-8"))
+                shard_file.write(line)
+                batch_count += 1
+                record_count += len(batch)
+        finally:
+            if shard_file is not None:
+                _close_synced(shard_file)
+        fingerprint = digest.hexdigest()
+
+        if cls.exists(path):
+            try:
+                existing = cls.open(path)
+            except (OSError, ValueError):
+                existing = None
+            if existing is not None and existing.info.get("fingerprint") == fingerprint and resume:
+                _remove_shards(staging_dir)
+                if local_store is not None:
+                    existing._stage_local_store(local_store)
+                return existing
+            if existing is not None and resume and not existing.finished():
+                _remove_shards(staging_dir)
+                status = existing.status()
+                raise UnfinishedJobError(
+                    f"다른 레코드로 만든 업로드 작업이 끝나지 않았습니다: {path} "
+                    f"(네임스페이스 {existing.info.get('namespace')}, 남은 배치 {status['pending']}개, "
+                    f"실패 배치 {status['dead_letters']}개)")
+
+        cls._clear(path)
+        shard_dir = os.path.join(path, SHARD_DIR)
+        os.makedirs(shard_dir, exist_ok=True)
+        for name in shards:
+            os.replace(os.path.join(staging_dir, name), os.path.join(shard_dir, name))
+        _remove_shards(staging_dir)
+        job = cls(path, {})
+        if local_store is not None:
+            job._stage_local_store(local_store)
+
+        info = {
+            "format_version": JOB_FORMAT_VERSION,
+            "fingerprint": fingerprint,
+            "index_name": index_name,
+            "namespace": namespace,
+            "total_batches": batch_count,
+            "total_records": record_count,
+            "batches_per_shard": batches_per_shard,
+            "shards": shards,
+            "stale_ids": sorted(set(stale_ids)),
+            "created_at": time.time(),
+        }
+        # 작업 정보를 마지막에 기록하여 샤드가 모두 쓰인 작업만 유효하게 합니다.
+        _write_text(os.path.join(path, JOB_FILE), json.dumps(info, ensure_ascii=False, indent=2))
+        job.info = info
+        return job
+
+    @staticmethod
+    def _clear(path: str) -> None:
+        """이전 작업 파일만 지웁니다 (디렉터리의 다른 파일은 건드리지 않음)."""
+        for name in (JOB_FILE, ACK_LOG, DEAD_LETTER_FILE):
+            if os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+        _remove_shards(os.path.join(path, SHARD_DIR))
+        shutil.rmtree(os.path.join(path, LOCAL_STORE_DIR), ignore_errors=True)
+
+    def _stage_local_store(self, corpus: ChunkCorpus) -> None:
+        shutil.rmtree(os.path.join(self.path, LOCAL_STORE_DIR), ignore_errors=True)
+        corpus.save(os.path.join(self.path, LOCAL_STORE_DIR))
+
+    # ------------------------------------------------------------------
+    # 상태
+    # ------------------------------------------------------------------
+    @property
+    def total_batches(self) -> int:
+        return self.info["total_batches"]
+
+    @property
+    def stale_ids(self) -> List[str]:
+        """업로드를 마친 뒤 네임스페이스에서 지울 청크 ID"""
+        return self.info.get("stale_ids", [])
+
+    def local_store_path(self) -> Optional[str]:
+        """아직 로컬 청크 저장소로 반영하지 않은 코퍼스의 경로를 반환합니다. 없으면 None을 반환합니다."""
+        path = os.path.join(self.path, LOCAL_STORE_DIR)
+        return path if os.path.exists(os.path.join(path, META_FILE)) else None
+
+    def discard_local_store(self) -> None:
+        """로컬 청크 저장소로 반영한 코퍼스를 지웁니다."""
+        shutil.rmtree(os.path.join(self.path, LOCAL_STORE_DIR), ignore_errors=True)
+
+    def acked(self) -> Set[int]:
+        """확인된 배치 번호를 반환합니다. 기록 중 끊긴 마지막 줄은 무시합니다."""
+        acked = set()
+        path = os.path.join(self.path, ACK_LOG)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.endswith("\n") and line.strip().isdigit():
+                        acked.add(int(line))
+        return acked
+
+    def dead_letters(self) -> Dict[int, Dict]:
+        """아직 확인되지 않은 실패 배치 {배치 번호: 마지막 실패 기록}을 반환합니다."""
+        entries: Dict[int, Dict] = {}
+        path = os.path.join(self.path, DEAD_LETTER_FILE)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    entries[entry["batch"]] = entry
+        acked = self.acked()
+        return {number: entry for number, entry in entries.items() if number not in acked}
+
+    def pending(self, retry_dead_letters: bool = False) -> List[int]:
+        """올려야 할 배치 번호를 반환합니다.
+
+        기본값은 확인되지도 실패하지도 않은 배치이며, retry_dead_letters=True면
+        dead-letter 배치만 반환합니다.
+        """
+        dead = self.dead_letters()
+        if retry_dead_letters:
+            return sorted(dead)
+        acked = self.acked()
+        return [number for number in range(self.total_batches) if number not in acked and number not in dead]
+
+    def finished(self) -> bool:
+        """모든 배치가 확인되었는지 반환합니다."""
+        return len(self.acked()) >= self.total_batches
+
+    def status(self) -> Dict[str, int]:
+        acked = self.acked()
+        dead = self.dead_letters()
+        return {
+            "total_batches": self.total_batches,
+            "total_records": self.info["total_records"],
+            "acked": len(acked),
+            "dead_letters": len(dead),
+            "pending": self.total_batches - len(acked) - len(dead),
+        }
+
+    def iter_batches(self, numbers: Iterable[int]) -> Iterator[Tuple[int, List[Dict]]]:
+        """배치 번호 순서대로 (번호, 레코드 목록)을 샤드에서 읽어옵니다."""
+        wanted = sorted(set(numbers))
+        per_shard = self.info["batches_per_shard"]
+        index = 0
+        while index < len(wanted):
+            shard_number = wanted[index] // per_shard
+            shard_path = os.path.join(self.path, SHARD_DIR, self.info["shards"][shard_number])
+            in_shard = set()
+            while index < len(wanted) and wanted[index] // per_shard == shard_number:
+                in_shard.add(wanted[index])
+                index += 1
+            with open(shard_path, encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if entry["batch"] in in_shard:
+                        yield entry["batch"], entry["records"]
+
+    # ------------------------------------------------------------------
+    # 실행
+    # ------------------------------------------------------------------
+    def _ack(self, number: int) -> None:
+        with open(os.path.join(self.path, ACK_LOG), "a", encoding="utf-8") as f:
+            f.write(f"{number}\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _dead_letter(self, number: int, error: BaseException) -> None:
+        entry = {"batch": number, "error": f"{type(error).__name__}: {error}", "time": time.time()}
+        with open(os.path.join(self.path, DEAD_LETTER_FILE), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def run(self, upsert: Callable[..., Any], guard: Dependency, retry_dead_letters: bool = False,
+            max_consecutive_failures: int = 3) -> Dict[str, Any]:
+        """확인되지 않은 배치를 올립니다.
+
+        upsert(namespace=..., records=...)는 guard(속도 제한/재시도/서킷 브레이커)를 거쳐
+        호출됩니다. 재시도 끝에 실패한 배치는 dead-letter에 기록하고 계속 진행하며,
+        서킷이 열리거나 연속 실패가 max_consecutive_failures회에 이르면 중단합니다
+        (남은 배치는 다음 실행에서 이어서 올림).
+        """
+        with span("ingest.upload", sampled=True, **{"upload.namespace": self.info["namespace"],
+                                                   "upload.retry_dead_letters": retry_dead_letters}) as upload_span:
+            namespace = self.info["namespace"]
+            numbers = self.pending(retry_dead_letters)
+            stats = {"uploaded": 0, "failed": 0, "aborted": False, "skipped": self.total_batches - len(numbers)}
+            consecutive_failures = 0
+
+            for number, records in self.iter_batches(numbers):
+                started = time.monotonic()
+                try:
+                    with span("upload.batch", kind=SPAN_KIND_CLIENT,
+                              **{"upload.batch": number, "upload.records": len(records)}):
+                        guard.call(upsert, namespace=namespace, records=records)
+                except (CircuitOpenError, DeadlineExceeded) as e:
+                    print(f"업로드 중단 (배치 {number + 1}/{self.total_batches}): {e}")
+                    metrics.incr("upload.aborted")
+                    stats["aborted"] = True
+                    break
+                except Exception as e:
+                    print(f"배치 {number + 1}/{self.total_batches} 실패: {e}")
+                    self._dead_letter(number, e)
+                    metrics.incr("upload.batches_failed")
+                    stats["failed"] += 1
+                    consecutive_failures += 1
+                    if consecutive_failures >= max_consecutive_failures:
+                        print(f"연속 {consecutive_failures}회 실패로 업로드를 중단합니다.")
+                        metrics.incr("upload.aborted")
+                        stats["aborted"] = True
+                        break
+                    continue
+
+                self._ack(number)
+                metrics.incr("upload.batches_acked")
+                metrics.incr("upload.batch_seconds", time.monotonic() - started)
+                consecutive_failures = 0
+                stats["uploaded"] += 1
+                print(f"배치 {number + 1}/{self.total_batches}: {len(records)}개 레코드 업로드 완료")
+
+            stats.update(self.status())
+            upload_span.set_attributes({f"upload.{key}": value for key, value in stats.items()})
+            return stats
+
+
+def _close_synced(f) -> None:
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+
+
+def _remove_shards(shard_dir: str) -> None:
+    if os.path.isdir(shard_dir):
+        for name in os.listdir(shard_dir):
+            if name.endswith(".jsonl") or name.endswith(".tmp"):
+                os.remove(os.path.join(shard_dir, name))
+
+
+def _write_text(path: str, text: str) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
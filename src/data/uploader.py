@@ -4,14 +4,21 @@ Pinecone 업로드 모듈
 """
 
 import os
+import time
 from pinecone import Pinecone
-from typing import List, Dict
-from ..utils.config import get_config
+from typing import List, Dict, Iterable, Iterator, Optional, Union
+from ..utils.config import get_settings
+from ..utils.resilience import get_dependency
+from .chunk_store import ChunkCorpus, to_upsert_record
+from .upload_job import UnfinishedJobError, UploadJob
+
+# Pinecone delete 요청 한 번에 보낼 수 있는 최대 ID 수
+DELETE_BATCH_SIZE = 1000
 
 def setup_pinecone():
     """Pinecone 클라이언트를 설정합니다."""
-    config = get_config()
-    api_key = config["pinecone_api_key"]
+    settings = get_settings()
+    api_key = settings.pinecone_api_key
     
     if not api_key:
         raise ValueError("PINECONE_API_KEY 환경 변수가 설정되지 않았습니다.")
@@ -19,62 +26,183 @@ def setup_pinecone():
     pc = Pinecone(api_key=api_key)
     return pc
 
-def upload_to_pinecone(records: List[Dict], index_name: str = None, namespace: str = "default") -> bool:
-    """레코드들을 Pinecone에 업로드합니다."""
-    config = get_config()
+def _to_upsert_record(record: Dict) -> Dict:
+    """기존 레코드(id/content/metadata)를 upsert_records 형태로 변환합니다 (ChunkCorpus와 같은 규칙)."""
+    return to_upsert_record(record["id"], record["content"], record["metadata"])
+
+def _iter_upsert_batches(records: Union[ChunkCorpus, List[Dict]], batch_size: int) -> Iterator[List[Dict]]:
+    """업로드할 레코드를 배치 단위로 생성합니다.
+
+    컬럼형 코퍼스는 중간 레코드 딕셔너리 없이 upsert 형태를 바로 만듭니다.
+    """
+    if isinstance(records, ChunkCorpus):
+        yield from records.upsert_batches(batch_size)
+        return
+    
+    for i in range(0, len(records), batch_size):
+        yield [_to_upsert_record(record) for record in records[i:i+batch_size]]
+
+def _connect_index(index_name: str):
+    """업로드 대상 인덱스에 연결합니다."""
+    pc = setup_pinecone()
+    index_description = pc.describe_index(index_name)
+    index = pc.Index(host=index_description.host)
+    
+    print(f"인덱스 '{index_name}'에 연결되었습니다.")
+    print(f"호스트: {index_description.host}")
+    return index
+
+def upload_to_pinecone(records: Union[ChunkCorpus, List[Dict]], index_name: str = None, namespace: str = "default",
+                       job_path: Optional[str] = None, resume: bool = True, index=None,
+                       stale_ids: Iterable[str] = (), local_store: Optional[ChunkCorpus] = None) -> bool:
+    """레코드들을 Pinecone에 업로드합니다.
+
+    레코드는 먼저 job_path(기본값 UPLOAD_JOB_PATH)의 체크포인트 샤드에 기록됩니다.
+    resume=True이고 같은 레코드의 작업이 이미 있으면 확인된 배치는 건너뛰고 이어서 올립니다.
+    다른 레코드의 작업이 끝나지 않았으면 resume=True에서는 덮어쓰지 않고 False를 반환합니다.
+    모든 배치가 확인되면 True를 반환합니다.
+
+    stale_ids(업로드 뒤 지울 청크 ID)와 local_store(업로드 뒤 반영할 로컬 청크 저장소)는 작업에
+    함께 기록되며, 업로드를 마친 뒤 UploadJob.open(job_path)으로 읽어 처리합니다.
+    """
+    settings = get_settings()
     if index_name is None:
-        index_name = config["pinecone_index_name"]
+        index_name = settings.pinecone_index_name
+    if job_path is None:
+        job_path = settings.upload_job_path
     
     try:
-        pc = setup_pinecone()
-        
-        # 인덱스 연결
-        index_description = pc.describe_index(index_name)
-        index = pc.Index(host=index_description.host)
-        
-        print(f"인덱스 '{index_name}'에 연결되었습니다.")
-        print(f"호스트: {index_description.host}")
-        
-        # 배치 단위로 업로드
-        batch_size = 10
-        total_records = len(records)
-        
-        for i in range(0, total_records, batch_size):
-            batch = records[i:i+batch_size]
-            
-            # upsert_records를 위한 레코드 형태로 변환
-            records_to_upsert = []
-            for record in batch:
-                record_data = {
-                    "id": record["id"],  # _id 대신 id 사용
-                    "text": record["content"],  # content를 text로 변경
-                    "source": record["metadata"]["source"],
-                    "chunk_index": record["metadata"]["chunk_index"],
-                    "chunk_size": record["metadata"]["chunk_size"]
-                }
-                records_to_upsert.append(record_data)
-            
-            # field_mapping 제거하고 upsert_records 호출
-            index.upsert_records(
-                namespace=namespace,
-                records=records_to_upsert
-            )
-            
-            print(f"배치 {i//batch_size + 1}: {len(batch)}개 레코드 업로드 완료")
-        
-        return True
+        # 배치 단위 체크포인트 기록 (field_mapping 없이 upsert_records 형태)
+        job = UploadJob.create(job_path, _iter_upsert_batches(records, settings.upload_batch_size),
+                               index_name, namespace, resume=resume, stale_ids=stale_ids, local_store=local_store)
+        return _run_job(job, index=index)
         
+    except UnfinishedJobError as e:
+        print(f"업로드를 시작하지 않았습니다: {e}")
+        print("   --resume으로 이전 작업을 끝내거나, 버리려면 --restart로 다시 실행하세요.")
+        return False
     except Exception as e:
         print(f"업로드 중 오류 발생: {e}")
         import traceback
         traceback.print_exc()
         return False
 
+def resume_upload(job_path: Optional[str] = None, retry_dead_letters: bool = False, index=None) -> bool:
+    """중단된 업로드 작업을 이어서 실행합니다.
+
+    retry_dead_letters=True면 실패로 기록된 배치만 다시 올립니다.
+    """
+    settings = get_settings()
+    if job_path is None:
+        job_path = settings.upload_job_path
+    
+    if not UploadJob.exists(job_path):
+        print(f"이어서 실행할 업로드 작업이 없습니다: {job_path}")
+        return False
+    
+    try:
+        return _run_job(UploadJob.open(job_path), index=index, retry_dead_letters=retry_dead_letters)
+    except Exception as e:
+        print(f"업로드 중 오류 발생: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def _run_job(job: UploadJob, index=None, retry_dead_letters: bool = False) -> bool:
+    status = job.status()
+    print(f"업로드 작업: 배치 {status['total_batches']}개 중 확인 {status['acked']}개, "
+          f"실패 {status['dead_letters']}개, 남은 배치 {status['pending']}개")
+    
+    if index is None:
+        index = _connect_index(job.info["index_name"])
+    
+    # 속도 제한/재시도/서킷 브레이커 적용
+    stats = job.run(index.upsert_records, get_dependency("pinecone"), retry_dead_letters=retry_dead_letters)
+    
+    print(f"이번 실행: 업로드 {stats['uploaded']}개, 실패 {stats['failed']}개 배치 "
+          f"(누적 확인 {stats['acked']}/{stats['total_batches']})")
+    if stats["dead_letters"]:
+        print(f"⚠️ 실패한 배치 {stats['dead_letters']}개는 dead-letter 파일에 기록되었습니다 "
+              f"(--retry-dead-letters로 다시 시도)")
+    return stats["acked"] == stats["total_batches"]
+
+def delete_from_pinecone(ids: List[str], index_name: str = None, namespace: str = "default",
+                         index=None) -> bool:
+    """네임스페이스에서 청크 ID들을 삭제합니다 (중복 제거로 합쳐졌거나 더 이상 생성되지 않는 청크).
+
+    한 번에 DELETE_BATCH_SIZE개씩 삭제하며, 모두 삭제하면 True를 반환합니다.
+    """
+    if not ids:
+        return True
+    if index_name is None:
+        index_name = get_settings().pinecone_index_name
+    
+    try:
+        if index is None:
+            index = _connect_index(index_name)
+        guard = get_dependency("pinecone")
+        ids = list(ids)
+        for i in range(0, len(ids), DELETE_BATCH_SIZE):
+            guard.call(index.delete, ids=ids[i:i + DELETE_BATCH_SIZE], namespace=namespace)
+        return True
+    except Exception as e:
+        print(f"청크 삭제 중 오류 발생: {e}")
+        return False
+
+def list_chunk_ids(namespace: str = "default", prefix: str = "", index_name: str = None,
+                   index=None) -> Optional[List[str]]:
+    """네임스페이스에서 prefix로 시작하는 청크 ID를 모두 반환합니다. 조회에 실패하면 None을 반환합니다."""
+    if index_name is None:
+        index_name = get_settings().pinecone_index_name
+    
+    try:
+        if index is None:
+            index = _connect_index(index_name)
+        # index.list()는 ID 페이지를 돌려주는 생성기이므로 페이지를 모두 읽는 호출을 보호합니다.
+        return get_dependency("pinecone").call(
+            lambda: [chunk_id for page in index.list(prefix=prefix, namespace=namespace) for chunk_id in page])
+    except Exception as e:
+        print(f"청크 ID 조회 중 오류 발생: {e}")
+        return None
+
+def wait_for_namespace_count(expected: int, namespace: str = "default", index_name: str = None, index=None,
+                             timeout: Optional[float] = None, poll_interval: float = 2.0) -> bool:
+    """네임스페이스의 레코드 수가 expected가 될 때까지 기다립니다.
+
+    integrated inference 업로드/삭제는 확인(ack) 뒤에도 검색에 바로 반영되지 않으므로,
+    업로드 직후 검색 결과를 쓰는 단계(FAQ 사전 생성) 전에 호출합니다. timeout(기본값
+    INDEX_SYNC_TIMEOUT_SECONDS) 안에 맞으면 True, 아니면 False를 반환합니다.
+    """
+    settings = get_settings()
+    if index_name is None:
+        index_name = settings.pinecone_index_name
+    if timeout is None:
+        timeout = settings.index_sync_timeout_seconds
+    
+    try:
+        if index is None:
+            index = _connect_index(index_name)
+        guard = get_dependency("pinecone")
+        deadline = time.monotonic() + timeout
+        while True:
+            stats = guard.call(index.describe_index_stats)
+            summary = (stats.namespaces or {}).get(namespace)
+            count = summary.vector_count if summary is not None else 0
+            if count == expected:
+                return True
+            if time.monotonic() >= deadline:
+                print(f"⚠️ 네임스페이스 '{namespace}'의 레코드 수가 {count}개입니다 (기대 {expected}개)")
+                return False
+            time.sleep(poll_interval)
+    except Exception as e:
+        print(f"인덱스 반영 확인 중 오류 발생: {e}")
+        return False
+
 def get_index_stats(index_name: str = None) -> Dict:
     """인덱스 통계를 반환합니다."""
-    config = get_config()
+    settings = get_settings()
     if index_name is None:
-        index_name = config["pinecone_index_name"]
+        index_name = settings.pinecone_index_name
     
     try:
         pc = setup_pinecone()
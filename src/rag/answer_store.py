@@ -0,0 +1,163 @@
+"""
+Precomputed Answer Store
+미리 계산된 답변 저장소 모듈
+
+자주 묻는 질문(FAQ)에 대해 수집 단계에서 미리 생성한 답변을 보관합니다.
+- 질문(정규화) → 답변: 같은 질문이 들어오면 O(1) 조회로 바로 제공
+- 청크 ID → 답변: 검색 점수가 충분히 높고 최상위 청크에 대한 답변이 있으면 바로 제공
+  (같은 청크라도 다른 질문에 대한 답변일 수 있으므로, 답변을 만든 질문과 충분히 비슷할 때만)
+
+답변은 만든 네임스페이스별로 보관하며, 질의 시에는 검색 대상 네임스페이스의 답변만 사용합니다.
+각 답변은 근거 청크의 본문 해시를 함께 저장하며, 청크 내용이 바뀌면 해당 답변은
+더 이상 제공되지 않고 다음 수집 때 다시 생성됩니다.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Sequence
+
+from ..data.chunk_store import DEFAULT_NAMESPACE, ChunkCorpus
+from ..data.dedup import jaccard, shingle_hashes
+from ..utils.text import normalize_query
+
+# 질문 유사도 비교에 쓰는 문자 n-gram 크기 (짧은 한국어 질문에 맞춰 2글자)
+QUESTION_SHINGLE_SIZE = 2
+
+
+def question_similarity(a: str, b: str) -> float:
+    """정규화한 두 질문의 문자 2-gram Jaccard 유사도(0~1)를 계산합니다."""
+    return jaccard(shingle_hashes(normalize_query(a), QUESTION_SHINGLE_SIZE),
+                   shingle_hashes(normalize_query(b), QUESTION_SHINGLE_SIZE))
+
+
+class AnswerStore:
+    """질문/청크 ID → 미리 계산된 답변 저장소 (JSON 파일)
+
+    by_question, by_chunk는 {네임스페이스: {키: 답변}} 형태입니다.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.by_question: Dict[str, Dict[str, Dict]] = {}
+        self.by_chunk: Dict[str, Dict[str, Dict]] = {}
+
+    @classmethod
+    def load(cls, path: str) -> "AnswerStore":
+        """저장소 파일을 읽습니다. 파일이 없으면 빈 저장소를 반환합니다.
+
+        네임스페이스 구분이 없던 이전 형식의 답변은 DEFAULT_NAMESPACE의 답변으로 읽습니다.
+        """
+        store = cls(path)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if "namespaces" in data:
+                for namespace, sections in data["namespaces"].items():
+                    store.by_question[namespace] = sections.get("by_question", {})
+                    store.by_chunk[namespace] = sections.get("by_chunk", {})
+            else:
+                store.by_question[DEFAULT_NAMESPACE] = data.get("by_question", {})
+                store.by_chunk[DEFAULT_NAMESPACE] = data.get("by_chunk", {})
+            for namespace, entries in list(store.by_question.items()) + list(store.by_chunk.items()):
+                for entry in entries.values():
+                    entry.setdefault("namespace", namespace)
+        return store
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self.by_question.values())
+
+    def get_for_question(self, query: str, namespaces: Sequence[str] = (DEFAULT_NAMESPACE,)) -> Optional[Dict]:
+        """질문에 대한 미리 계산된 답변을 반환합니다 (namespaces 순서대로 찾음). 없으면 None을 반환합니다."""
+        key = normalize_query(query)
+        for namespace in namespaces:
+            entry = self.by_question.get(namespace, {}).get(key)
+            if entry is not None:
+                return entry
+        return None
+
+    def get_for_chunk(self, chunk_id: str, namespace: str = DEFAULT_NAMESPACE, query: Optional[str] = None,
+                      min_similarity: float = 0.0) -> Optional[Dict]:
+        """청크에 대한 미리 계산된 답변을 반환합니다. 없으면 None을 반환합니다.
+
+        query를 주면 답변을 만든 질문과의 유사도가 min_similarity 이상일 때만 반환합니다
+        (질문이 기록되지 않은 답변은 반환하지 않음).
+        """
+        entry = self.by_chunk.get(namespace, {}).get(chunk_id)
+        if entry is None or query is None:
+            return entry
+        question = entry.get("question")
+        if question is None or question_similarity(query, question) < min_similarity:
+            return None
+        return entry
+
+    def put_for_question(self, question: str, answer: str, source_ids: List[str],
+                         source_hashes: Dict[str, str], namespace: str = DEFAULT_NAMESPACE) -> Dict:
+        """질문에 대한 답변을 저장하고, 최상위 근거 청크에도 연결합니다."""
+        entry = {
+            "question": question,
+            "answer": answer,
+            "source_ids": list(source_ids),
+            "source_hashes": dict(source_hashes),
+            "namespace": namespace,
+        }
+        self.by_question.setdefault(namespace, {})[normalize_query(question)] = entry
+        if source_ids:
+            self.by_chunk.setdefault(namespace, {})[source_ids[0]] = entry
+        return entry
+
+    def put_for_chunk(self, chunk_id: str, answer: str, source_ids: List[str],
+                      source_hashes: Optional[Dict[str, str]] = None, namespace: str = DEFAULT_NAMESPACE,
+                      question: Optional[str] = None) -> None:
+        """청크에 대한 답변을 저장합니다. question은 답변을 만든 질문입니다 (질문 유사도 확인용)."""
+        self.by_chunk.setdefault(namespace, {})[chunk_id] = {
+            "question": question,
+            "answer": answer,
+            "source_ids": list(source_ids),
+            "source_hashes": dict(source_hashes or {}),
+            "namespace": namespace,
+        }
+
+    @staticmethod
+    def is_fresh(entry: Dict, corpus: ChunkCorpus) -> bool:
+        """답변의 근거 청크가 (답변을 만든 네임스페이스의) 코퍼스에 그대로 있는지 확인합니다."""
+        namespace = entry.get("namespace", DEFAULT_NAMESPACE)
+        for chunk_id, expected in entry.get("source_hashes", {}).items():
+            position = corpus.position(chunk_id, namespace)
+            if position is None or corpus.content_hash(position) != expected:
+                return False
+        return True
+
+    def prune_stale(self, corpus: ChunkCorpus) -> int:
+        """근거 청크가 바뀌었거나 사라진 답변을 제거하고 제거한 질문 수를 반환합니다."""
+        removed = 0
+        for namespace, entries in self.by_question.items():
+            stale = [key for key, entry in entries.items() if not self.is_fresh(entry, corpus)]
+            for key in stale:
+                del entries[key]
+            removed += len(stale)
+        for namespace, entries in self.by_chunk.items():
+            self.by_chunk[namespace] = {chunk_id: entry for chunk_id, entry in entries.items()
+                                        if self.is_fresh(entry, corpus)}
+        return removed
+
+    def retain_questions(self, questions: List[str], namespace: str = DEFAULT_NAMESPACE) -> None:
+        """namespace에서 주어진 질문 목록에 없는 FAQ 답변을 제거합니다 (다른 네임스페이스는 유지)."""
+        keep = {normalize_query(question) for question in questions}
+        entries = {key: entry for key, entry in self.by_question.get(namespace, {}).items() if key in keep}
+        self.by_question[namespace] = entries
+        self.by_chunk[namespace] = {entry["source_ids"][0]: entry for entry in entries.values()
+                                    if entry["source_ids"]}
+
+    def save(self, path: Optional[str] = None) -> None:
+        """저장소를 JSON 파일로 저장합니다."""
+        path = path or self.path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        namespaces = {
+            namespace: {"by_question": self.by_question.get(namespace, {}),
+                        "by_chunk": self.by_chunk.get(namespace, {})}
+            for namespace in dict.fromkeys(list(self.by_question) + list(self.by_chunk))
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"namespaces": namespaces}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
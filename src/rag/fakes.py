@@ -0,0 +1,356 @@
+"""
+Local Fake Services
+로컬 가짜 Pinecone/OpenAI 서비스 모듈
+
+네트워크 없이 RAG 시스템을 실행/부하 테스트할 수 있도록 Pinecone 인덱스와
+OpenAI 클라이언트의 응답 구조를 흉내 냅니다. 지연 시간, 429 오류, 타임아웃을
+확률적으로 주입할 수 있습니다.
+"""
+
+import math
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from ..data.chunk_store import ChunkCorpus, META_FILE
+from ..utils.config import get_settings
+from ..utils.deadline import Deadline
+from ..utils.resilience import Dependency, get_dependency
+from .generation import MODEL, Generation, GenerationBackend, build_messages
+
+
+class FakeServiceError(Exception):
+    """가짜 서비스가 주입한 HTTP 오류"""
+
+    def __init__(self, status_code: int, message: str = ""):
+        super().__init__(message or f"fake service error {status_code}")
+        self.status_code = status_code
+
+
+def latency_distribution(spec: Union[float, str, Callable[[random.Random], float], None]) -> Callable[[random.Random], float]:
+    """지연 시간(초) 분포를 난수 생성기를 받아 표본을 돌려주는 함수로 만듭니다.
+
+    spec 형식:
+        0.5 / "0.5"                고정 지연
+        "uniform:0.2,0.8"          최소, 최대
+        "exp:0.5"                  평균 (지수 분포)
+        "normal:0.5,0.1"           평균, 표준편차 (0 미만은 0)
+        "lognormal:0.4,0.6"        중앙값, 로그 표준편차 (긴 꼬리; 실제 API 지연과 비슷)
+    """
+    if spec is None:
+        return lambda rng: 0.0
+    if callable(spec):
+        return spec
+    if isinstance(spec, (int, float)):
+        return lambda rng: float(spec)
+
+    kind, _, params = spec.partition(":")
+    if not params:
+        value = float(kind)
+        return lambda rng: value
+    try:
+        values = [float(value) for value in params.split(",")]
+        if kind == "uniform":
+            low, high = values
+            return lambda rng: rng.uniform(low, high)
+        if kind == "exp":
+            (mean,) = values
+            return lambda rng: rng.expovariate(1 / mean) if mean > 0 else 0.0
+        if kind == "normal":
+            mean, std = values
+            return lambda rng: max(0.0, rng.gauss(mean, std))
+        if kind == "lognormal":
+            median, sigma = values
+            return lambda rng: rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+    except ValueError:
+        pass
+    raise ValueError(f"지연 시간 분포 형식이 올바르지 않습니다: {spec}")
+
+
+class FaultInjector:
+    """호출마다 지연과 오류를 주입합니다.
+
+    latency: 지연(초) 또는 분포 (latency_distribution의 spec 형식)
+    error_rate: 429 오류를 던질 확률
+    timeout_rate: TimeoutError를 던질 확률
+    """
+
+    def __init__(self, latency: Union[float, str, Callable[[random.Random], float]] = 0.0,
+                 error_rate: float = 0.0, timeout_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency_distribution(latency)
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def before_call(self, timeout: Optional[float] = None) -> None:
+        """지연과 오류를 주입합니다. timeout(클라이언트 HTTP 타임아웃)보다 지연이 길면 그만큼만
+        기다린 뒤 TimeoutError를 던집니다."""
+        with self._lock:
+            self.calls += 1
+            roll = self._random.random()
+            latency = self.latency(self._random)
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("Request timed out (client timeout)")
+        if latency > 0:
+            time.sleep(latency)
+        if roll < self.error_rate:
+            raise FakeServiceError(429, "Too Many Requests (injected)")
+        if roll < self.error_rate + self.timeout_rate:
+            raise TimeoutError("Request timed out (injected)")
+
+
+def _bigrams(text: str) -> set:
+    text = "".join(text.split())
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _match_condition(value, condition) -> bool:
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+    # 목록 필드(articles 등)는 원소 중 하나라도 조건을 만족하면 일치
+    values = value if isinstance(value, list) else [value]
+    for op, operand in condition.items():
+        if op == "$eq":
+            ok = operand in values
+        elif op == "$ne":
+            ok = operand not in values
+        elif op == "$in":
+            ok = any(v in operand for v in values)
+        elif op == "$nin":
+            ok = not any(v in operand for v in values)
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            compare = {"$gt": lambda v: v > operand, "$gte": lambda v: v >= operand,
+                       "$lt": lambda v: v < operand, "$lte": lambda v: v <= operand}[op]
+            ok = any(isinstance(v, (int, float)) and compare(v) for v in values)
+        elif op == "$exists":
+            ok = (value is not None) == bool(operand)
+        else:
+            raise FakeServiceError(400, f"지원하지 않는 필터 연산자입니다: {op}")
+        if not ok:
+            return False
+    return True
+
+
+def matches_filter(record: Dict, filter: Optional[Dict]) -> bool:
+    """Pinecone 메타데이터 필터 문법($eq, $in, $gte, $and, $or 등)으로 레코드를 검사합니다."""
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(record, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(record, sub) for sub in condition):
+                return False
+        elif not _match_condition(record.get(key), condition):
+            return False
+    return True
+
+
+class FakeIndex:
+    """Pinecone 인덱스(search_records/fetch/upsert_records/list/delete)를 흉내 내는 메모리 인덱스
+
+    점수는 질문과 청크의 문자 바이그램 자카드 유사도이며, SearchQuery의 filter로
+    메타데이터 필터를 적용합니다.
+    """
+
+    def __init__(self, corpus: Optional[ChunkCorpus] = None, faults: Optional[FaultInjector] = None):
+        self.faults = faults or FaultInjector()
+        self.records: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.Lock()
+        if corpus is not None:
+            # 청크 저장소처럼 각 청크를 자신의 네임스페이스에 넣습니다.
+            for namespace in corpus.namespaces:
+                self.upsert_records(namespace=namespace, records=[
+                    corpus.upsert_record(i) for i in range(len(corpus)) if corpus.namespace(i) == namespace])
+
+    def upsert_records(self, namespace: str, records: Sequence[Dict]) -> None:
+        self.faults.before_call()
+        with self._lock:
+            target = self.records.setdefault(namespace, {})
+            for record in records:
+                stored = dict(record)
+                stored["_bigrams"] = _bigrams(stored.get("text", ""))
+                target[stored["id"]] = stored
+
+    def search_records(self, namespace: str, query, fields: Optional[List[str]] = None, **kwargs):
+        self.faults.before_call()
+        query_grams = _bigrams(query.inputs["text"])
+        filter = getattr(query, "filter", None)
+
+        scored = []
+        for record in self.records.get(namespace, {}).values():
+            if not matches_filter(record, filter):
+                continue
+            grams = record["_bigrams"]
+            union = len(query_grams | grams)
+            score = len(query_grams & grams) / union if union else 0.0
+            scored.append((score, record))
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        hits = []
+        for score, record in scored[:query.top_k]:
+            hit_fields = {key: value for key, value in record.items()
+                          if key not in ("id", "_bigrams") and (fields is None or "*" in fields or key in fields)}
+            hits.append(SimpleNamespace(_id=record["id"], _score=score, fields=hit_fields))
+        return SimpleNamespace(result=SimpleNamespace(hits=hits))
+
+    def fetch(self, ids: List[str], namespace: str = "default"):
+        self.faults.before_call()
+        stored = self.records.get(namespace, {})
+        vectors = {}
+        for chunk_id in ids:
+            if chunk_id in stored:
+                metadata = {key: value for key, value in stored[chunk_id].items() if key not in ("id", "_bigrams")}
+                vectors[chunk_id] = SimpleNamespace(id=chunk_id, metadata=metadata)
+        return SimpleNamespace(vectors=vectors)
+
+    def list(self, prefix: Optional[str] = None, namespace: str = "default", limit: int = 100):
+        """ID 목록을 limit개씩 페이지로 돌려줍니다 (Pinecone Index.list와 같은 생성기)."""
+        self.faults.before_call()
+        ids = sorted(chunk_id for chunk_id in self.records.get(namespace, {}) if chunk_id.startswith(prefix or ""))
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def delete(self, ids: List[str], namespace: str = "default") -> None:
+        self.faults.before_call()
+        with self._lock:
+            stored = self.records.get(namespace, {})
+            for chunk_id in ids:
+                stored.pop(chunk_id, None)
+
+    def describe_index_stats(self):
+        namespaces = {name: SimpleNamespace(vector_count=len(records)) for name, records in self.records.items()}
+        return SimpleNamespace(total_vector_count=sum(len(r) for r in self.records.values()),
+                               namespaces=namespaces)
+
+
+class _FakeCompletions:
+    def __init__(self, owner: "FakeOpenAIClient"):
+        self._owner = owner
+
+    def create(self, model: str, messages: List[Dict], timeout: Optional[float] = None, **kwargs):
+        self._owner.faults.before_call(timeout)
+        user_prompt = messages[-1]["content"]
+        prompt_tokens = sum(len(message["content"]) for message in messages) // 2
+        answer = f"[fake:{model}] 참고자료에 따르면 다음과 같습니다. {user_prompt[:120]}"
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=len(answer) // 2,
+            total_tokens=prompt_tokens + len(answer) // 2,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=0),
+        )
+        message = SimpleNamespace(role="assistant", content=answer)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=usage)
+
+
+class FakeOpenAIClient:
+    """openai.OpenAI의 chat.completions.create만 흉내 내는 가짜 클라이언트"""
+
+    def __init__(self, faults: Optional[FaultInjector] = None):
+        self.faults = faults or FaultInjector()
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
+
+
+class FakeGenerationBackend(GenerationBackend):
+    """네트워크 없이 답변을 만드는 가짜 생성 백엔드
+
+    실제 백엔드와 같은 메시지를 만들고, 이미 본 system 접두사의 토큰은 cached_tokens로
+    보고하여 제공자 측 프롬프트 캐시를 흉내 냅니다. 토큰 수는 글자 수의 절반으로 추정합니다.
+    on_delta를 주면 답변을 STREAM_PIECE_CHARS 글자씩 나누어 전달합니다.
+    """
+
+    name = "fake"
+    STREAM_PIECE_CHARS = 16
+
+    def __init__(self, faults: Optional[FaultInjector] = None, guard: Optional[Dependency] = None,
+                 model: str = MODEL):
+        self.faults = faults or FaultInjector()
+        self.guard = guard
+        self.model = model
+        self._seen_prefixes = set()
+        self._lock = threading.Lock()
+
+    def _complete(self, question: str, context: str, timeout: Optional[float] = None,
+                  on_delta: Optional[Callable[[str], None]] = None) -> Generation:
+        self.faults.before_call(timeout)
+        system, user = build_messages(question, context)
+        with self._lock:
+            cached = len(system["content"]) // 2 if system["content"] in self._seen_prefixes else 0
+            self._seen_prefixes.add(system["content"])
+        answer = f"[fake:{self.model}] 참고자료에 따르면 다음과 같습니다. {user['content'][:120]}"
+        prompt_tokens = (len(system["content"]) + len(user["content"])) // 2
+        completion_tokens = len(answer) // 2
+        if on_delta is not None:
+            for start in range(0, len(answer), self.STREAM_PIECE_CHARS):
+                on_delta(answer[start:start + self.STREAM_PIECE_CHARS])
+        return Generation(answer, self.name, {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "cached_tokens": cached,
+        })
+
+    def generate(self, question: str, context: str, deadline: Optional[Deadline] = None,
+                 on_delta: Optional[Callable[[str], None]] = None) -> Generation:
+        if self.guard is None:
+            return self._complete(question, context, deadline.remaining() if deadline is not None else None,
+                                  on_delta)
+        return self.guard.call(self._complete, question, context, deadline=deadline, timeout_arg="timeout",
+                               on_delta=on_delta)
+
+
+# 저장된 청크 저장소가 없을 때 사용하는 예시 약관 청크
+SAMPLE_CHUNKS = [
+    "제1조(목적) 이 약관은 보험계약자와 회사 사이의 권리와 의무를 정하는 것을 목적으로 합니다.",
+    "제15조(보험계약의 성립) 보험계약은 보험계약자의 청약과 회사의 승낙으로 이루어집니다. 회사는 청약을 받은 날부터 30일 이내에 승낙 또는 거절하여야 합니다.",
+    "제17조(청약의 철회) 보험계약자는 보험증권을 받은 날부터 15일 이내에 그 청약을 철회할 수 있습니다. 다만, 청약한 날부터 30일이 초과된 계약은 철회할 수 없습니다.",
+    "제27조(보험료의 납입이 연체되는 경우 납입최고와 계약의 해지) 보험료 납입이 연체되는 경우 회사는 14일 이상의 납입최고기간을 정하여 납입을 최고하고, 기간 안에 납입되지 않으면 계약이 해지됩니다.",
+    "제9조(보험금의 지급절차) 회사는 보험금 청구서류를 접수한 날부터 3영업일 이내에 보험금을 지급합니다. 조사가 필요한 경우 30영업일 이내에서 지급기일을 정할 수 있습니다.",
+    "제33조(계약자의 임의해지) 보험계약자는 손해가 발생하기 전에 언제든지 계약을 해지할 수 있으며, 이 경우 회사는 해지환급금을 돌려드립니다.",
+]
+
+
+def sample_corpus() -> ChunkCorpus:
+    """예시 청크로 쪽/조항 메타데이터가 있는 코퍼스를 만듭니다 (청크 하나가 한 쪽)."""
+    from ..data.ingestion import create_records_from_chunks, find_article_headings
+
+    return create_records_from_chunks(
+        SAMPLE_CHUNKS,
+        doc_id="sample",
+        pages=[(i, i) for i in range(1, len(SAMPLE_CHUNKS) + 1)],
+        articles=[[article for _, article in find_article_headings(chunk)] for chunk in SAMPLE_CHUNKS],
+    )
+
+
+def build_fake_system(corpus: Optional[ChunkCorpus] = None, search_latency: Union[float, str] = 0.0,
+                      llm_latency: Union[float, str] = 0.0, error_rate: float = 0.0, timeout_rate: float = 0.0,
+                      seed: Optional[int] = None):
+    """가짜 Pinecone/OpenAI를 사용하는 InsuranceRAGSystem을 만듭니다.
+
+    search_latency/llm_latency는 고정 지연(초) 또는 분포 문자열입니다 (예: "lognormal:0.8,0.4").
+
+    corpus가 없으면 로컬 청크 저장소(CHUNK_STORE_PATH)를, 그것도 없으면 예시 청크를 사용합니다.
+    """
+    from .system import InsuranceRAGSystem
+
+    if corpus is None:
+        path = get_settings().chunk_store_path
+        if os.path.exists(os.path.join(path, META_FILE)):
+            corpus = ChunkCorpus.load(path)
+        else:
+            corpus = sample_corpus()
+
+    index = FakeIndex(corpus, FaultInjector(search_latency, error_rate, timeout_rate, seed))
+    generator = FakeGenerationBackend(FaultInjector(llm_latency, error_rate, timeout_rate, seed),
+                                      guard=get_dependency("openai"))
+    system = InsuranceRAGSystem(index=index, content_store=corpus, generator=generator)
+    # 가짜 모드에서는 LangSmith 추적을 하지 않으므로 LangChain 경로로 표시하지 않습니다.
+    system.langsmith_enabled = False
+    return system
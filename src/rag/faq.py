@@ -0,0 +1,68 @@
+"""
+FAQ Answer Precomputation
+FAQ 답변 사전 생성 모듈
+
+설정된 질문 목록을 일반 ask() 파이프라인으로 답변하여 근거 청크 ID/해시와 함께
+AnswerStore에 저장합니다. 근거 청크가 바뀌지 않은 답변은 다시 생성하지 않습니다.
+"""
+
+import os
+from typing import Dict, List
+
+from ..data.chunk_store import DEFAULT_NAMESPACE
+from .answer_store import AnswerStore
+
+
+def load_faq_questions(path: str) -> List[str]:
+    """FAQ 질문 파일을 읽습니다 (한 줄에 한 질문, 빈 줄과 #으로 시작하는 줄은 무시)."""
+    if not os.path.exists(path):
+        return []
+
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                questions.append(line)
+    return questions
+
+
+def build_faq_store(rag, questions: List[str], store: AnswerStore = None,
+                    namespace: str = DEFAULT_NAMESPACE) -> Dict[str, int]:
+    """질문 목록의 답변을 namespace만 검색하여 생성하고, 저장소의 그 네임스페이스에 저장한 뒤 통계를 반환합니다.
+
+    rag.content_store(방금 저장한 청크 저장소) 기준으로 근거 청크가 그대로인 답변은 재사용합니다.
+    다른 네임스페이스의 답변은 건드리지 않습니다.
+    """
+    if store is None:
+        store = rag.answer_store
+    corpus = rag.content_store
+    stats = {"built": 0, "reused": 0, "failed": 0}
+
+    for question in questions:
+        existing = store.get_for_question(question, [namespace])
+        if existing is not None and corpus is not None and store.is_fresh(existing, corpus):
+            stats["reused"] += 1
+            continue
+
+        # 저장소의 기존 답변을 쓰지 않고 항상 새로 생성합니다.
+        result = rag.ask(question, use_langchain=False, use_precomputed=False, namespaces=[namespace])
+        if result.get("gate") or result.get("timed_out") or result.get("fallback") or not result["sources"]:
+            print(f"⚠️ FAQ 답변 생성 실패: {question}")
+            stats["failed"] += 1
+            continue
+
+        source_ids = [source["id"] for source in result["sources"]]
+        source_hashes = {}
+        if corpus is not None:
+            for chunk_id in source_ids:
+                position = corpus.position(chunk_id, namespace)
+                if position is not None:
+                    source_hashes[chunk_id] = corpus.content_hash(position)
+
+        store.put_for_question(question, result["answer"], source_ids, source_hashes, namespace)
+        stats["built"] += 1
+
+    store.retain_questions(questions, namespace)
+    store.save()
+    return stats
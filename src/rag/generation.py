@@ -0,0 +1,219 @@
+"""
+Answer Generation Backends
+답변 생성 백엔드 모듈
+
+OpenAI 직접 호출, LangChain, 로컬 가짜(fakes.FakeGenerationBackend) 백엔드가 같은
+인터페이스(generate)와 같은 프롬프트를 사용합니다. 고정 지침은 매 요청 바이트 단위로 같은
+system 메시지로 맨 앞에 두어 제공자 측 프롬프트 캐시(같은 접두사 재사용)를 받을 수 있게 하고,
+요청마다 바뀌는 참고자료와 질문은 그 뒤의 user 메시지에만 넣습니다.
+
+on_delta를 주면 백엔드는 스트리밍으로 생성하며 받은 글자 조각마다 on_delta를 호출하고,
+끝나면 전체 답변을 같은 Generation으로 반환합니다.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from ..utils.deadline import Deadline
+from ..utils.resilience import Dependency
+
+# 생성 모델 설정
+MODEL = "gpt-4o-mini"
+TEMPERATURE = 0.1
+MAX_TOKENS = 500
+
+# 프롬프트와 출처에 사용하는 상위 청크 수, 청크당 최대 글자 수
+MAX_CONTEXT_CHUNKS = 3
+MAX_CHUNK_CHARS = 1000
+
+# 모든 백엔드가 공유하는 고정 지침 (요청마다 바뀌는 값을 넣지 않습니다)
+SYSTEM_PROMPT = """당신은 전문적인 보험 상담사입니다.
+제공된 LIG손해보험 약관 내용을 바탕으로 정확하고 도움이 되는 답변을 제공해주세요.
+
+답변 지침:
+1. 제공된 참고자료의 내용을 바탕으로만 답변하세요
+2. 답변은 한국어로 명확하고 이해하기 쉽게 작성하세요
+3. 구체적인 조항이나 절차가 있다면 정확히 인용하세요
+4. 만약 제공된 자료에서 정확한 답변을 찾을 수 없다면, 그 점을 명시하고 보험회사에 직접 문의하도록 안내하세요
+5. 답변은 3-4문장으로 간결하게 작성하세요"""
+
+USER_PROMPT_TEMPLATE = """다음 LIG손해보험 약관 내용을 참고하여 질문에 답변해주세요:
+
+{context}
+
+질문: {question}
+
+답변:"""
+
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens", "cached_tokens")
+
+
+class StreamInterrupted(Exception):
+    """조각 일부를 이미 전달한 뒤 스트리밍 생성이 실패했을 때 발생합니다.
+
+    다시 생성하면 전달한 조각이 중복되므로 재시도 대상 오류로 분류되지 않는 이름을 씁니다.
+    """
+
+
+@dataclass
+class Generation:
+    """생성 결과. usage는 토큰 사용량(USAGE_FIELDS), fallback은 생성 실패로 대신 답했는지 여부"""
+
+    text: str
+    backend: str
+    usage: Dict[str, int] = field(default_factory=dict)
+    fallback: bool = False
+
+
+def build_context(contexts: List[Dict], max_context_length: int, max_chunks: int = MAX_CONTEXT_CHUNKS,
+                  max_chunk_chars: int = MAX_CHUNK_CHARS) -> str:
+    """상위 청크 본문을 "[참고자료 N]" 블록으로 이어 붙이고 max_context_length 글자로 자릅니다."""
+    context_text = "".join(
+        f"[참고자료 {i + 1}]\n{ctx.get('content', '')[:max_chunk_chars]}\n\n"
+        for i, ctx in enumerate(contexts[:max_chunks])
+    )
+    if len(context_text) > max_context_length:
+        context_text = context_text[:max_context_length] + "..."
+    return context_text
+
+
+def build_messages(question: str, context: str) -> List[Dict[str, str]]:
+    """고정 system 메시지 + 요청별 user 메시지를 만듭니다."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": USER_PROMPT_TEMPLATE.format(context=context, question=question)},
+    ]
+
+
+def _usage(prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0,
+           total_tokens: Optional[int] = None) -> Dict[str, int]:
+    prompt_tokens = int(prompt_tokens or 0)
+    completion_tokens = int(completion_tokens or 0)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": int(total_tokens or prompt_tokens + completion_tokens),
+        "cached_tokens": int(cached_tokens or 0),
+    }
+
+
+def _collect(stream: Iterable[Any], text_of: Callable[[Any], str], on_delta: Callable[[str], None]) -> List[Any]:
+    """스트림을 끝까지 읽으며 글자가 있는 조각마다 on_delta를 호출하고 받은 조각 목록을 반환합니다."""
+    chunks = []
+    emitted = False
+    try:
+        for chunk in stream:
+            chunks.append(chunk)
+            piece = text_of(chunk)
+            if piece:
+                emitted = True
+                on_delta(piece)
+    except Exception as e:
+        if emitted:
+            raise StreamInterrupted(f"스트리밍 생성 중단: {type(e).__name__}: {e}") from e
+        raise
+    return chunks
+
+
+class GenerationBackend:
+    """답변 생성 백엔드 인터페이스. 클라이언트는 만들 때 한 번 준비하여 계속 재사용합니다."""
+
+    name = "base"
+
+    def generate(self, question: str, context: str, deadline: Optional[Deadline] = None,
+                 on_delta: Optional[Callable[[str], None]] = None) -> Generation:
+        """참고자료(context)와 질문으로 답변을 생성합니다. 실패하면 예외를 그대로 던집니다.
+
+        on_delta를 주면 생성되는 글자 조각마다 호출합니다.
+        """
+        raise NotImplementedError
+
+
+class OpenAIBackend(GenerationBackend):
+    """openai.OpenAI chat.completions를 직접 호출하는 백엔드"""
+
+    name = "openai"
+
+    def __init__(self, client: Any, guard: Dependency, model: str = MODEL, temperature: float = TEMPERATURE,
+                 max_tokens: int = MAX_TOKENS):
+        self.client = client
+        self.guard = guard
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    def _stream(self, on_delta: Callable[[str], None], **kwargs):
+        """스트리밍으로 생성하고 (답변, 마지막 조각의 사용량)을 반환합니다."""
+        chunks = _collect(
+            self.client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **kwargs),
+            lambda chunk: "".join(choice.delta.content or "" for choice in chunk.choices),
+            on_delta,
+        )
+        text = "".join(choice.delta.content or "" for chunk in chunks for choice in chunk.choices)
+        usage = next((chunk.usage for chunk in reversed(chunks) if getattr(chunk, "usage", None)), None)
+        return text, usage
+
+    def generate(self, question: str, context: str, deadline: Optional[Deadline] = None,
+                 on_delta: Optional[Callable[[str], None]] = None) -> Generation:
+        request = {
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "messages": build_messages(question, context),
+        }
+        # 재시도마다 그 시점의 남은 시간을 HTTP 타임아웃으로 사용
+        if on_delta is not None:
+            text, usage = self.guard.call(self._stream, on_delta, deadline=deadline, timeout_arg="timeout", **request)
+        else:
+            response = self.guard.call(self.client.chat.completions.create, deadline=deadline,
+                                       timeout_arg="timeout", **request)
+            text, usage = response.choices[0].message.content, getattr(response, "usage", None)
+        details = getattr(usage, "prompt_tokens_details", None)
+        return Generation(
+            text.strip(),
+            self.name,
+            _usage(getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0),
+                   getattr(details, "cached_tokens", 0), getattr(usage, "total_tokens", None)),
+        )
+
+
+class LangChainBackend(GenerationBackend):
+    """LangChain 체인(system + human 프롬프트 | ChatOpenAI)으로 생성하는 백엔드 (LangSmith 추적)"""
+
+    name = "langchain"
+
+    def __init__(self, llm: Any, guard: Dependency):
+        self.llm = llm
+        self.guard = guard
+        # 고정 지침은 템플릿 변수가 없는 system 메시지로 두어 요청마다 같은 접두사가 되게 합니다.
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", SYSTEM_PROMPT),
+            ("human", USER_PROMPT_TEMPLATE),
+        ])
+        self.chain = self.prompt | self.llm
+
+    def _invoke(self, inputs: Dict[str, str], timeout: Optional[float] = None,
+                on_delta: Optional[Callable[[str], None]] = None):
+        chain = self.chain if timeout is None else self.prompt | self.llm.bind(timeout=timeout)
+        if on_delta is None:
+            return chain.invoke(inputs)
+        # 스트리밍 조각(AIMessageChunk)은 더하면 하나의 메시지(사용량 포함)가 됩니다.
+        chunks = _collect(chain.stream(inputs), lambda chunk: chunk.content, on_delta)
+        message = chunks[0]
+        for chunk in chunks[1:]:
+            message = message + chunk
+        return message
+
+    def generate(self, question: str, context: str, deadline: Optional[Deadline] = None,
+                 on_delta: Optional[Callable[[str], None]] = None) -> Generation:
+        message = self.guard.call(self._invoke, {"context": context, "question": question}, deadline=deadline,
+                                  timeout_arg="timeout", on_delta=on_delta)
+        usage = getattr(message, "usage_metadata", None) or {}
+        return Generation(
+            message.content.strip(),
+            self.name,
+            _usage(usage.get("input_tokens", 0), usage.get("output_tokens", 0),
+                   (usage.get("input_token_details") or {}).get("cache_read", 0), usage.get("total_tokens")),
+        )
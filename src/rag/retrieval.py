@@ -0,0 +1,158 @@
+"""
+Retrieval Helpers
+검색 보조 모듈 (지연 시간 추적, 헤지 요청, 다중 네임스페이스 동시 검색, 순위 융합)
+"""
+
+import heapq
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from ..utils.deadline import Deadline, DeadlineExceeded, get_pool
+from ..utils.metrics import metrics
+
+# 샤드별 검색 작업은 "fanout" 풀에서 실행합니다 (샤드 검색 안에서 "retrieval" 풀에 헤지 요청을
+# 제출하므로 같은 풀을 쓰면 서로를 기다리며 막힐 수 있습니다).
+FANOUT_STAGE = "fanout"
+
+
+class LatencyTracker:
+    """최근 호출 지연 시간을 보관하고 백분위수를 계산합니다."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """p 백분위 지연 시간을 반환합니다. 표본이 부족하면 None을 반환합니다."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * p / 100))
+        return ordered[index]
+
+
+def hedged_call(fn: Callable[[], Any], hedge_after: Optional[float], deadline: Optional[Deadline] = None,
+                name: str = "retrieval") -> Any:
+    """fn을 실행하고, hedge_after초 안에 끝나지 않으면 같은 요청을 한 번 더 보내 먼저 끝난 결과를 사용합니다.
+
+    hedge_after가 None이면(지연 표본 부족 등) 헤지 없이 마감 시간까지만 기다립니다.
+    요청은 name 단계 풀에서 실행하며, 풀에 빈 슬롯이 없으면 헤지 요청은 보내지 않습니다.
+    """
+    pool = get_pool(name)
+    primary = pool.submit(fn, deadline=deadline)
+    remaining = deadline.remaining() if deadline is not None else None
+
+    if hedge_after is None or (remaining is not None and hedge_after >= remaining):
+        done, _ = wait([primary], timeout=remaining)
+        if not done:
+            pool.abandon(primary)
+            raise DeadlineExceeded(f"요청 마감 시간 초과 ({name})")
+        return primary.result()
+
+    done, _ = wait([primary], timeout=hedge_after)
+    if done and primary.exception() is None:
+        return primary.result()
+
+    # 1차 요청이 p95를 넘겼거나 실패하면 헤지 요청을 보냅니다.
+    hedge = pool.submit(fn, wait=False)
+    if hedge is not None:
+        metrics.incr(f"{name}.hedged")
+    pending = {primary, hedge} - done - {None}
+    errors = [primary.exception()] if done else []
+
+    while pending:
+        remaining = deadline.remaining() if deadline is not None else None
+        finished, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        if not finished:
+            for future in pending:
+                pool.abandon(future)
+            raise DeadlineExceeded(f"요청 마감 시간 초과 ({name})")
+        for future in finished:
+            if future.exception() is None:
+                if future is hedge:
+                    metrics.incr(f"{name}.hedge_wins")
+                for loser in pending:
+                    pool.abandon(loser)
+                return future.result()
+            errors.append(future.exception())
+
+    raise errors[-1]
+
+
+def fan_out_search(searchers: Dict[str, Callable[[], List[Dict]]], top_k: int,
+                   deadline: Optional[Deadline] = None, name: str = "retrieval") -> List[Dict]:
+    """여러 네임스페이스(또는 로컬 샤드)를 동시에 검색하고 점수 기준 상위 top_k개를 합칩니다.
+
+    searchers는 {출처 이름: 검색 함수} 형태이며, 각 결과에는 'origin'으로 출처가 붙습니다.
+    전체 지연 시간은 가장 느린 샤드에 의해 결정됩니다. 마감 시간이 지나면 결과를 낸 샤드만
+    합치고, 결과를 낸 샤드가 없으면(끝나지 않았거나 스스로 DeadlineExceeded를 던짐)
+    DeadlineExceeded를 던집니다.
+    """
+    pool = get_pool(FANOUT_STAGE)
+    futures = {}
+    try:
+        for origin, search in searchers.items():
+            futures[pool.submit(search, deadline=deadline)] = origin
+    except BaseException:
+        # 슬롯 대기 중 마감 시간이 지나는 등 제출이 중간에 실패하면 이미 제출한 샤드 검색은 포기합니다.
+        for future in futures:
+            pool.abandon(future)
+        raise
+    remaining = deadline.remaining() if deadline is not None else None
+    done, pending = wait(futures, timeout=remaining)
+    for future in pending:
+        pool.abandon(future)
+
+    results = []
+    timed_out = len(pending)
+    for future in done:
+        error = future.exception()
+        if isinstance(error, DeadlineExceeded):
+            # 마감 시간 초과는 샤드 오류가 아니라 시간 초과로 처리합니다.
+            timed_out += 1
+        elif error is not None:
+            print(f"샤드 검색 오류 ({futures[future]}): {error}")
+        else:
+            results.append((futures[future], future.result()))
+
+    if timed_out:
+        if not results:
+            raise DeadlineExceeded(f"요청 마감 시간 초과 ({name})")
+        metrics.incr(f"{name}.partial_fanout")
+
+    def tagged_hits():
+        for origin, hits in results:
+            for hit in hits:
+                hit['origin'] = origin
+                yield hit
+
+    return heapq.nlargest(top_k, tagged_hits(), key=lambda hit: hit.get('score', 0.0))
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[Dict]], top_k: int, k: int = 60) -> List[Dict]:
+    """여러 검색 결과 순위를 RRF(1 / (k + 순위))로 합칩니다.
+
+    rankings는 {검색기 이름: 순위대로 정렬된 결과} 형태입니다. 같은 청크 ID는 하나로 합쳐
+    먼저 나온 결과의 필드를 유지하고, 'fused_score'와 'retrievers'(찾은 검색기 목록)를 붙입니다.
+    원래 'score'는 바꾸지 않으므로 점수 게이트와 출처 표시에 그대로 쓸 수 있습니다.
+    """
+    fused: Dict[str, Dict] = {}
+    for retriever, hits in rankings.items():
+        for rank, hit in enumerate(hits, 1):
+            entry = fused.get(hit['id'])
+            if entry is None:
+                entry = dict(hit)
+                entry['fused_score'] = 0.0
+                entry['retrievers'] = []
+                fused[hit['id']] = entry
+            entry['fused_score'] += 1.0 / (k + rank)
+            entry['retrievers'].append(retriever)
+    return heapq.nlargest(top_k, fused.values(), key=lambda hit: hit['fused_score'])
@@ -1,273 +1,770 @@
+import json
 import os
-from typing import List, Dict, Any
+import threading
+import time
+from typing import List, Dict, Any, Callable, Mapping, Optional
 from pinecone import Pinecone
 import openai
 
 # LangChain 관련 import
 from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.callbacks.manager import trace_as_chain_group
 
-from ..utils.config import get_config, DEBUG_MODE, setup_langsmith
+from ..utils.config import Settings, get_settings, setup_langsmith
+from ..utils.deadline import Deadline, DeadlineExceeded, run_with_deadline
+from ..utils.metrics import metrics
+from ..utils.resilience import CircuitOpenError, get_dependency
+from ..utils.singleflight import SingleFlight
+from ..utils.text import find_article_references, normalize_query
+from ..utils.tracing import SPAN_KIND_CLIENT, current_span, span
+from ..data.chunk_store import ChunkCorpus, META_FILE
+from ..data.inverted_index import INDEX_META_FILE, InvertedIndex, is_lookup_query, quoted_phrases
+from .answer_store import AnswerStore
+from .generation import (MAX_CONTEXT_CHUNKS, MAX_TOKENS, MODEL, TEMPERATURE, Generation, GenerationBackend,
+                         LangChainBackend, OpenAIBackend, build_context)
+from .retrieval import LatencyTracker, fan_out_search, hedged_call, reciprocal_rank_fusion
+
+# ID 검색 단계에서 요청하는 경량 필드 (본문 text 제외)
+ID_SEARCH_FIELDS = ("source", "chunk_index", "chunk_size", "doc_id", "page_start", "page_end", "articles")
+
+# 검색 결과가 없거나 신뢰도가 낮을 때의 고정 답변
+NO_ANSWER = '죄송합니다. 관련된 보험 약관 내용을 찾을 수 없습니다.'
+TIMEOUT_ANSWER = '죄송합니다. 응답 시간이 초과되었습니다. 잠시 후 다시 시도해주세요.'
+
+def expand_doc_id_filter(filter: Optional[Dict]) -> Optional[Dict]:
+    """
+    문서 필터({"doc_id": X}, {"doc_id": {"$in": [...]}})가 중복 제거로 합쳐진 청크도 찾도록
+    doc_ids 목록 조건을 $or로 더합니다. 합쳐진 청크의 doc_id는 대표 문서 하나뿐이고, 중복 제거
+    없이 올린 인덱스에는 doc_ids가 없으므로 두 조건을 함께 씁니다. $and/$or 안의 조건도 바꾸며,
+    부정 조건($ne, $nin 등)은 그대로 둡니다.
+    """
+    if not filter:
+        return filter
+    
+    expanded = {}
+    doc_conditions = []
+    for key, condition in filter.items():
+        if key in ("$and", "$or"):
+            expanded[key] = [expand_doc_id_filter(sub) for sub in condition]
+            continue
+        doc_ids = None
+        if key == "doc_id":
+            if not isinstance(condition, dict):
+                doc_ids = [condition]
+            elif set(condition) == {"$eq"}:
+                doc_ids = [condition["$eq"]]
+            elif set(condition) == {"$in"}:
+                doc_ids = list(condition["$in"])
+        if doc_ids is None:
+            expanded[key] = condition
+        else:
+            doc_conditions.append({"$or": [{"doc_id": condition}, {"doc_ids": {"$in": doc_ids}}]})
+    
+    if not doc_conditions:
+        return expanded
+    clauses = ([expanded] if expanded else []) + doc_conditions
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def result_outcome(result: Dict[str, Any]) -> str:
+    """
+    ask() 결과가 어떻게 만들어졌는지 반환합니다: 게이트 이름("faq", "low_score", "precomputed"),
+    "timeout", "fallback"(생성 실패 시 검색 결과로 대답), "no_answer"(검색 결과 없음), "generated"
+    """
+    if result.get('gate'):
+        return result['gate']
+    if result.get('timed_out'):
+        return "timeout"
+    if result.get('fallback'):
+        return "fallback"
+    if result.get('answer') == NO_ANSWER:
+        return "no_answer"
+    return "generated"
+
+# 프로세스 전역 ask() 요청 병합기 (Streamlit 세션 간 공유)
+_ask_flight = SingleFlight("ask")
 
 class InsuranceRAGSystem:
     """보험 약관 RAG 시스템"""
     
-    def __init__(self):
+    def __init__(self, index=None, openai_client=None, content_store: Optional[ChunkCorpus] = None,
+                 generator: Optional[GenerationBackend] = None):
+        """
+        index, openai_client, content_store, generator(답변 생성 백엔드)를 주입하면 해당 외부 연결을
+        만들지 않습니다 (로컬 가짜 서비스로 실행/테스트할 때 사용).
+        """
         # LangSmith 설정 초기화
         self.langsmith_enabled = setup_langsmith()
         
-        # 설정 로드
-        self.config = get_config()
+        # 외부 API 보호 계층 (속도 제한, 재시도, 서킷 브레이커; 프로세스 전역 공유)
+        self.pinecone_guard = get_dependency("pinecone")
+        self.openai_guard = get_dependency("openai")
         
-        # Pinecone 초기화
-        self.pc = Pinecone(api_key=self.config["pinecone_api_key"])
+        if index is not None:
+            self.index = index
+        else:
+            # Pinecone 초기화
+            self.pc = Pinecone(api_key=self.settings.pinecone_api_key)
+            
+            # 인덱스 연결
+            index_name = self.settings.pinecone_index_name
+            index_description = self.pc.describe_index(index_name)
+            self.index = self.pc.Index(host=index_description.host)
         
-        # 인덱스 연결
-        index_name = self.config["pinecone_index_name"]
-        index_description = self.pc.describe_index(index_name)
-        self.index = self.pc.Index(host=index_description.host)
+        # 검색 지연 시간 추적 (헤지 요청 기준 p95)
+        self.search_latency = LatencyTracker()
         
-        # LangChain 모델 초기화
-        self.llm = ChatOpenAI(
-            model="gpt-4o-mini",
-            temperature=0.1,
-            max_tokens=500,
-            api_key=self.config["openai_api_key"]
-        )
+        # 로컬 청크 저장소 (청크 ID로 본문 조회); 주입하지 않았으면 파일이 바뀔 때 다시 읽습니다.
+        self._owns_content_store = content_store is None
+        self.content_store = content_store if content_store is not None else self._load_content_store()
         
-        # LangChain 프롬프트 템플릿
-        self.prompt_template = ChatPromptTemplate.from_template("""
-당신은 전문적인 보험 상담사입니다. 
-제공된 LIG손해보험 약관 내용을 바탕으로 정확하고 도움이 되는 답변을 제공해주세요.
-
-답변 지침:
-1. 제공된 참고자료의 내용을 바탕으로만 답변하세요
-2. 답변은 한국어로 명확하고 이해하기 쉽게 작성하세요  
-3. 구체적인 조항이나 절차가 있다면 정확히 인용하세요
-4. 만약 제공된 자료에서 정확한 답변을 찾을 수 없다면, 그 점을 명시하고 보험회사에 직접 문의하도록 안내하세요
-5. 답변은 3-4문장으로 간결하게 작성하세요
-
-다음 LIG손해보험 약관 내용을 참고하여 질문에 답변해주세요:
-
-{context}
-
-질문: {question}
-
-답변:""")
-        
-        # LangChain 체인 구성
-        self.rag_chain = (
-            {"context": RunnablePassthrough(), "question": RunnablePassthrough()}
-            | self.prompt_template
-            | self.llm
-            | StrOutputParser()
-        )
+        # 로컬 역색인 (조항/용어 정확 조회와 키워드 순위 융합; 네트워크 호출 없음)
+        self.lexical_index = self._load_lexical_index()
+        
+        # 미리 계산된 답변 저장소 (고신뢰 점수 게이트에서 사용)
+        self.answer_store = self._load_answer_store()
+        
+        # 로컬 저장소 파일 변경 확인 (SETTINGS_RELOAD_INTERVAL마다 수정 시각/크기 비교)
+        self._store_lock = threading.Lock()
+        self._store_stamp = self._local_store_stamp()
+        self._next_store_check = time.monotonic() + self.settings.settings_reload_interval
+        
+        # 답변 생성 백엔드 (클라이언트는 한 번 만들어 재사용; 같은 system 프롬프트 접두사 공유)
+        if generator is not None:
+            self.openai_client = openai_client
+            self.openai_backend = self.langchain_backend = generator
+        else:
+            # 재시도는 보호 계층에서 처리하므로 SDK 자체 재시도는 끕니다. 요청별 타임아웃은
+            # 시도마다 남은 시간으로 넘기며, 여기 값은 마감 시간이 없는 호출의 상한입니다.
+            self.openai_client = openai_client or openai.OpenAI(api_key=self.settings.openai_api_key, max_retries=0,
+                                                                timeout=self.settings.request_timeout_seconds)
+            self.openai_backend = OpenAIBackend(self.openai_client, self.openai_guard)
+            self.langchain_backend = LangChainBackend(
+                ChatOpenAI(
+                    model=MODEL,
+                    temperature=TEMPERATURE,
+                    max_tokens=MAX_TOKENS,
+                    max_retries=0,
+                    timeout=self.settings.request_timeout_seconds,
+                    api_key=self.settings.openai_api_key,
+                    # 스트리밍 응답에도 토큰 사용량을 받습니다.
+                    stream_usage=True
+                ),
+                self.openai_guard
+            )
         
         print("✅ RAG 시스템이 초기화되었습니다.")
         if self.langsmith_enabled:
             print("🔍 LangSmith 추적이 활성화되었습니다.")
     
-    def search_relevant_chunks(self, query: str, top_k: int = 5, namespace: str = "default") -> List[Dict]:
+    @property
+    def settings(self) -> Settings:
+        """현재 설정 (.env가 바뀌면 다음 요청부터 새 값이 반영됨)"""
+        return get_settings()
+    
+    @property
+    def config(self) -> Mapping:
+        """현재 설정의 읽기 전용 매핑 (이전 get_config() 형태와 호환)"""
+        return self.settings.as_dict()
+    
+    def _load_content_store(self) -> Optional[ChunkCorpus]:
+        """로컬 청크 저장소를 mmap으로 엽니다. 없으면 None을 반환합니다."""
+        path = self.settings.chunk_store_path
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            print(f"⚠️ 로컬 청크 저장소가 없습니다: {path} (검색 시 본문을 함께 가져옵니다)")
+            return None
+        
+        try:
+            store = ChunkCorpus.load(path)
+            print(f"📦 로컬 청크 저장소 로드: {len(store)}개 청크")
+            return store
+        except Exception as e:
+            print(f"로컬 청크 저장소 로드 오류: {e}")
+            return None
+    
+    def _load_lexical_index(self, content_store: Optional[ChunkCorpus] = None) -> Optional[InvertedIndex]:
+        """청크 저장소 옆의 역색인을 엽니다. 없거나 코퍼스와 다르면 메모리에서 만듭니다."""
+        content_store = content_store if content_store is not None else self.content_store
+        if content_store is None:
+            return None
+        
+        try:
+            return InvertedIndex.load_or_build(self.settings.chunk_store_path, content_store)
+        except Exception as e:
+            print(f"역색인 준비 오류: {e}")
+            return None
+    
+    def _load_answer_store(self, content_store: Optional[ChunkCorpus] = None) -> AnswerStore:
+        """미리 계산된 답변 저장소를 읽고, 근거 청크가 바뀐 답변은 제외합니다."""
+        content_store = content_store if content_store is not None else self.content_store
+        answer_store = AnswerStore.load(self.settings.answer_store_path)
+        if content_store is not None:
+            # 근거 청크가 바뀐 답변은 다음 수집 때 다시 생성될 때까지 제공하지 않습니다.
+            stale = answer_store.prune_stale(content_store)
+            if stale:
+                print(f"⚠️ 근거 청크가 변경된 FAQ 답변 {stale}개를 제외했습니다.")
+        return answer_store
+    
+    def _local_store_stamp(self) -> tuple:
+        """로컬 저장소 파일들의 (수정 시각, 크기). 없는 파일은 None입니다."""
+        paths = [self.settings.answer_store_path]
+        if self._owns_content_store:
+            # 저장본은 메타 파일을 마지막에 교체하므로 메타 파일만 보면 됩니다.
+            paths += [os.path.join(self.settings.chunk_store_path, META_FILE),
+                      os.path.join(self.settings.chunk_store_path, INDEX_META_FILE)]
+        stamp = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                stamp.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+    
+    def refresh_local_stores(self, force: bool = False) -> bool:
         """
-        쿼리와 관련된 청크를 검색합니다.
+        청크 저장소, 역색인, 미리 계산된 답변 파일이 바뀌었으면 다시 읽어 교체합니다 (재시작 불필요).
+        SETTINGS_RELOAD_INTERVAL마다 한 번만 파일 수정 시각을 확인하며 (0이면 force일 때만),
+        다시 읽었으면 True를 반환합니다. 새 객체를 모두 만든 뒤 교체하므로 진행 중인 요청은
+        이전 저장소로 끝까지 처리됩니다.
         """
+        interval = self.settings.settings_reload_interval
+        if not force and (not interval or time.monotonic() < self._next_store_check):
+            return False
+        if not self._store_lock.acquire(blocking=False):
+            # 다른 요청이 확인/교체 중이면 기다리지 않고 현재 저장소를 사용합니다.
+            return False
         try:
-            # Pinecone의 search_records 사용 (integrated inference)
-            from pinecone import SearchQuery
-            
-            response = self.index.search_records(
-                namespace=namespace,
-                query=SearchQuery(
-                    inputs={
-                        "text": query,  # fieldMap의 "text" 필드 사용
-                    },
-                    top_k=top_k
-                )
-            )
-            
-            # 디버그 모드에서만 출력
-            if DEBUG_MODE:
-                print(f"검색 응답 타입: {type(response)}")
-                print(f"응답 내용: {response}")
+            self._next_store_check = time.monotonic() + interval
+            stamp = self._local_store_stamp()
+            if stamp == self._store_stamp:
+                return False
             
-            # 결과 처리
-            results = []
-            
-            # Pinecone 응답 구조에 맞게 수정
-            if hasattr(response, 'result') and hasattr(response.result, 'hits'):
-                hits = response.result.hits
-                for hit in hits:
-                    # fields 구조에서 데이터 추출
-                    fields = hit.fields
-                    result = {
-                        'id': hit._id,
-                        'score': hit._score,
-                        'content': fields.get('text', ''),  # text 필드에서 내용 가져오기
-                        'source': fields.get('source', '보험약관'),
-                        'chunk_index': int(fields.get('chunk_index', 0)),
-                        'chunk_size': int(fields.get('chunk_size', 0))
-                    }
-                    results.append(result)
-            else:
-                print("예상하지 못한 응답 구조입니다.")
-                print(f"응답 객체 속성: {dir(response)}")
-            
-            if DEBUG_MODE:
-                print(f"📄 {len(results)}개의 관련 문서를 찾았습니다.")
-            return results
-            
-        except Exception as e:
-            print(f"검색 중 오류 발생: {e}")
-            import traceback
-            traceback.print_exc()
+            content_store = self._load_content_store() if self._owns_content_store else self.content_store
+            lexical_index = self._load_lexical_index(content_store)
+            answer_store = self._load_answer_store(content_store)
+            # 이전 mmap 저장소는 진행 중인 요청이 쓸 수 있으므로 닫지 않고 참조가 없어지면 정리되게 둡니다.
+            self.content_store, self.lexical_index, self.answer_store = content_store, lexical_index, answer_store
+            self._store_stamp = stamp
+            metrics.incr("ask.store_reloads")
+            print("🔄 로컬 저장소가 변경되어 다시 읽었습니다.")
+            return True
+        finally:
+            self._store_lock.release()
+    
+    def _lexical_hits(self, scored: List) -> List[Dict]:
+        """역색인 결과 (청크 위치, 점수)를 검색 결과 형태로 바꿉니다 (namespace는 저장소 기준)."""
+        hits = []
+        for position, score in scored:
+            hit = {'id': self.content_store.chunk_id(position), 'score': 1.0, 'lexical_score': score,
+                   'retrieval': 'lexical', 'namespace': self.content_store.namespace(position)}
+            hit.update(self.content_store.metadata(position))
+            hits.append(hit)
+        return hits
+    
+    def _searchable_positions(self, namespaces: Optional[List[str]] = None):
+        """검색 대상 네임스페이스(기본값 settings.search_namespaces)의 청크 위치 (전부면 None)"""
+        return self.content_store.positions_in(namespaces or self.settings.search_namespaces)
+    
+    def exact_lookup(self, query: str, top_k: int = 5, namespaces: Optional[List[str]] = None) -> List[Dict]:
+        """
+        질문이 조항("제15조")이나 인용된 용어("해지환급금")를 정확히 가리키면 로컬 역색인에서
+        해당 청크를 바로 찾습니다. 정확히 일치하는 청크는 점수 1.0이며, 여러 개면 키워드
+        점수로 순서를 정합니다. 조항과 용어를 함께 가리키면 둘 다 만족하는 청크만 찾으며,
+        해당하지 않으면 빈 목록을 반환합니다.
+        """
+        if self.lexical_index is None:
+            return []
+        
+        # 조항을 물었는데 그 조항이 없으면 용어 일치 청크로 대신하지 않습니다 (빈 집합에서 교집합).
+        articles = find_article_references(query)
+        candidates = set(self.lexical_index.lookup_articles(articles)) if articles else None
+        for phrase in quoted_phrases(query):
+            positions = set(self.lexical_index.find_phrase(phrase, self.content_store))
+            candidates = positions if candidates is None else candidates & positions
+        if not candidates:
+            return []
+        searchable = self._searchable_positions(namespaces)
+        if searchable is not None:
+            candidates &= searchable
+        if not candidates:
             return []
+        hits = self._lexical_hits(self.lexical_index.search(query, top_k=top_k, candidates=candidates))
+        for hit in hits:
+            hit['retrieval'] = 'exact'
+        return hits
     
-    def generate_answer_with_langchain(self, query: str, contexts: List[Dict], max_context_length: int = None) -> str:
+    def lexical_search(self, query: str, top_k: int = 5, namespaces: Optional[List[str]] = None) -> List[Dict]:
+        """로컬 역색인의 BM25 키워드 검색 결과를 반환합니다 (점수는 'lexical_score')."""
+        if self.lexical_index is None:
+            return []
+        hits = self._lexical_hits(self.lexical_index.search(query, top_k=top_k,
+                                                            within=self._searchable_positions(namespaces)))
+        for hit in hits:
+            # 벡터 유사도 점수가 없으므로 점수 게이트/출처 표시용 'score'는 0으로 둡니다.
+            hit['score'] = 0.0
+        return hits
+    
+    def search_chunk_ids(self, query: str, top_k: int = 5, namespace: str = "default",
+                         deadline: Optional[Deadline] = None, filter: Optional[Dict] = None) -> List[Dict]:
         """
-        LangChain을 사용하여 검색된 컨텍스트를 바탕으로 답변을 생성합니다.
+        쿼리와 관련된 청크의 ID와 점수만 검색합니다.
+        본문은 hydrate_chunks()에서 실제로 사용할 청크에 대해서만 채웁니다.
+        로컬 청크 저장소가 없으면 본문(text)도 함께 요청합니다.
+        filter는 Pinecone 메타데이터 필터입니다 (예: {"doc_id": "상품A"},
+        {"articles": {"$in": ["제15조"]}}, {"page_start": {"$lte": 10}}).
+        doc_id 조건은 중복 제거로 합쳐진 청크도 찾도록 doc_ids 조건을 더해 보냅니다.
+        deadline이 지나면 DeadlineExceeded를 던집니다.
         """
-        if max_context_length is None:
-            max_context_length = self.config["max_context_length"]
-            
+        with span("retrieval.search", kind=SPAN_KIND_CLIENT, **{"rag.namespace": namespace, "rag.top_k": top_k,
+                                                                 "rag.filtered": bool(filter)}) as search_span:
+            try:
+                # Pinecone의 search_records 사용 (integrated inference)
+                from pinecone import SearchQuery
+                
+                fields = list(ID_SEARCH_FIELDS)
+                if self.content_store is None:
+                    fields.append("text")
+                
+                query_options = {"top_k": top_k}
+                if filter:
+                    # 메타데이터 필터로 후보를 줄인 뒤 유사도 검색
+                    query_options["filter"] = expand_doc_id_filter(filter)
+                
+                def _search():
+                    # 헤지 요청을 포함한 실제 호출마다 하위 span을 남깁니다.
+                    with span("pinecone.search_records", kind=SPAN_KIND_CLIENT):
+                        started = time.monotonic()
+                        response = self.pinecone_guard.call(
+                            self.index.search_records,
+                            namespace=namespace,
+                            query=SearchQuery(
+                                inputs={
+                                    "text": query,  # fieldMap의 "text" 필드 사용
+                                },
+                                **query_options
+                            ),
+                            fields=fields,
+                            deadline=deadline
+                        )
+                        self.search_latency.record(time.monotonic() - started)
+                        return response
+                
+                if self.settings.hedge_retrieval:
+                    # 1차 요청이 p95를 넘기면 같은 요청을 한 번 더 보내 먼저 끝난 결과 사용
+                    response = hedged_call(_search, self.search_latency.percentile(95), deadline)
+                else:
+                    response = run_with_deadline(_search, deadline, stage="retrieval")
+                
+                # 결과 처리
+                results = []
+                
+                # Pinecone 응답 구조에 맞게 수정
+                if hasattr(response, 'result') and hasattr(response.result, 'hits'):
+                    for hit in response.result.hits:
+                        # fields 구조에서 데이터 추출
+                        fields = hit.fields
+                        result = {
+                            'id': hit._id,
+                            'score': hit._score,
+                            'source': fields.get('source', '보험약관'),
+                            'chunk_index': int(fields.get('chunk_index', 0)),
+                            'chunk_size': int(fields.get('chunk_size', 0)),
+                            'namespace': namespace
+                        }
+                        if 'doc_id' in fields:
+                            result['doc_id'] = fields['doc_id']
+                        if 'page_start' in fields:
+                            result['page_start'] = int(fields['page_start'])
+                            result['page_end'] = int(fields.get('page_end', fields['page_start']))
+                        if 'articles' in fields:
+                            result['articles'] = list(fields['articles'])
+                        if 'text' in fields:
+                            result['content'] = fields['text']
+                        results.append(result)
+                else:
+                    print("예상하지 못한 응답 구조입니다.")
+                    search_span.add_event("unexpected_response", type=type(response).__name__)
+                
+                search_span.set_attribute("rag.hits", len(results))
+                return results
+                
+            except DeadlineExceeded:
+                raise
+            except CircuitOpenError as e:
+                print(f"검색 건너뜀: {e}")
+                search_span.record_exception(e)
+                return []
+            except Exception as e:
+                print(f"검색 중 오류 발생: {e}")
+                search_span.record_exception(e)
+                import traceback
+                traceback.print_exc()
+                return []
+    
+    def search_namespaces(self, query: str, top_k: int = 5, namespaces: Optional[List[str]] = None,
+                          deadline: Optional[Deadline] = None, filter: Optional[Dict] = None) -> List[Dict]:
+        """
+        여러 네임스페이스를 동시에 검색하고 점수 기준 상위 top_k개를 합칩니다.
+        각 결과의 'namespace'(및 'origin')에 출처 네임스페이스가 표시됩니다.
+        네임스페이스가 하나면 fan-out 없이 바로 검색합니다.
+        filter는 모든 네임스페이스에 같이 적용됩니다.
+        """
+        if namespaces is None:
+            namespaces = self.settings.search_namespaces
+        if len(namespaces) == 1:
+            return self.search_chunk_ids(query, top_k=top_k, namespace=namespaces[0], deadline=deadline,
+                                         filter=filter)
+        
+        searchers = {
+            namespace: (lambda namespace=namespace: self.search_chunk_ids(
+                query, top_k=top_k, namespace=namespace, deadline=deadline, filter=filter))
+            for namespace in namespaces
+        }
+        with span("retrieval.fan_out", **{"rag.namespaces": list(namespaces)}) as fan_out_span:
+            hits = fan_out_search(searchers, top_k, deadline)
+            fan_out_span.set_attribute("rag.hits", len(hits))
+            return hits
+    
+    def hydrate_chunks(self, hits: List[Dict]) -> List[Dict]:
+        """
+        검색 결과에 청크 본문을 채웁니다.
+        로컬 청크 저장소에서 ID로 조회하고, 없는 청크만 Pinecone에서 가져옵니다.
+        검색 결과에 없는 메타데이터(쪽 범위, 조항 등)도 로컬 저장소에서 채웁니다.
+        """
+        hydrated = []
+        missing = {}
+        
+        for hit in hits:
+            chunk = dict(hit)
+            if self.content_store is not None:
+                position = self.content_store.position(chunk['id'], chunk.get('namespace'))
+                if position is not None:
+                    if 'content' not in chunk:
+                        chunk['content'] = self.content_store.text(position)
+                    for key, value in self.content_store.metadata(position).items():
+                        chunk.setdefault(key, value)
+            if 'content' not in chunk:
+                missing.setdefault(chunk.get('namespace', 'default'), []).append(chunk)
+            hydrated.append(chunk)
+        
+        for namespace, chunks in missing.items():
+            with span("retrieval.fetch_contents", kind=SPAN_KIND_CLIENT,
+                      **{"rag.namespace": namespace, "rag.chunks": len(chunks)}):
+                contents = self._fetch_contents([chunk['id'] for chunk in chunks], namespace)
+            for chunk in chunks:
+                chunk['content'] = contents.get(chunk['id'], '')
+        
+        return hydrated
+    
+    def _fetch_contents(self, ids: List[str], namespace: str) -> Dict[str, str]:
+        """로컬 저장소에 없는 청크 본문을 Pinecone에서 가져옵니다."""
         try:
-            # 컨텍스트 준비
-            context_text = ""
-            for i, ctx in enumerate(contexts[:3]):  # 상위 3개만 사용
-                content = ctx.get('content', '')[:1000]  # 각 청크당 최대 1000자
-                context_text += f"[참고자료 {i+1}]\n{content}\n\n"
-            
-            if len(context_text) > max_context_length:
-                context_text = context_text[:max_context_length] + "..."
-            
-            if DEBUG_MODE:
-                print(f"context_text: {context_text}")
-
-            # LangChain 체인 실행 (환경 변수로 LangSmith 추적)
-            answer = self.rag_chain.invoke({
-                "context": context_text,
-                "question": query
-            })
-            
-            return answer.strip()
-            
+            response = self.pinecone_guard.call(self.index.fetch, ids=ids, namespace=namespace)
+            return {
+                chunk_id: (vector.metadata or {}).get('text', '')
+                for chunk_id, vector in response.vectors.items()
+            }
         except Exception as e:
-            print(f"LangChain 답변 생성 오류: {e}")
-            import traceback
-            traceback.print_exc()
-            
-            # LangChain 실패 시 폴백 답변
-            if contexts:
-                first_context = contexts[0].get('content', '')[:500]
-                return f"검색된 약관 내용에 따르면: {first_context}... 더 구체적인 정보는 보험회사에 직접 문의해주세요."
-            
-            return "현재 답변을 생성할 수 없습니다. 보험회사에 직접 문의해주세요."
+            print(f"청크 본문 조회 중 오류 발생: {e}")
+            return {}
     
-    def generate_answer(self, query: str, contexts: List[Dict], max_context_length: int = None) -> str:
+    def search_relevant_chunks(self, query: str, top_k: int = 5, namespace: str = "default",
+                               filter: Optional[Dict] = None) -> List[Dict]:
         """
-        기존 OpenAI API를 사용한 답변 생성 (하위 호환성 유지)
+        쿼리와 관련된 청크를 본문과 함께 검색합니다.
+        filter로 문서/쪽/조항 메타데이터 조건을 걸어 후보를 좁힐 수 있습니다.
+        """
+        return self.hydrate_chunks(self.search_chunk_ids(query, top_k=top_k, namespace=namespace, filter=filter))
+    
+    def article_filter(self, query: str) -> Optional[Dict]:
+        """
+        질문에 "제N조"가 언급되어 있으면 해당 조항 청크로 좁히는 메타데이터 필터를 만듭니다.
+        """
+        articles = find_article_references(query)
+        if not articles:
+            return None
+        return {"articles": {"$in": articles}}
+    
+    def generate(self, backend: GenerationBackend, query: str, contexts: List[Dict],
+                 max_context_length: int = None, deadline: Optional[Deadline] = None,
+                 on_delta: Optional[Callable[[str], None]] = None) -> Generation:
+        """
+        검색된 컨텍스트를 바탕으로 backend로 답변을 생성합니다.
+        생성에 실패하거나 서킷이 열려 있으면 폴백 답변(fallback=True)을 반환하고,
+        deadline이 지나면 DeadlineExceeded를 던집니다.
+        on_delta를 주면 생성되는 글자 조각마다 호출합니다 (폴백 답변은 조각으로 보내지 않습니다).
         """
         if max_context_length is None:
-            max_context_length = self.config["max_context_length"]
-            
-        try:
-            # 컨텍스트 준비
-            context_text = ""
-            for i, ctx in enumerate(contexts[:3]):  # 상위 3개만 사용
-                content = ctx.get('content', '')[:1000]  # 각 청크당 최대 1000자
-                context_text += f"[참고자료 {i+1}]\n{content}\n\n"
-            
-            if len(context_text) > max_context_length:
-                context_text = context_text[:max_context_length] + "..."
+            max_context_length = self.settings.max_context_length
+        
+        with span("generation.context", **{"rag.chunks": min(len(contexts), MAX_CONTEXT_CHUNKS)}) as context_span:
+            context_text = build_context(contexts, max_context_length)
+            context_span.set_attributes({"rag.context_chars": len(context_text),
+                                         "rag.context_truncated": len(context_text) > max_context_length})
+        
+        with span("generation.llm", kind=SPAN_KIND_CLIENT, **{"gen_ai.system": backend.name}) as llm_span:
+            try:
+                # 백엔드 호출은 마감 시간용 스레드에서 실행되므로 그 안의 span도 이 span 아래에 붙습니다.
+                generation = run_with_deadline(
+                    lambda: backend.generate(query, context_text, deadline=deadline, on_delta=on_delta),
+                    deadline,
+                    stage="generation"
+                )
+            except DeadlineExceeded:
+                raise
+            except CircuitOpenError as e:
+                # 서킷이 열려 있으면 대기 없이 바로 폴백 답변
+                print(f"답변 생성 건너뜀 ({backend.name}): {e}")
+                llm_span.record_exception(e)
+                return Generation(self._fallback_answer(contexts), backend.name, fallback=True)
+            except Exception as e:
+                print(f"답변 생성 오류 ({backend.name}): {e}")
+                llm_span.record_exception(e)
+                return Generation(self._fallback_answer(contexts), backend.name, fallback=True)
             
-            if DEBUG_MODE:
-                print(f"context_text: {context_text}")
-
-            # 프롬프트 구성
-            system_prompt = """당신은 전문적인 보험 상담사입니다. 
-제공된 LIG손해보험 약관 내용을 바탕으로 정확하고 도움이 되는 답변을 제공해주세요.
-
-답변 지침:
-1. 제공된 참고자료의 내용을 바탕으로만 답변하세요
-2. 답변은 한국어로 명확하고 이해하기 쉽게 작성하세요  
-3. 구체적인 조항이나 절차가 있다면 정확히 인용하세요
-4. 만약 제공된 자료에서 정확한 답변을 찾을 수 없다면, 그 점을 명시하고 보험회사에 직접 문의하도록 안내하세요
-5. 답변은 3-4문장으로 간결하게 작성하세요"""
-
-            user_prompt = f"""다음 LIG손해보험 약관 내용을 참고하여 질문에 답변해주세요:
-
-{context_text}
-
-질문: {query}
-
-답변:"""
+            llm_span.set_attributes({
+                "gen_ai.usage.input_tokens": generation.usage.get("prompt_tokens"),
+                "gen_ai.usage.output_tokens": generation.usage.get("completion_tokens"),
+                "gen_ai.usage.cached_tokens": generation.usage.get("cached_tokens"),
+            })
+        
+        for key, value in generation.usage.items():
+            metrics.incr(f"generation.{key}", value)
+        return generation
+    
+    def generate_answer_with_langchain(self, query: str, contexts: List[Dict], max_context_length: int = None,
+                                       deadline: Optional[Deadline] = None) -> str:
+        """
+        LangChain을 사용하여 검색된 컨텍스트를 바탕으로 답변을 생성합니다.
+        deadline이 지나면 DeadlineExceeded를 던집니다.
+        """
+        return self.generate(self.langchain_backend, query, contexts, max_context_length, deadline).text
+    
+    def generate_answer(self, query: str, contexts: List[Dict], max_context_length: int = None,
+                        deadline: Optional[Deadline] = None) -> str:
+        """
+        기존 OpenAI API를 사용한 답변 생성 (하위 호환성 유지)
+        deadline이 지나면 DeadlineExceeded를 던집니다.
+        """
+        return self.generate(self.openai_backend, query, contexts, max_context_length, deadline).text
+    
+    def _fallback_answer(self, contexts: List[Dict]) -> str:
+        """
+        답변 생성에 실패했을 때 첫 번째 검색 결과로 폴백 답변을 만듭니다.
+        """
+        if contexts:
+            first_context = contexts[0].get('content', '')[:500]
+            return f"검색된 약관 내용에 따르면: {first_context}... 더 구체적인 정보는 보험회사에 직접 문의해주세요."
+        
+        return "현재 답변을 생성할 수 없습니다. 보험회사에 직접 문의해주세요."
+    
+    def ask(self, query: str, use_langchain: bool = True, timeout: Optional[float] = None,
+            use_precomputed: bool = True, filter: Optional[Dict] = None,
+            namespaces: Optional[List[str]] = None,
+            on_delta: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        질문에 대한 답변을 반환합니다.
+        미리 계산된 FAQ 답변이 있으면 검색 없이 바로 반환합니다 (use_precomputed=False로 끌 수 있음).
+        같은 (정규화된) 질문이 동시에 들어오면 검색과 답변 생성을 한 번만 수행하고 결과를 공유합니다.
+        이때 나중에 들어온 호출도 자기 timeout까지만 기다립니다.
+        timeout(초, 기본값 REQUEST_TIMEOUT_SECONDS) 안에 끝나지 않으면 폴백 답변과 함께
+        'timed_out': True를 반환합니다.
+        filter(메타데이터 필터)를 주면 해당 조건의 청크에서만 검색하며, FAQ 답변은 사용하지 않습니다.
+        namespaces(기본값 SEARCH_NAMESPACES)는 검색할 네임스페이스이며, FAQ 답변도 이 네임스페이스에서
+        만든 것만 사용합니다.
+        on_delta를 주면 LLM이 생성하는 답변 조각마다 호출합니다. 조각은 호출마다 따로 받아야 하므로
+        이때는 같은 질문과 병합하지 않습니다. 게이트/폴백 답변은 조각 없이 결과로만 반환합니다.
+        """
+        self.refresh_local_stores()
+        namespaces = list(namespaces or self.settings.search_namespaces)
+        with span("rag.ask", **{"rag.use_langchain": use_langchain, "rag.filtered": bool(filter),
+                                "rag.query_chars": len(query)}) as ask_span:
+            if use_precomputed and not filter:
+                faq_entry = self.answer_store.get_for_question(query, namespaces)
+                if faq_entry is not None:
+                    metrics.incr("ask.faq_hits")
+                    chunks = self.hydrate_chunks([{'id': chunk_id, 'namespace': faq_entry['namespace']}
+                                                  for chunk_id in faq_entry['source_ids']])
+                    ask_span.set_attribute("rag.gate", "faq")
+                    return self._build_result(query, faq_entry['answer'], chunks, gate="faq")
             
-            # OpenAI API 호출
-            response = openai.OpenAI(api_key=self.config["openai_api_key"]).chat.completions.create(
-                model="gpt-4o-mini",
-                temperature=0.1,
-                max_tokens=500,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ]
-            )
+            if timeout is None:
+                timeout = self.settings.request_timeout_seconds
+            langchain_used = use_langchain and self.langsmith_enabled
+            filter_key = json.dumps(filter, sort_keys=True, ensure_ascii=False) if filter else None
+            key = (normalize_query(query), langchain_used, use_precomputed, filter_key, tuple(namespaces))
             
-            return response.choices[0].message.content.strip()
+            # 병합된 요청은 먼저 들어온 요청의 마감 시간이 아니라 자기 마감 시간까지만 기다립니다.
+            deadline = Deadline(timeout)
+            # 마감 시간 초과로 결과 대신 예외를 받았을 때도 이 호출이 직접 실행했는지 알 수 있도록 기록합니다.
+            ran = []
             
-        except Exception as e:
-            print(f"OpenAI API 호출 오류: {e}")
+            def run():
+                ran.append(True)
+                return self._ask(query, use_langchain, deadline, use_precomputed, filter, namespaces, on_delta)
             
-            # OpenAI API 실패 시 폴백 답변
-            if contexts:
-                first_context = contexts[0].get('content', '')[:500]
-                return f"검색된 약관 내용에 따르면: {first_context}... 더 구체적인 정보는 보험회사에 직접 문의해주세요."
+            try:
+                if on_delta is not None:
+                    result, coalesced = run(), False
+                else:
+                    result, coalesced = _ask_flight.do(key, run, deadline)
+            except DeadlineExceeded as e:
+                print(f"⏱️ {e}")
+                metrics.incr("ask.timeouts")
+                result, coalesced = self._build_result(query, TIMEOUT_ANSWER, [], timed_out=True), not ran
             
-            return "현재 답변을 생성할 수 없습니다. 보험회사에 직접 문의해주세요."
+            # 공유된 결과를 호출자별로 복사하여 서로 영향을 주지 않도록 합니다.
+            result = dict(result)
+            result['sources'] = [dict(source) for source in result.get('sources', [])]
+            if result.get('usage'):
+                result['usage'] = dict(result['usage'])
+            result['query'] = query
+            result['coalesced'] = coalesced
+            ask_span.set_attributes({
+                "rag.gate": result_outcome(result),
+                "rag.coalesced": coalesced,
+                "rag.timed_out": result.get('timed_out', False),
+                "rag.fallback": result.get('fallback', False),
+                "rag.sources": len(result['sources']),
+            })
+            return result
     
-    def ask(self, query: str, use_langchain: bool = True) -> Dict[str, Any]:
+    def _ask(self, query: str, use_langchain: bool, deadline: Deadline, use_precomputed: bool = True,
+             filter: Optional[Dict] = None, namespaces: Optional[List[str]] = None,
+             on_delta: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """
-        질문에 대한 답변을 반환합니다.
+        검색과 답변 생성을 실제로 수행합니다. 각 단계는 deadline의 남은 시간 안에서만 실행됩니다.
+        질문이 조항/인용 용어 자체를 찾는 질문("제15조 내용", "'해지환급금'이 뭐야?")이면 로컬 역색인
+        결과로 벡터 검색을 대신합니다. 조항을 언급하며 다른 내용을 묻는 질문은 벡터 검색을 합니다.
+        그 밖에 filter가 없고 질문에 조항이 언급되어 있으면 해당 조항으로 먼저 좁혀 검색하고,
+        결과가 없으면 전체에서 다시 검색합니다.
         """
-        if DEBUG_MODE:
-            print(f"🔍 질문: {query}")
-            print(f"🔗 LangChain 사용: {use_langchain}")
+        top_k = self.settings.max_search_results
         
-        # 1. 관련 청크 검색
-        relevant_chunks = self.search_relevant_chunks(query, top_k=self.config["max_search_results"])
-        if DEBUG_MODE:
-            print(f"📄 {len(relevant_chunks)}개의 관련 문서를 찾았습니다.")
+        # 0. 로컬 역색인 정확 조회 (네트워크 호출 없음; 조회형 질문만, 메타데이터 필터가 있으면 생략)
+        hits = []
+        if not filter and self.settings.lexical_exact_lookup and is_lookup_query(query):
+            with span("retrieval.exact_lookup") as lookup_span:
+                hits = self.exact_lookup(query, top_k=top_k, namespaces=namespaces)
+                lookup_span.set_attribute("rag.hits", len(hits))
+            if hits:
+                metrics.incr("ask.lexical_exact")
         
-        if not relevant_chunks:
-            return {
-                'answer': '죄송합니다. 관련된 보험 약관 내용을 찾을 수 없습니다.',
-                'sources': [],
-                'query': query
-            }
+        auto_filter = None
+        if not hits and not filter and self.settings.auto_article_filter:
+            auto_filter = self.article_filter(query)
         
-        # 2. 답변 생성 (LangChain 또는 OpenAI API 선택)
-        if use_langchain and self.langsmith_enabled:
-            answer = self.generate_answer_with_langchain(query, relevant_chunks)
-        else:
-            answer = self.generate_answer(query, relevant_chunks)
+        # 1. 관련 청크 검색 (ID와 점수만)
+        try:
+            if not hits:
+                hits = self.search_namespaces(query, top_k=top_k, namespaces=namespaces, deadline=deadline,
+                                              filter=filter or auto_filter)
+            if auto_filter is not None:
+                metrics.incr("ask.article_filtered")
+                if not hits:
+                    # 조항 메타데이터가 없는 인덱스이거나 해당 조항이 없으면 전체 검색
+                    metrics.incr("ask.article_filter_fallback")
+                    hits = self.search_namespaces(query, top_k=top_k, namespaces=namespaces, deadline=deadline)
+        except DeadlineExceeded as e:
+            print(f"⏱️ {e}")
+            metrics.incr("ask.timeouts")
+            return self._build_result(query, TIMEOUT_ANSWER, [], timed_out=True)
+        current_span().set_attribute("rag.hits", len(hits))
+        
+        if not hits:
+            return self._build_result(query, NO_ANSWER, [])
+        
+        # 2. 점수 게이트: 검색 신뢰도가 너무 낮거나 충분히 높으면 LLM 호출 생략
+        top_score = hits[0].get('score', 0.0)
+        if top_score < self.settings.min_retrieval_score:
+            metrics.incr("ask.gate_low_score")
+            return self._build_result(query, NO_ANSWER, [], gate="low_score")
+        
+        # 역색인 정확 일치 점수(1.0)는 유사도가 아니므로 미리 계산된 답변 게이트에 쓰지 않습니다.
+        lexical_exact = hits[0].get('retrieval') == 'exact'
+        if use_precomputed and not lexical_exact and top_score >= self.settings.high_confidence_score:
+            # 같은 청크에 대한 답변이라도 다른 질문에 대한 답변일 수 있으므로 질문 유사도도 확인합니다.
+            precomputed = self.answer_store.get_for_chunk(
+                hits[0]['id'], hits[0].get('namespace', 'default'), query=query,
+                min_similarity=self.settings.precomputed_question_similarity
+            )
+            if precomputed is not None:
+                metrics.incr("ask.gate_precomputed")
+                relevant_chunks = self.hydrate_chunks(hits[:MAX_CONTEXT_CHUNKS])
+                return self._build_result(query, precomputed['answer'], relevant_chunks, gate="precomputed")
+        
+        # 3. 벡터 검색 순위와 로컬 키워드 검색 순위 융합 (RRF)
+        if not lexical_exact and not filter and self.settings.lexical_fusion and self.lexical_index is not None:
+            metrics.incr("ask.lexical_fused")
+            with span("retrieval.fusion"):
+                lexical_hits = self.lexical_search(query, top_k=top_k, namespaces=namespaces)
+                hits = reciprocal_rank_fusion({"vector": hits, "lexical": lexical_hits}, top_k)
         
-        # 3. 소스 정보 준비
+        # 4. 실제로 사용할 상위 청크만 본문 채우기
+        with span("retrieval.hydrate", **{"rag.chunks": len(hits[:MAX_CONTEXT_CHUNKS])}):
+            relevant_chunks = self.hydrate_chunks(hits[:MAX_CONTEXT_CHUNKS])
+        
+        # 5. 답변 생성 (LangChain 또는 OpenAI API 선택); 마감 시간 초과 시 폴백 답변
+        metrics.incr("ask.generated")
+        langchain_used = use_langchain and self.langsmith_enabled
+        backend = self.langchain_backend if langchain_used else self.openai_backend
+        timed_out = False
+        try:
+            generation = self.generate(backend, query, relevant_chunks, deadline=deadline, on_delta=on_delta)
+        except DeadlineExceeded as e:
+            print(f"⏱️ {e}")
+            metrics.incr("ask.timeouts")
+            generation = Generation(self._fallback_answer(relevant_chunks), backend.name, fallback=True)
+            timed_out = True
+        
+        # 생성 실패로 폴백 답변이 나왔는지 표시 (FAQ 저장 시 제외)
+        if generation.fallback:
+            metrics.incr("ask.fallbacks")
+        
+        return self._build_result(
+            query,
+            generation.text,
+            relevant_chunks,
+            langchain_used=langchain_used,
+            timed_out=timed_out,
+            fallback=generation.fallback,
+            usage=generation.usage or None
+        )
+    
+    def _build_result(self, query: str, answer: str, chunks: List[Dict], langchain_used: bool = False,
+                      timed_out: bool = False, gate: Optional[str] = None, fallback: bool = False,
+                      usage: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """
+        ask() 결과 딕셔너리를 만듭니다.
+        gate는 LLM 호출을 생략한 이유입니다 ("faq", "low_score", "precomputed" 또는 None).
+        각 출처의 retrieval은 찾은 경로입니다 ("vector", "exact", "lexical", "vector+lexical").
+        fallback은 답변 생성에 실패해 검색 결과로 대신 답했는지 여부입니다.
+        usage는 이번 호출의 LLM 토큰 사용량입니다 (prompt/completion/total/cached_tokens; 생성하지 않았으면 None).
+        """
         sources = []
-        for chunk in relevant_chunks[:3]:
+        for chunk in chunks:
             sources.append({
                 'id': chunk.get('id', ''),
                 'score': chunk.get('score', 0.0),
                 'content': chunk.get('content', ''),
                 'source': chunk.get('source', '보험약관'),
                 'chunk_index': chunk.get('chunk_index', 0),
-                'chunk_size': chunk.get('chunk_size', 0)
+                'chunk_size': chunk.get('chunk_size', 0),
+                'namespace': chunk.get('namespace', 'default'),
+                'doc_id': chunk.get('doc_id', ''),
+                'page_start': chunk.get('page_start', 0),
+                'page_end': chunk.get('page_end', 0),
+                'articles': list(chunk.get('articles', [])),
+                'references': list(chunk.get('references', [])),
+                'retrieval': '+'.join(chunk.get('retrievers', [])) or chunk.get('retrieval', 'vector')
             })
         
         return {
             'answer': answer,
             'sources': sources,
             'query': query,
-            'langchain_used': use_langchain and self.langsmith_enabled
+            'langchain_used': langchain_used,
+            'timed_out': timed_out,
+            'gate': gate,
+            'fallback': fallback,
+            'usage': usage
         }
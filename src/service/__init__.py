@@ -0,0 +1,8 @@
+"""
+Service Module
+HTTP 질의 서비스 관련 모듈
+"""
+
+from .server import serve, QueryService
+
+__all__ = ["serve", "QueryService"]
@@ -0,0 +1,265 @@
+"""
+Load Test Harness
+부하 테스트 모듈
+
+기록된 질문(JSONL)을 InsuranceRAGSystem.ask 또는 HTTP 서비스(/ask)에 재생하여 한 인스턴스가
+감당하는 처리량과 지연 시간을 측정합니다.
+
+실행 방식:
+    open-loop  목표 QPS의 포아송 도착(지수 분포 간격)으로 요청을 보냅니다. 응답을 기다리지 않고
+               예정된 시각에 보내며, 지연 시간은 예정 시각부터 재므로 서버가 밀리면 대기 시간이
+               그대로 지연에 반영됩니다 (coordinated omission 방지).
+    closed     고정된 수의 가상 사용자가 응답을 받는 즉시 다음 질문을 보냅니다.
+
+질문 파일 형식 (한 줄에 하나):
+    {"question": "...", "filter": {...}, "use_langchain": false, "timeout": 10}
+    "..."                  JSON 문자열
+    그 밖의 줄              질문 그대로 (#으로 시작하는 줄과 빈 줄은 무시; faq_questions.txt 재사용 가능)
+"""
+
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import count
+from typing import Any, Callable, Dict, List, Optional
+
+# 질문 항목에서 ask()로 넘기는 옵션
+REQUEST_OPTIONS = ("use_langchain", "timeout", "filter", "use_precomputed")
+
+# 보고서에 쓰는 지연 시간 백분위
+LATENCY_PERCENTILES = (50, 95, 99)
+
+
+def load_questions(path: str) -> List[Dict[str, Any]]:
+    """질문 파일을 {"question": ..., 옵션...} 목록으로 읽습니다."""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                entry = line
+            if isinstance(entry, str):
+                entry = {"question": entry}
+            if not isinstance(entry, dict) or not isinstance(entry.get("question", entry.get("query")), str):
+                continue
+            entry.setdefault("question", entry.get("query"))
+            entries.append(entry)
+    if not entries:
+        raise ValueError(f"질문이 없습니다: {path}")
+    return entries
+
+
+def system_target(system, **defaults) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """InsuranceRAGSystem.ask를 직접 호출하는 대상 (같은 프로세스)"""
+
+    def call(entry: Dict[str, Any]) -> Dict[str, Any]:
+        options = dict(defaults)
+        options.update({key: entry[key] for key in REQUEST_OPTIONS if key in entry})
+        return system.ask(entry["question"], **options)
+
+    return call
+
+
+def http_target(base_url: str, request_timeout: float = 60.0, **defaults) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """HTTP 서비스의 POST /ask를 호출하는 대상 (200이 아니면 예외)"""
+    url = base_url.rstrip("/") + "/ask"
+
+    def call(entry: Dict[str, Any]) -> Dict[str, Any]:
+        payload = dict(defaults)
+        payload.update({key: entry[key] for key in REQUEST_OPTIONS if key in entry})
+        payload["question"] = entry["question"]
+        request = urllib.request.Request(
+            url,
+            data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=request_timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"HTTP {e.code}: {e.read()[:200].decode('utf-8', 'replace')}") from e
+
+    return call
+
+
+class LoadTest:
+    """질문 목록을 대상에 재생하고 요청별 결과를 모아 보고서를 만듭니다."""
+
+    def __init__(self, target: Callable[[Dict[str, Any]], Dict[str, Any]], questions: List[Dict[str, Any]],
+                 shuffle: bool = False, seed: Optional[int] = None):
+        self.target = target
+        self.questions = list(questions)
+        self.random = random.Random(seed)
+        if shuffle:
+            self.random.shuffle(self.questions)
+        self.samples: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _issue(self, entry: Dict[str, Any], scheduled: float) -> None:
+        started = time.monotonic()
+        sample = {"queue_seconds": started - scheduled}
+        try:
+            sample["result"] = self.target(entry)
+        except Exception as e:
+            sample["error"] = type(e).__name__
+        sample["latency"] = time.monotonic() - scheduled
+        with self._lock:
+            self.samples.append(sample)
+
+    def run_open_loop(self, qps: float, duration: Optional[float] = None, requests: Optional[int] = None,
+                      max_in_flight: int = 256) -> Dict[str, Any]:
+        """목표 qps의 포아송 도착으로 duration초 동안(또는 requests개) 요청을 보냅니다.
+
+        동시에 처리 중인 요청이 max_in_flight를 넘으면 나머지는 클라이언트 쪽에서 기다리며,
+        그 대기 시간도 지연 시간에 포함됩니다.
+        """
+        if qps <= 0:
+            raise ValueError("qps는 양수여야 합니다.")
+        if duration is None and requests is None:
+            raise ValueError("duration 또는 requests가 필요합니다.")
+
+        executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="loadtest")
+        futures = []
+        start = time.monotonic()
+        scheduled = start
+        sent = 0
+        while (requests is None or sent < requests) and (duration is None or scheduled - start < duration):
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            entry = self.questions[sent % len(self.questions)]
+            futures.append(executor.submit(self._issue, entry, scheduled))
+            sent += 1
+            scheduled += self.random.expovariate(qps)
+
+        wait(futures)
+        executor.shutdown()
+        return self.report(time.monotonic() - start, mode="open", target_qps=qps, max_in_flight=max_in_flight)
+
+    def run_closed_loop(self, concurrency: int, duration: Optional[float] = None,
+                        requests: Optional[int] = None) -> Dict[str, Any]:
+        """concurrency명의 가상 사용자가 응답을 받는 즉시 다음 질문을 보냅니다."""
+        if concurrency < 1:
+            raise ValueError("concurrency는 1 이상이어야 합니다.")
+        if duration is None and requests is None:
+            raise ValueError("duration 또는 requests가 필요합니다.")
+
+        start = time.monotonic()
+        counter = iter(range(requests) if requests is not None else count())
+        counter_lock = threading.Lock()
+
+        def user():
+            while duration is None or time.monotonic() - start < duration:
+                with counter_lock:
+                    number = next(counter, None)
+                if number is None:
+                    return
+                self._issue(self.questions[number % len(self.questions)], time.monotonic())
+
+        threads = [threading.Thread(target=user, name=f"loadtest-user-{i}", daemon=True) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.report(time.monotonic() - start, mode="closed", concurrency=concurrency)
+
+    def report(self, elapsed: float, **info) -> Dict[str, Any]:
+        """처리량, 지연 시간 백분위, 오류율, 캐시 적중률을 계산합니다."""
+        with self._lock:
+            samples = list(self.samples)
+        results = [sample["result"] for sample in samples if "result" in sample]
+        errors = Counter(sample["error"] for sample in samples if "error" in sample)
+        latencies = sorted(sample["latency"] for sample in samples)
+        completed = len(results)
+
+        def ratio(part: int, total: int = completed) -> float:
+            return round(part / total, 4) if total else 0.0
+
+        # gate가 없는 결과는 LLM으로 생성했거나(출처 있음) 검색 결과가 없던 경우입니다.
+        gates = Counter(result.get("gate") or ("generated" if result.get("sources") else "no_sources")
+                        for result in results)
+        usage = Counter()
+        for result in results:
+            usage.update(result.get("usage") or {})
+        lexical_exact = sum(1 for result in results
+                            if any(source.get("retrieval") == "exact" for source in result.get("sources", [])))
+
+        report = dict(info)
+        report.update({
+            "requests": len(samples),
+            "completed": completed,
+            "errors": sum(errors.values()),
+            "error_rate": ratio(sum(errors.values()), len(samples)),
+            "error_types": dict(errors),
+            "timeouts": sum(1 for result in results if result.get("timed_out")),
+            "timeout_rate": ratio(sum(1 for result in results if result.get("timed_out"))),
+            "fallback_rate": ratio(sum(1 for result in results if result.get("fallback"))),
+            "duration_seconds": round(elapsed, 3),
+            "throughput_qps": round(completed / elapsed, 3) if elapsed else 0.0,
+            "latency_seconds": _latency_summary(latencies),
+            "queue_seconds": _latency_summary(sorted(sample["queue_seconds"] for sample in samples)),
+            "gates": dict(gates),
+            "cache": {
+                "faq_hit_ratio": ratio(gates.get("faq", 0)),
+                "precomputed_ratio": ratio(gates.get("precomputed", 0)),
+                "coalesced_ratio": ratio(sum(1 for result in results if result.get("coalesced"))),
+                "lexical_exact_ratio": ratio(lexical_exact),
+                "llm_skipped_ratio": ratio(completed - gates.get("generated", 0)),
+                "prompt_cache_ratio": ratio(usage["cached_tokens"], usage["prompt_tokens"]),
+            },
+            "tokens": dict(usage),
+        })
+        return report
+
+
+def _percentile(ordered: List[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def _latency_summary(ordered: List[float]) -> Dict[str, float]:
+    if not ordered:
+        return {}
+    summary = {f"p{p}": round(_percentile(ordered, p), 4) for p in LATENCY_PERCENTILES}
+    summary["mean"] = round(sum(ordered) / len(ordered), 4)
+    summary["max"] = round(ordered[-1], 4)
+    return summary
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """보고서를 사람이 읽는 형태로 만듭니다."""
+    if report["mode"] == "open":
+        mode = f"open-loop (목표 {report['target_qps']} QPS, 최대 동시 {report['max_in_flight']})"
+    else:
+        mode = f"closed-loop (동시 사용자 {report['concurrency']}명)"
+    latency = report["latency_seconds"]
+    cache = report["cache"]
+    lines = [
+        f"📈 부하 테스트 결과: {mode}",
+        f"  - 요청 {report['requests']}개, 완료 {report['completed']}개, {report['duration_seconds']}초",
+        f"  - 처리량: {report['throughput_qps']} QPS",
+    ]
+    if latency:
+        lines.append("  - 지연 시간(초): " + ", ".join(f"{key} {latency[key]}" for key in
+                                                   [f"p{p}" for p in LATENCY_PERCENTILES] + ["mean", "max"]))
+    if report["queue_seconds"] and report["mode"] == "open":
+        lines.append(f"  - 클라이언트 대기(초): p95 {report['queue_seconds']['p95']}")
+    lines.append(f"  - 오류율: {report['error_rate']:.2%} {report['error_types'] or ''}".rstrip())
+    lines.append(f"  - 시간 초과: {report['timeout_rate']:.2%}, 폴백 답변: {report['fallback_rate']:.2%}")
+    lines.append(f"  - 게이트: {report['gates']}")
+    lines.append(
+        f"  - 캐시: FAQ {cache['faq_hit_ratio']:.2%}, 사전 답변 {cache['precomputed_ratio']:.2%}, "
+        f"병합 {cache['coalesced_ratio']:.2%}, 조항 정확 조회 {cache['lexical_exact_ratio']:.2%}, "
+        f"LLM 생략 {cache['llm_skipped_ratio']:.2%}, 프롬프트 캐시 토큰 {cache['prompt_cache_ratio']:.2%}"
+    )
+    if report["tokens"]:
+        lines.append(f"  - 토큰: {report['tokens']}")
+    return "\n".join(lines)
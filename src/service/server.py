@@ -0,0 +1,316 @@
+"""
+Headless HTTP Query Service
+HTTP 질의 서비스 모듈
+
+Streamlit 없이 InsuranceRAGSystem을 HTTP로 제공합니다.
+
+엔드포인트:
+    POST /ask         {"question": "...", "use_langchain": true, "timeout": 20,
+                       "filter": {"doc_id": "..."}} → JSON 답변
+    POST /ask/stream  같은 입력 → server-sent events (delta..., answer, sources, done)
+    POST /batch       {"questions": ["...", ...]} → {"results": [...]}
+    GET  /healthz     프로세스 생존 확인
+    GET  /readyz      엔진 초기화 및 외부 의존성 서킷 상태 확인
+    GET  /metrics     프로세스 카운터
+
+여러 워커를 쓰면 마스터 프로세스는 리스닝 소켓만 열고 fork하며, 각 워커가 fork 뒤에
+엔진(HTTP 클라이언트 연결 풀, 스레드 포함)을 따로 만듭니다. 연결 풀과 스레드는 fork로
+안전하게 복제되지 않으므로 마스터에서는 클라이언트를 만들지 않습니다.
+/ask/stream은 LLM이 생성하는 답변 조각을 delta 이벤트({"text": "..."})로 바로 보내고, 끝나면
+최종 답변(answer), 출처(sources), 나머지 결과 필드(done)를 보냅니다. FAQ/게이트/폴백 답변처럼
+LLM을 거치지 않은 답변은 delta 없이 answer만 보냅니다. 생성 도중 실패하거나 마감 시간이 지나면
+폴백 답변으로 바뀌므로 answer를 최종 답변으로 사용해야 합니다. 잘못된 입력은 스트림을 열기 전에
+400으로 응답합니다.
+"""
+
+import json
+import os
+import queue
+import signal
+import socket
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from ..utils.deadline import pool_stats
+from ..utils.metrics import metrics
+from ..utils.resilience import CircuitBreaker, get_dependency
+from ..utils.tracing import submit_in_context
+
+# 요청 본문 최대 크기 (바이트)
+MAX_BODY_BYTES = 1 << 20
+
+# SSE 대기 중 연결 유지를 위한 주석 전송 간격 (초)
+SSE_KEEPALIVE_SECONDS = 5.0
+
+
+class QueryService:
+    """HTTP 핸들러가 공유하는 엔진과 실행기
+
+    /batch와 /ask/stream은 실행기를 따로 써서, 큰 배치가 스트리밍 요청을 큐에 묶어두지 않습니다.
+    """
+
+    def __init__(self, system, batch_concurrency: int = 8, stream_concurrency: int = 32, max_batch_size: int = 100):
+        self.system = system
+        self.max_batch_size = max_batch_size
+        self.batch_executor = ThreadPoolExecutor(max_workers=batch_concurrency, thread_name_prefix="rag-batch")
+        self.stream_executor = ThreadPoolExecutor(max_workers=stream_concurrency, thread_name_prefix="rag-stream")
+
+    def options(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """요청 본문을 검증하고 system.ask()의 인자로 바꿉니다. 잘못된 입력이면 ValueError를 던집니다."""
+        question = payload.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise ValueError("question 필드가 필요합니다.")
+        timeout = payload.get("timeout")
+        if timeout is not None:
+            if not isinstance(timeout, (int, float)) or timeout <= 0:
+                raise ValueError("timeout은 양수여야 합니다.")
+            timeout = float(timeout)
+        filter = payload.get("filter")
+        if filter is not None and not isinstance(filter, dict):
+            raise ValueError("filter는 JSON 객체여야 합니다.")
+        return {
+            "query": question,
+            "use_langchain": bool(payload.get("use_langchain", True)),
+            "timeout": timeout,
+            "filter": filter or None,
+        }
+
+    def ask(self, payload: Dict[str, Any], on_delta: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        options = self.options(payload)
+        if on_delta is not None:
+            options["on_delta"] = on_delta
+        return self.system.ask(**options)
+
+    def batch(self, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        questions = payload.get("questions")
+        if not isinstance(questions, list) or not questions:
+            raise ValueError("questions 필드(문자열 목록)가 필요합니다.")
+        if len(questions) > self.max_batch_size:
+            raise ValueError(f"한 번에 최대 {self.max_batch_size}개 질문까지 처리할 수 있습니다.")
+
+        options = {key: payload[key] for key in ("use_langchain", "timeout", "filter") if key in payload}
+        futures = [submit_in_context(self.batch_executor, self.ask, dict(options, question=question))
+                   for question in questions]
+
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({"error": str(e)})
+        return results
+
+    def readiness(self) -> Dict[str, Any]:
+        circuits = {name: get_dependency(name).breaker.state for name in ("pinecone", "openai")}
+        store = getattr(self.system, "content_store", None)
+        return {
+            "ready": all(state != CircuitBreaker.OPEN for state in circuits.values()),
+            "circuits": circuits,
+            "chunks": len(store) if store is not None else None,
+            "pools": pool_stats(),
+            "pid": os.getpid(),
+        }
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """JSON/SSE 요청 핸들러"""
+
+    server_version = "InsuranceRAG/1.0"
+    protocol_version = "HTTP/1.1"
+    service: QueryService = None
+
+    def log_message(self, format, *args):
+        # 요청마다 stderr에 기록하지 않습니다 (부하 시 병목).
+        pass
+
+    # ------------------------------------------------------------------
+    # 응답 도우미
+    # ------------------------------------------------------------------
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> Optional[Dict[str, Any]]:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send_json(400, {"error": "Content-Length 헤더가 올바르지 않습니다."})
+            return None
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"error": "요청 본문이 너무 큽니다."})
+            return None
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "JSON 형식이 올바르지 않습니다."})
+            return None
+        if not isinstance(payload, dict):
+            self._send_json(400, {"error": "JSON 객체가 필요합니다."})
+            return None
+        return payload
+
+    def _send_event(self, event: str, data: Any) -> None:
+        message = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        self._write_chunk(message.encode("utf-8"))
+
+    def _write_chunk(self, data: bytes) -> None:
+        # HTTP/1.1 chunked 인코딩
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    # ------------------------------------------------------------------
+    # 라우팅
+    # ------------------------------------------------------------------
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send_json(200, {"status": "ok", "pid": os.getpid()})
+        elif self.path == "/readyz":
+            readiness = self.service.readiness()
+            self._send_json(200 if readiness["ready"] else 503, readiness)
+        elif self.path == "/metrics":
+            self._send_json(200, metrics.snapshot())
+        else:
+            self._send_json(404, {"error": "찾을 수 없는 경로입니다."})
+
+    def do_POST(self):
+        payload = self._read_json()
+        if payload is None:
+            return
+
+        try:
+            if self.path == "/ask":
+                metrics.incr("service.requests")
+                self._send_json(200, self.service.ask(payload))
+            elif self.path == "/ask/stream":
+                metrics.incr("service.requests")
+                self._stream_ask(payload)
+            elif self.path == "/batch":
+                metrics.incr("service.batch_requests")
+                self._send_json(200, {"results": self.service.batch(payload)})
+            else:
+                self._send_json(404, {"error": "찾을 수 없는 경로입니다."})
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            metrics.incr("service.errors")
+            self._send_json(500, {"error": str(e)})
+
+    def _stream_ask(self, payload: Dict[str, Any]) -> None:
+        """생성되는 답변 조각과 최종 결과를 server-sent events로 전송합니다."""
+        # 입력 검증 오류는 스트림을 열기 전에 400으로 응답합니다.
+        self.service.options(payload)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        # 생성 스레드가 조각을 큐에 넣고, 끝나면 None을 넣어 이 루프를 깨웁니다.
+        deltas = queue.Queue()
+        future = submit_in_context(self.service.stream_executor, self.service.ask, payload, deltas.put)
+        future.add_done_callback(lambda _: deltas.put(None))
+        try:
+            while True:
+                try:
+                    piece = deltas.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    # 프록시가 유휴 연결을 끊지 않도록 주석 줄 전송
+                    self._write_chunk(b": keep-alive\n\n")
+                    continue
+                if piece is None:
+                    break
+                self._send_event("delta", {"text": piece})
+
+            result = future.result()
+            self._send_event("answer", {"text": result["answer"]})
+            self._send_event("sources", result.get("sources", []))
+            self._send_event("done", {key: value for key, value in result.items() if key not in ("answer", "sources")})
+        except Exception as e:
+            metrics.incr("service.errors")
+            self._send_event("error", {"error": str(e)})
+        finally:
+            self._write_chunk(b"")
+
+
+def _make_server(sock: socket.socket, service: QueryService) -> ThreadingHTTPServer:
+    handler = type("BoundQueryRequestHandler", (QueryRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer(sock.getsockname(), handler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = sock
+    server.daemon_threads = True
+    return server
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(256)
+    return sock
+
+
+def serve(system_factory: Callable[[], Any], host: str = "127.0.0.1", port: int = 8000, workers: int = 1) -> None:
+    """HTTP 서비스를 실행합니다.
+
+    system_factory는 엔진(InsuranceRAGSystem 등)을 만드는 함수입니다. workers > 1이면 마스터
+    프로세스가 소켓만 열고 워커를 fork하며, 각 워커가 fork 뒤에 system_factory를 호출합니다.
+    """
+    sock = _bind(host, port)
+    print(f"🚀 HTTP 질의 서비스 시작: http://{host}:{sock.getsockname()[1]} (워커 {workers}개)")
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        server = _make_server(sock, QueryService(system_factory()))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            # 워커: 마스터의 소켓을 공유하고 엔진과 클라이언트는 fork 뒤에 새로 만듦
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            status = 0
+            try:
+                server = _make_server(sock, QueryService(system_factory()))
+                server.serve_forever()
+            except BaseException as e:
+                print(f"💥 워커 {os.getpid()} 종료: {e}")
+                status = 1
+            finally:
+                sys.stdout.flush()
+                os._exit(status)
+        children.append(pid)
+
+    def _shutdown(signum, frame):
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    try:
+        for child in children:
+            os.waitpid(child, 0)
+    except KeyboardInterrupt:
+        _shutdown(signal.SIGINT, None)
+        for child in children:
+            os.waitpid(child, 0)
+    finally:
+        sock.close()
+        sys.stdout.flush()
@@ -3,6 +3,7 @@ Utilities Module
 유틸리티 함수 모듈
 """
 
-from .config import get_config, DEBUG_MODE
+from .config import get_config, get_settings, reload_settings, Settings, DEBUG_MODE
+from .metrics import metrics
 
-__all__ = ["get_config", "DEBUG_MODE"]
+__all__ = ["get_config", "get_settings", "reload_settings", "Settings", "DEBUG_MODE", "metrics"]
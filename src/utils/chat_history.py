@@ -0,0 +1,119 @@
+"""
+Bounded Chat History
+제한된 크기의 대화 기록 모듈
+
+Streamlit 세션의 대화 기록을 링 버퍼로 보관합니다. 답변의 참고자료는 청크 ID 참조만
+메시지에 저장하고, 본문은 크기가 제한된 공유 테이블(LRU)에서 (네임스페이스, ID)로 조회합니다.
+"""
+
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 메시지에 보관하는 참고자료 필드 (본문 제외)
+SOURCE_REF_FIELDS = ("id", "score", "source", "chunk_index", "chunk_size", "namespace",
+                     "doc_id", "page_start", "page_end", "articles", "references", "retrieval")
+
+
+class ChatHistory:
+    """링 버퍼 기반 대화 기록
+
+    max_messages를 넘으면 가장 오래된 메시지부터 버리고, 참고자료 본문은
+    max_contents개까지만 메모리에 보관합니다. 밀려난 본문은 content_loader(청크 ID, 네임스페이스)로
+    다시 읽어옵니다 (예: 로컬 청크 저장소). 네임스페이스마다 같은 청크 ID가 있을 수 있으므로
+    본문은 (네임스페이스, 청크 ID)로 구분합니다.
+    """
+
+    def __init__(self, max_messages: int = 100, max_contents: int = 300,
+                 content_loader: Optional[Callable[[str, Optional[str]], Optional[str]]] = None):
+        self.messages = deque(maxlen=max_messages)
+        self.max_contents = max_contents
+        self.content_loader = content_loader
+        self._contents: "OrderedDict[Tuple[Optional[str], str], str]" = OrderedDict()
+        self.dropped = 0
+        self.counts = {"user": 0, "assistant": 0}
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __bool__(self) -> bool:
+        return len(self.messages) > 0
+
+    def _append(self, message: Dict) -> None:
+        if len(self.messages) == self.messages.maxlen:
+            evicted = self.messages[0]
+            self.counts[evicted["role"]] -= 1
+            self.dropped += 1
+        self.messages.append(message)
+        self.counts[message["role"]] += 1
+
+    def add_user(self, content: str) -> None:
+        """사용자 메시지를 추가합니다."""
+        self._append({"role": "user", "content": content})
+
+    def add_assistant(self, content: str, sources: Optional[List[Dict]] = None, **extra) -> None:
+        """답변 메시지를 추가합니다. 참고자료 본문은 청크 ID 참조로 바꿔 저장합니다."""
+        message = {"role": "assistant", "content": content}
+        if sources is not None:
+            message["sources"] = self.to_refs(sources)
+        message.update(extra)
+        self._append(message)
+
+    def to_refs(self, sources: List[Dict]) -> List[Dict]:
+        """참고자료 목록을 본문 없는 참조 목록으로 바꾸고 본문은 공유 테이블에 보관합니다."""
+        refs = []
+        for source in sources:
+            if "content" in source and source.get("id"):
+                self._remember((source.get("namespace"), source["id"]), source["content"])
+            refs.append({key: source[key] for key in SOURCE_REF_FIELDS if key in source})
+        return refs
+
+    def _remember(self, key: Tuple[Optional[str], str], content: str) -> None:
+        self._contents[key] = content
+        self._contents.move_to_end(key)
+        while len(self._contents) > self.max_contents:
+            self._contents.popitem(last=False)
+
+    def source_content(self, chunk_id: str, namespace: Optional[str] = None) -> str:
+        """(네임스페이스, 청크 ID)로 참고자료 본문을 조회합니다."""
+        key = (namespace, chunk_id)
+        content = self._contents.get(key)
+        if content is None and self.content_loader is not None:
+            content = self.content_loader(chunk_id, namespace)
+            if content is not None:
+                self._remember(key, content)
+        return content or ""
+
+    def visible(self, page_size: int, pages: int = 1) -> List[Dict]:
+        """화면에 그릴 최근 메시지 (page_size * pages개)를 반환합니다."""
+        count = min(len(self.messages), page_size * pages)
+        start = len(self.messages) - count
+        return [self.messages[i] for i in range(start, len(self.messages))]
+
+    def recent(self, n: int) -> List[Dict]:
+        """최근 n개 메시지를 반환합니다."""
+        return self.visible(n)
+
+    def last(self, role: str) -> Optional[Dict]:
+        """해당 역할의 가장 최근 메시지를 반환합니다."""
+        for i in range(len(self.messages) - 1, -1, -1):
+            if self.messages[i]["role"] == role:
+                return self.messages[i]
+        return None
+
+    def clear(self) -> None:
+        """대화 기록을 모두 지웁니다."""
+        self.messages.clear()
+        self._contents.clear()
+        self.dropped = 0
+        self.counts = {"user": 0, "assistant": 0}
+
+    def stats(self) -> Dict:
+        """디버그 패널용 요약 정보를 반환합니다."""
+        return {
+            "messages": len(self.messages),
+            "max_messages": self.messages.maxlen,
+            "dropped": self.dropped,
+            "cached_contents": len(self._contents),
+            "user": self.counts["user"],
+            "assistant": self.counts["assistant"],
+        }
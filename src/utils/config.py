@@ -1,69 +1,324 @@
 """
 Configuration Management
 설정 관리 모듈
+
+환경 변수(.env 포함)를 한 번 읽어 검증한 불변 설정 객체(Settings)를 프로세스 전체에서
+공유합니다. .env 파일이 바뀌면 SETTINGS_RELOAD_INTERVAL초마다 하는 확인에서 새 설정으로
+교체되므로, 워커를 재시작하지 않아도 MAX_SEARCH_RESULTS 같은 조정값이 반영됩니다.
 """
 
 import os
-from dotenv import load_dotenv
+import threading
+import time
+from dataclasses import asdict, dataclass, field, fields
+from functools import cached_property
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+from dotenv import dotenv_values, find_dotenv, load_dotenv
+
+from .metrics import metrics
+
+# .env보다 먼저 설정된 프로세스 환경 변수 (.env에서 지워진 값을 되돌릴 때 사용)
+_BASE_ENV = dict(os.environ)
+ENV_FILE = find_dotenv()
 
 # 환경 변수 로드
-load_dotenv(override=True)
+load_dotenv(ENV_FILE, override=True)
 
-# 디버그 모드 설정
+# 디버그 모드 설정 (시작 시점 값)
 DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() == "true"
 
-def get_config():
-    """애플리케이션 설정을 반환합니다."""
-    return {
-        # OpenAI 설정
-        "openai_api_key": os.getenv("OPENAI_API_KEY"),
-        
-        # Pinecone 설정
-        "pinecone_api_key": os.getenv("PINECONE_API_KEY"),
-        "pinecone_index_name": os.getenv("PINECONE_INDEX_NAME", "insurance-terms-rag"),
-        
-        # LangSmith 설정
-        "langsmith_api_key": os.getenv("LANGSMITH_API_KEY"),
-        "langsmith_project": os.getenv("LANGSMITH_PROJECT", "insurance-rag-system"),
-        "langsmith_endpoint": os.getenv("LANGSMITH_ENDPOINT", "https://api.smith.langchain.com"),
-        "langsmith_tracing_v2": os.getenv("LANGSMITH_TRACING_V2", "true").lower() == "true",
-        
-        # 디버그 설정
-        "debug_mode": DEBUG_MODE,
-        
-        # 검색 설정
-        "max_search_results": int(os.getenv("MAX_SEARCH_RESULTS", "5")),
-        "embedding_model": os.getenv("EMBEDDING_MODEL", "multilingual-e5-large"),
-        
-        # 답변 생성 설정
-        "max_context_length": int(os.getenv("MAX_CONTEXT_LENGTH", "3000")),
-        "chunk_size": int(os.getenv("CHUNK_SIZE", "1000")),
-        "chunk_overlap": int(os.getenv("CHUNK_OVERLAP", "200")),
-    }
+
+def _env(name: str, default, secret: bool = False):
+    """환경 변수 이름을 기록한 설정 필드"""
+    return field(default=default, repr=not secret, metadata={"env": name})
+
+
+@dataclass(frozen=True)
+class Settings:
+    """애플리케이션 설정 (불변). Settings.from_env()로 만들며 만들 때 값을 검증합니다."""
+
+    # OpenAI 설정
+    openai_api_key: Optional[str] = _env("OPENAI_API_KEY", None, secret=True)
+
+    # Pinecone 설정
+    pinecone_api_key: Optional[str] = _env("PINECONE_API_KEY", None, secret=True)
+    pinecone_index_name: str = _env("PINECONE_INDEX_NAME", "insurance-terms-rag")
+
+    # LangSmith 설정
+    langsmith_api_key: Optional[str] = _env("LANGSMITH_API_KEY", None, secret=True)
+    langsmith_project: str = _env("LANGSMITH_PROJECT", "insurance-rag-system")
+    langsmith_endpoint: str = _env("LANGSMITH_ENDPOINT", "https://api.smith.langchain.com")
+    langsmith_tracing_v2: bool = _env("LANGSMITH_TRACING_V2", True)
+
+    # 디버그 설정
+    debug_mode: bool = _env("DEBUG_MODE", False)
+
+    # 검색 설정
+    max_search_results: int = _env("MAX_SEARCH_RESULTS", 5)
+    embedding_model: str = _env("EMBEDDING_MODEL", "multilingual-e5-large")
+    search_namespaces: Tuple[str, ...] = _env("SEARCH_NAMESPACES", ("default",))
+    # 질문에 "제N조"가 있으면 해당 조항 청크로 좁혀 먼저 검색
+    auto_article_filter: bool = _env("AUTO_ARTICLE_FILTER", True)
+    # 로컬 역색인: 조항/인용 용어 정확 조회, 벡터 결과와 키워드 순위 융합(RRF)
+    lexical_exact_lookup: bool = _env("LEXICAL_EXACT_LOOKUP", True)
+    lexical_fusion: bool = _env("LEXICAL_FUSION", True)
+
+    # 점수 게이트 설정 (최상위 검색 점수 기준)
+    min_retrieval_score: float = _env("MIN_RETRIEVAL_SCORE", 0.0)
+    high_confidence_score: float = _env("HIGH_CONFIDENCE_SCORE", 0.9)
+    # 위 게이트로 청크의 미리 계산된 답변을 줄 때 요구하는 (답변을 만든 질문과의) 질문 유사도
+    precomputed_question_similarity: float = _env("PRECOMPUTED_QUESTION_SIMILARITY", 0.6)
+
+    # 답변 생성 설정
+    max_context_length: int = _env("MAX_CONTEXT_LENGTH", 3000)
+    chunk_size: int = _env("CHUNK_SIZE", 1000)
+    chunk_overlap: int = _env("CHUNK_OVERLAP", 200)
+
+    # 요청 마감 시간 설정
+    request_timeout_seconds: float = _env("REQUEST_TIMEOUT_SECONDS", 20.0)
+    hedge_retrieval: bool = _env("HEDGE_RETRIEVAL", True)
+
+    # 외부 API 호출 안정화 설정 (속도 제한은 초당 요청 수)
+    openai_rate_limit: float = _env("OPENAI_RATE_LIMIT", 10.0)
+    openai_max_concurrency: int = _env("OPENAI_MAX_CONCURRENCY", 16)
+    pinecone_rate_limit: float = _env("PINECONE_RATE_LIMIT", 20.0)
+    pinecone_max_concurrency: int = _env("PINECONE_MAX_CONCURRENCY", 32)
+    max_retries: int = _env("MAX_RETRIES", 3)
+    retry_base_delay: float = _env("RETRY_BASE_DELAY", 0.5)
+    circuit_failure_threshold: int = _env("CIRCUIT_FAILURE_THRESHOLD", 5)
+    circuit_recovery_seconds: float = _env("CIRCUIT_RECOVERY_SECONDS", 30.0)
+
+    # 채팅 UI 설정
+    chat_history_max_messages: int = _env("CHAT_HISTORY_MAX_MESSAGES", 100)
+    chat_history_page_size: int = _env("CHAT_HISTORY_PAGE_SIZE", 10)
+
+    # HTTP 서비스 설정
+    service_host: str = _env("SERVICE_HOST", "127.0.0.1")
+    service_port: int = _env("SERVICE_PORT", 8000)
+    service_workers: int = _env("SERVICE_WORKERS", 2)
+
+    # 업로드 설정
+    upload_batch_size: int = _env("UPLOAD_BATCH_SIZE", 10)
+    # 업로드 후 인덱스 레코드 수가 맞을 때까지 기다리는 최대 시간(초; FAQ 사전 생성 전)
+    index_sync_timeout_seconds: float = _env("INDEX_SYNC_TIMEOUT_SECONDS", 120.0)
+    # 수집 시 중복 청크 제거 (MinHash/LSH, shingle 자카드 유사도 기준)
+    dedup_enabled: bool = _env("DEDUP_ENABLED", True)
+    dedup_threshold: float = _env("DEDUP_THRESHOLD", 0.85)
+
+    # 로컬 저장소 설정
+    chunk_store_path: str = _env("CHUNK_STORE_PATH", "./store/chunks")
+    upload_job_path: str = _env("UPLOAD_JOB_PATH", "./store/upload_job")
+    answer_store_path: str = _env("ANSWER_STORE_PATH", "./store/answers.json")
+    faq_questions_path: str = _env("FAQ_QUESTIONS_PATH", "./docs/faq_questions.txt")
+
+    # 요청 추적 (헤드 샘플링 비율, OTLP JSON 회전 파일)
+    trace_sample_rate: float = _env("TRACE_SAMPLE_RATE", 0.01)
+    trace_export_dir: str = _env("TRACE_EXPORT_DIR", "./store/traces")
+    trace_max_bytes: int = _env("TRACE_MAX_BYTES", 10_000_000)
+    trace_backup_count: int = _env("TRACE_BACKUP_COUNT", 5)
+    trace_queue_size: int = _env("TRACE_QUEUE_SIZE", 10_000)
+
+    # 설정 다시 읽기: .env 변경 확인 주기(초), 0이면 자동으로 다시 읽지 않음
+    settings_reload_interval: float = _env("SETTINGS_RELOAD_INTERVAL", 2.0)
+
+    def __post_init__(self):
+        errors = self.validate()
+        if errors:
+            raise ValueError("잘못된 설정값이 있습니다: " + "; ".join(errors))
+
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "Settings":
+        """환경 변수에서 설정을 읽습니다. 형식이 틀리거나 범위를 벗어난 값은 모아서 ValueError로 알립니다."""
+        environ = os.environ if environ is None else environ
+        values = {}
+        errors = []
+        for setting in fields(cls):
+            raw = environ.get(setting.metadata["env"])
+            if raw is None:
+                continue
+            try:
+                values[setting.name] = _parse(setting.type, raw, setting.default)
+            except ValueError:
+                errors.append(f"{setting.metadata['env']}={raw!r} ({_TYPE_NAMES.get(setting.type, 'str')} 값이 아님)")
+        if errors:
+            raise ValueError("잘못된 설정값이 있습니다: " + "; ".join(errors))
+        return cls(**values)
+
+    def validate(self) -> List[str]:
+        """값의 범위를 검사하여 오류 메시지 목록을 반환합니다."""
+        errors = []
+
+        def check(name: str, ok: bool, rule: str):
+            if not ok:
+                env = next(s.metadata["env"] for s in fields(self) if s.name == name)
+                errors.append(f"{env}={getattr(self, name)!r} ({rule})")
+
+        for name in ("max_search_results", "max_context_length", "chunk_size", "openai_max_concurrency",
+                     "pinecone_max_concurrency", "circuit_failure_threshold", "chat_history_max_messages",
+                     "chat_history_page_size", "service_workers", "upload_batch_size", "trace_max_bytes",
+                     "trace_queue_size"):
+            check(name, getattr(self, name) >= 1, "1 이상이어야 함")
+        for name in ("request_timeout_seconds", "openai_rate_limit", "pinecone_rate_limit"):
+            check(name, getattr(self, name) > 0, "0보다 커야 함")
+        for name in ("max_retries", "retry_base_delay", "circuit_recovery_seconds", "settings_reload_interval",
+                     "trace_backup_count", "index_sync_timeout_seconds"):
+            check(name, getattr(self, name) >= 0, "0 이상이어야 함")
+        for name in ("min_retrieval_score", "high_confidence_score", "precomputed_question_similarity",
+                     "trace_sample_rate"):
+            check(name, 0.0 <= getattr(self, name) <= 1.0, "0~1 사이여야 함")
+        check("dedup_threshold", 0.0 < self.dedup_threshold <= 1.0, "0 초과 1 이하여야 함")
+        check("chunk_overlap", 0 <= self.chunk_overlap < self.chunk_size, "0 이상 CHUNK_SIZE 미만이어야 함")
+        check("service_port", 1 <= self.service_port <= 65535, "1~65535 사이여야 함")
+        return errors
+
+    @cached_property
+    def _mapping(self) -> Mapping:
+        return MappingProxyType(asdict(self))
+
+    def as_dict(self) -> Mapping:
+        """설정을 읽기 전용 매핑으로 반환합니다 (설정 객체마다 한 번만 만듦)."""
+        return self._mapping
+
+
+_TYPE_NAMES = {bool: "true/false", int: "정수", float: "실수", Tuple[str, ...]: "쉼표 목록"}
+
+
+def _parse(kind, raw: str, default):
+    if kind is bool:
+        return raw.strip().lower() == "true"
+    if kind is int:
+        return int(raw)
+    if kind is float:
+        return float(raw)
+    if kind == Tuple[str, ...]:
+        return tuple(item.strip() for item in raw.split(",") if item.strip()) or default
+    if kind == Optional[str]:
+        return raw or None
+    return raw
+
+
+# ----------------------------------------------------------------------
+# 프로세스 전역 설정
+# ----------------------------------------------------------------------
+_settings: Optional[Settings] = None
+_settings_lock = threading.Lock()
+_env_file_values: Dict[str, str] = {}
+_env_file_mtime: Optional[float] = None
+_next_check = 0.0
+_listeners: List[Callable[[Settings], None]] = []
+
+
+def _env_file_stat() -> Optional[float]:
+    try:
+        return os.stat(ENV_FILE).st_mtime if ENV_FILE else None
+    except OSError:
+        return None
+
+
+def _apply_env_file() -> None:
+    """.env 값을 os.environ에 반영합니다. .env에서 지워진 값은 시작 전 값으로 되돌립니다."""
+    global _env_file_values, _env_file_mtime
+    _env_file_mtime = _env_file_stat()
+    values = {}
+    if _env_file_mtime is not None:
+        values = {key: value for key, value in dotenv_values(ENV_FILE).items() if value is not None}
+    for key in _env_file_values.keys() - values.keys():
+        if key in _BASE_ENV:
+            os.environ[key] = _BASE_ENV[key]
+        else:
+            os.environ.pop(key, None)
+    os.environ.update(values)
+    _env_file_values = values
+
+
+def _load_locked() -> Settings:
+    global _settings, _next_check
+    _apply_env_file()
+    settings = Settings.from_env()
+    previous, _settings = _settings, settings
+    _next_check = time.monotonic() + settings.settings_reload_interval
+    if previous is not None and previous != settings:
+        metrics.incr("settings.reloads")
+        changed = [s.metadata["env"] for s in fields(Settings)
+                   if getattr(previous, s.name) != getattr(settings, s.name)]
+        print(f"🔄 설정을 다시 읽었습니다: {', '.join(changed)}")
+        for listener in list(_listeners):
+            listener(settings)
+    return settings
+
+
+def get_settings() -> Settings:
+    """프로세스 전역 설정을 반환합니다.
+
+    처음 호출할 때 읽고 검증하며, 이후에는 같은 객체를 반환합니다. 확인 주기가 지나면
+    .env 파일의 수정 시각만 보고, 바뀌었을 때만 다시 읽습니다. 바뀐 .env가 잘못되었으면
+    경고를 남기고 기존 설정을 계속 사용합니다.
+    """
+    settings = _settings
+    if settings is None:
+        with _settings_lock:
+            return _settings or _load_locked()
+    if settings.settings_reload_interval and time.monotonic() >= _next_check:
+        with _settings_lock:
+            if _settings is settings and time.monotonic() >= _next_check:
+                _check_env_file_locked()
+    return _settings
+
+
+def _check_env_file_locked() -> None:
+    global _next_check
+    _next_check = time.monotonic() + _settings.settings_reload_interval
+    if _env_file_stat() == _env_file_mtime:
+        return
+    try:
+        _load_locked()
+    except ValueError as e:
+        # 같은 수정 시각에 대해 경고를 반복하지 않습니다.
+        metrics.incr("settings.reload_errors")
+        print(f"⚠️ .env 변경을 반영하지 못해 기존 설정을 유지합니다: {e}")
+
+
+def reload_settings() -> Settings:
+    """.env와 환경 변수를 지금 다시 읽어 설정을 교체합니다. 값이 잘못되었으면 ValueError를 냅니다."""
+    with _settings_lock:
+        return _load_locked()
+
+
+def on_settings_change(listener: Callable[[Settings], None]) -> None:
+    """설정이 다시 읽혀 값이 바뀌었을 때 호출할 함수를 등록합니다."""
+    _listeners.append(listener)
+
+
+def get_config() -> Mapping:
+    """애플리케이션 설정을 읽기 전용 매핑으로 반환합니다 (get_settings()의 호환용 형태)."""
+    return get_settings().as_dict()
+
 
 def validate_config():
     """필수 설정이 있는지 확인합니다."""
-    config = get_config()
+    settings = get_settings()
     required_keys = ["openai_api_key", "pinecone_api_key"]
-    
-    missing_keys = [key for key in required_keys if not config.get(key)]
-    
+
+    missing_keys = [key for key in required_keys if not getattr(settings, key)]
+
     if missing_keys:
         raise ValueError(f"필수 환경 변수가 설정되지 않았습니다: {', '.join(missing_keys)}")
-    
+
     return True
 
 def setup_langsmith():
     """LangSmith 설정을 초기화합니다."""
-    config = get_config()
-    
-    if config.get("langsmith_api_key"):
-        os.environ["LANGCHAIN_API_KEY"] = config["langsmith_api_key"]
-        os.environ["LANGCHAIN_PROJECT"] = config["langsmith_project"]
-        os.environ["LANGCHAIN_ENDPOINT"] = config["langsmith_endpoint"]
-        os.environ["LANGCHAIN_TRACING_V2"] = str(config["langsmith_tracing_v2"])
-        
-        print(f"✅ LangSmith 설정 완료: 프로젝트 '{config['langsmith_project']}'")
+    settings = get_settings()
+
+    if settings.langsmith_api_key:
+        os.environ["LANGCHAIN_API_KEY"] = settings.langsmith_api_key
+        os.environ["LANGCHAIN_PROJECT"] = settings.langsmith_project
+        os.environ["LANGCHAIN_ENDPOINT"] = settings.langsmith_endpoint
+        os.environ["LANGCHAIN_TRACING_V2"] = str(settings.langsmith_tracing_v2)
+
+        print(f"✅ LangSmith 설정 완료: 프로젝트 '{settings.langsmith_project}'")
         return True
     else:
         print("⚠️ LangSmith API 키가 설정되지 않았습니다. LangSmith 추적이 비활성화됩니다.")
@@ -0,0 +1,166 @@
+"""
+Request Deadlines
+요청 마감 시간 관리 모듈
+
+요청 단위 마감 시간을 만들고 검색/생성 단계에 남은 시간만큼만 실행되도록 전파합니다.
+
+마감 시간이 있는 호출은 단계("retrieval", "generation", "fanout")별로 따로 둔 스레드 풀에서
+실행하므로, 한 단계의 외부 호출이 멈춰도 다른 단계는 막히지 않습니다. 마감 시간이 지나
+포기한 작업은 스레드에서 끝날 때까지 풀의 용량을 차지하며, 빈 슬롯이 없으면 요청을 큐에
+쌓지 않고 남은 시간 안에서만 기다린 뒤 시간 초과로 처리합니다.
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional, Set
+
+from .metrics import metrics
+from .tracing import submit_in_context
+
+# 단계별 스레드 풀 크기 (목록에 없는 단계는 DEFAULT_POOL_SIZE)
+STAGE_POOL_SIZES = {"retrieval": 32, "fanout": 32, "generation": 16}
+DEFAULT_POOL_SIZE = 8
+
+
+class DeadlineExceeded(Exception):
+    """요청 마감 시간이 지났을 때 발생합니다.
+
+    재시도 대상 오류로 분류되지 않도록 TimeoutError를 상속하지 않습니다.
+    """
+
+
+class Deadline:
+    """요청 마감 시간 (timeout이 None이면 무제한)"""
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self.expires_at = None if timeout is None else time.monotonic() + timeout
+
+    def remaining(self) -> Optional[float]:
+        """남은 시간(초)을 반환합니다. 무제한이면 None을 반환합니다."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def check(self, stage: str = "") -> None:
+        """마감 시간이 지났으면 DeadlineExceeded를 던집니다."""
+        if self.expired:
+            raise DeadlineExceeded(f"요청 마감 시간 초과{f' ({stage})' if stage else ''}")
+
+
+class StagePool:
+    """한 단계의 호출을 실행하는 크기 제한 스레드 풀
+
+    슬롯은 작업이 실제로 끝날 때 반납합니다. 호출자가 포기한(abandoned) 작업도 끝날 때까지
+    슬롯을 차지하므로, 멈춘 호출이 쌓이면 새 작업은 큐에서 기다리지 않고 바로 거절됩니다.
+    메트릭: `pool.{name}.rejected`, `pool.{name}.abandoned`
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"rag-{name}")
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._abandoned: Set[Future] = set()
+
+    def submit(self, fn: Callable[..., Any], *args, deadline: Optional[Deadline] = None, wait: bool = True,
+               **kwargs) -> Optional[Future]:
+        """빈 슬롯을 얻어 fn을 제출합니다 (현재 추적 span 등 컨텍스트를 함께 전달).
+
+        슬롯은 deadline의 남은 시간까지만 기다리며, 얻지 못하면 DeadlineExceeded를 던집니다.
+        wait=False면 기다리지 않고 None을 반환합니다 (헤지 요청처럼 생략할 수 있는 작업).
+        """
+        if wait:
+            acquired = self._slots.acquire(timeout=deadline.remaining() if deadline is not None else None)
+        else:
+            acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            metrics.incr(f"pool.{self.name}.rejected")
+            if not wait:
+                return None
+            raise DeadlineExceeded(f"요청 마감 시간 초과 ({self.name} 실행 슬롯 대기)")
+
+        with self._lock:
+            self._in_use += 1
+        try:
+            future = submit_in_context(self._executor, fn, *args, **kwargs)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future: Optional[Future]) -> None:
+        with self._lock:
+            self._in_use -= 1
+            self._abandoned.discard(future)
+        self._slots.release()
+
+    def abandon(self, future: Future) -> None:
+        """호출자가 더 이상 기다리지 않는 작업을 표시합니다. 아직 시작 전이면 취소합니다."""
+        if future.cancel():
+            return
+        with self._lock:
+            if not future.done():
+                self._abandoned.add(future)
+                metrics.incr(f"pool.{self.name}.abandoned")
+
+    def stats(self) -> Dict[str, int]:
+        """풀 크기, 사용 중인 슬롯 수, 그중 포기한 작업 수를 반환합니다."""
+        with self._lock:
+            return {"size": self.max_workers, "in_use": self._in_use, "abandoned": len(self._abandoned)}
+
+
+_pools: Dict[str, StagePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(stage: str) -> StagePool:
+    """단계별 스레드 풀을 반환합니다 (처음 사용할 때 만듦)."""
+    pool = _pools.get(stage)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(stage)
+            if pool is None:
+                pool = StagePool(stage, STAGE_POOL_SIZES.get(stage, DEFAULT_POOL_SIZE))
+                _pools[stage] = pool
+    return pool
+
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    """만들어진 단계별 풀의 상태를 반환합니다."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {stage: pool.stats() for stage, pool in pools.items()}
+
+
+def submit(fn: Callable[..., Any], *args, stage: str = "default", deadline: Optional[Deadline] = None,
+           wait: bool = True, **kwargs) -> Optional[Future]:
+    """stage 풀에 작업을 제출합니다 (StagePool.submit 참고)."""
+    return get_pool(stage).submit(fn, *args, deadline=deadline, wait=wait, **kwargs)
+
+
+def run_with_deadline(fn: Callable[..., Any], deadline: Optional[Deadline], *args, stage: str = "", **kwargs) -> Any:
+    """fn을 남은 시간 안에서만 기다립니다.
+
+    마감 시간이 없으면 현재 스레드에서 바로 실행합니다. 시간이 초과되면 작업은
+    포기한 작업으로 표시하고(끝날 때까지 stage 풀의 슬롯 차지) DeadlineExceeded를 던집니다.
+    """
+    if deadline is None or deadline.expires_at is None:
+        return fn(*args, **kwargs)
+
+    deadline.check(stage)
+    pool = get_pool(stage or "default")
+    future = pool.submit(fn, *args, deadline=deadline, **kwargs)
+    try:
+        return future.result(timeout=deadline.remaining())
+    except FutureTimeoutError:
+        pool.abandon(future)
+        raise DeadlineExceeded(f"요청 마감 시간 초과{f' ({stage})' if stage else ''}") from None
@@ -0,0 +1,46 @@
+"""
+Metrics
+프로세스 전역 카운터 모듈
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict
+
+
+class Metrics:
+    """스레드 안전한 프로세스 전역 카운터 모음"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """카운터를 증가시킵니다."""
+        with self._lock:
+            self._counters[name] += value
+
+    def get(self, name: str) -> float:
+        """카운터 값을 반환합니다."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def ratio(self, numerator: str, denominator: str) -> float:
+        """두 카운터의 비율을 반환합니다. 분모가 0이면 0.0을 반환합니다."""
+        with self._lock:
+            total = self._counters.get(denominator, 0)
+            return self._counters.get(numerator, 0) / total if total else 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        """현재 카운터 값의 복사본을 반환합니다."""
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self) -> None:
+        """모든 카운터를 초기화합니다."""
+        with self._lock:
+            self._counters.clear()
+
+
+# 프로세스 전역 인스턴스
+metrics = Metrics()
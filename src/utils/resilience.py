@@ -0,0 +1,324 @@
+"""
+Client-side Resilience
+외부 API 호출 안정화 모듈
+
+OpenAI/Pinecone 호출에 공통으로 적용하는 토큰 버킷 속도 제한, 지터 백오프 재시도,
+적응형 동시성 제한, 서킷 브레이커를 제공합니다.
+"""
+
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .config import Settings, get_settings, on_settings_change
+from .deadline import Deadline, DeadlineExceeded
+from .metrics import metrics
+
+# 재시도 대상 HTTP 상태 코드
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# 시도마다 넘기는 HTTP 타임아웃의 최솟값(초)
+MIN_ATTEMPT_TIMEOUT = 0.01
+
+# 상태 코드가 없는 예외는 클래스 이름으로 판별합니다 (openai.RateLimitError, APITimeoutError 등)
+RETRYABLE_NAME_TOKENS = ("RateLimit", "Timeout", "Connection", "ServiceUnavailable", "InternalServer")
+
+
+class CircuitOpenError(Exception):
+    """서킷이 열려 있어 호출을 즉시 거부했을 때 발생합니다."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """재시도하면 성공할 수 있는 일시적 오류인지 판별합니다."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS_CODES
+
+    name = type(error).__name__
+    return any(token in name for token in RETRYABLE_NAME_TOKENS)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """full jitter 지수 백오프 대기 시간을 계산합니다."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """초당 rate개의 토큰을 채우는 토큰 버킷 속도 제한기"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self.capacity = max(1.0, rate)
+            self._tokens = min(self._tokens, self.capacity)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """토큰 하나를 얻을 때까지 기다립니다. timeout 안에 얻지 못하면 False를 반환합니다."""
+        if self.rate <= 0:
+            return True
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD 방식의 적응형 동시성 제한기
+
+    성공하면 한도를 천천히 늘리고, 과부하(429/타임아웃) 신호를 받으면 절반으로 줄입니다.
+    """
+
+    def __init__(self, initial: int, min_limit: int = 1, max_limit: Optional[int] = None):
+        self.min_limit = min_limit
+        self.max_limit = max_limit if max_limit is not None else initial
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """실행 슬롯을 얻을 때까지 기다립니다. timeout 안에 얻지 못하면 False를 반환합니다."""
+        with self._cond:
+            acquired = self._cond.wait_for(lambda: self._in_flight < int(self._limit), timeout=timeout)
+            if acquired:
+                self._in_flight += 1
+            return acquired
+
+    def set_max_limit(self, max_limit: int) -> None:
+        with self._cond:
+            self.max_limit = max_limit
+            self._limit = min(self._limit, max_limit)
+            self._cond.notify_all()
+
+    def release(self, overloaded: bool = False) -> None:
+        """슬롯을 반납하고 결과에 따라 한도를 조정합니다."""
+        with self._cond:
+            self._in_flight -= 1
+            if overloaded:
+                self._limit = max(self.min_limit, self._limit / 2)
+            else:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """연속 실패 시 호출을 차단하는 서킷 브레이커
+
+    closed → (연속 실패 failure_threshold회) → open → (recovery_timeout 경과) → half_open
+    half_open 상태에서는 시험 호출 하나만 허용하며, 성공하면 closed, 실패하면 다시 open이 됩니다.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """호출을 허용할지 판단합니다."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # half_open: 시험 호출 하나만 허용 (결과가 기록되지 않은 채 오래된 시험 호출은 무시)
+            now = time.monotonic()
+            if self._probe_in_flight and now - self._probe_started_at < self.recovery_timeout:
+                return False
+            self._probe_in_flight = True
+            self._probe_started_at = now
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+def _remaining(deadline: Optional[Deadline]) -> Optional[float]:
+    return deadline.remaining() if deadline is not None else None
+
+
+class Dependency:
+    """외부 의존성 하나에 대한 속도 제한 + 재시도 + 동시성 제한 + 서킷 브레이커 묶음"""
+
+    def __init__(self, name: str, rate: float, max_concurrency: int, max_retries: int = 3,
+                 base_delay: float = 0.5, max_delay: float = 8.0,
+                 failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.bucket = TokenBucket(rate)
+        self.limiter = AdaptiveConcurrencyLimiter(max_concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+
+    def configure(self, rate: float, max_concurrency: int, max_retries: int, base_delay: float,
+                  failure_threshold: int, recovery_timeout: float) -> None:
+        """현재 상태(토큰, 진행 중 호출, 서킷 상태)는 유지한 채 조정값만 바꿉니다."""
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.bucket.set_rate(rate)
+        self.limiter.set_max_limit(max_concurrency)
+        self.breaker.failure_threshold = failure_threshold
+        self.breaker.recovery_timeout = recovery_timeout
+
+    def call(self, fn: Callable[..., Any], *args, deadline: Optional[Deadline] = None,
+             timeout_arg: Optional[str] = None, **kwargs) -> Any:
+        """fn(*args, **kwargs)를 보호된 상태로 호출합니다.
+
+        서킷이 열려 있으면 즉시 CircuitOpenError를 던지고, 재시도 가능한 오류는
+        지터 백오프로 max_retries회까지 재시도합니다. deadline이 주어지면 대기와
+        재시도는 남은 시간 안에서만 수행하고, 초과 시 DeadlineExceeded를 던집니다.
+        timeout_arg(예: "timeout")를 주면 시도마다 그 시점의 남은 시간을 해당 키워드 인자로
+        넘겨, 마감 시간이 지난 뒤에도 HTTP 호출이 스레드를 붙잡고 있지 않게 합니다.
+        """
+        if not self.breaker.allow():
+            metrics.incr(f"{self.name}.circuit_rejected")
+            raise CircuitOpenError(f"{self.name} 서킷이 열려 있습니다.")
+
+        attempt = 0
+        while True:
+            if not self.bucket.acquire(timeout=_remaining(deadline)):
+                raise DeadlineExceeded(f"{self.name} 속도 제한 대기 중 마감 시간 초과")
+            if not self.limiter.acquire(timeout=_remaining(deadline)):
+                raise DeadlineExceeded(f"{self.name} 동시성 제한 대기 중 마감 시간 초과")
+            metrics.incr(f"{self.name}.attempts")
+            call_kwargs = kwargs
+            remaining = _remaining(deadline)
+            if timeout_arg is not None and remaining is not None:
+                call_kwargs = dict(kwargs, **{timeout_arg: max(remaining, MIN_ATTEMPT_TIMEOUT)})
+            try:
+                result = fn(*args, **call_kwargs)
+            except Exception as e:
+                if deadline is not None and deadline.expired:
+                    # 마감 시간으로 잘린 호출은 의존성의 과부하/장애로 보지 않습니다.
+                    self.limiter.release(overloaded=False)
+                    raise DeadlineExceeded(f"{self.name} 호출 중 마감 시간 초과") from e
+                retryable = is_retryable(e)
+                self.limiter.release(overloaded=retryable)
+                if not retryable:
+                    # 의존성은 응답했으므로 서킷 상태에는 실패로 반영하지 않습니다.
+                    self.breaker.record_success()
+                    raise
+
+                metrics.incr(f"{self.name}.errors")
+                if attempt >= self.max_retries:
+                    self.breaker.record_failure()
+                    metrics.incr(f"{self.name}.failures")
+                    raise
+
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                remaining = _remaining(deadline)
+                if remaining is not None and delay >= remaining:
+                    raise DeadlineExceeded(f"{self.name} 재시도 대기 중 마감 시간 초과") from e
+
+                metrics.incr(f"{self.name}.retries")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            self.limiter.release(overloaded=False)
+            self.breaker.record_success()
+            return result
+
+
+# 프로세스 전역 의존성 레지스트리
+_dependencies: Dict[str, Dependency] = {}
+_registry_lock = threading.Lock()
+
+
+def _dependency_options(settings: Settings, name: str) -> Dict[str, Any]:
+    return {
+        "rate": getattr(settings, f"{name}_rate_limit"),
+        "max_concurrency": getattr(settings, f"{name}_max_concurrency"),
+        "max_retries": settings.max_retries,
+        "base_delay": settings.retry_base_delay,
+        "failure_threshold": settings.circuit_failure_threshold,
+        "recovery_timeout": settings.circuit_recovery_seconds,
+    }
+
+
+def get_dependency(name: str) -> Dependency:
+    """프로세스 전역에서 공유하는 의존성 보호 객체를 반환합니다 ("openai", "pinecone")."""
+    with _registry_lock:
+        dependency = _dependencies.get(name)
+        if dependency is None:
+            dependency = Dependency(name, **_dependency_options(get_settings(), name))
+            _dependencies[name] = dependency
+        return dependency
+
+
+def _reconfigure_dependencies(settings: Settings) -> None:
+    """설정이 다시 읽히면 이미 만든 의존성 보호 객체에 새 조정값을 반영합니다."""
+    with _registry_lock:
+        for name, dependency in _dependencies.items():
+            dependency.configure(**_dependency_options(settings, name))
+
+
+on_settings_change(_reconfigure_dependencies)
+
+
+def reset_dependencies() -> None:
+    """레지스트리를 비웁니다. 다음 호출 시 현재 설정으로 다시 만들어집니다."""
+    with _registry_lock:
+        _dependencies.clear()
@@ -0,0 +1,82 @@
+"""
+Single-flight Request Coalescing
+동일 요청 병합 모듈
+
+같은 키로 동시에 들어온 호출은 하나만 실제로 실행하고, 나머지는 그 결과를 공유합니다.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .deadline import Deadline, DeadlineExceeded
+from .metrics import metrics
+
+
+class _Call:
+    """진행 중인 호출 하나의 상태"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """키 단위 동시 호출 병합기
+
+    `do(key, fn)`은 같은 키의 호출이 진행 중이면 새로 실행하지 않고 그 결과를 기다립니다.
+    호출 수와 병합 수는 `{name}.calls`, `{name}.coalesced` 메트릭으로,
+    자기 마감 시간 안에 결과를 받지 못한 대기자 수는 `{name}.follower_timeouts`로 기록됩니다.
+    """
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], deadline: Optional[Deadline] = None) -> Tuple[Any, bool]:
+        """fn을 실행하거나 진행 중인 동일 호출의 결과를 기다립니다.
+
+        반환값은 (결과, 병합 여부)입니다. fn이 예외를 던지면 모든 대기자에게 전파됩니다.
+        대기자는 실행 중인 호출의 마감 시간과 관계없이 자기 deadline의 남은 시간까지만
+        기다리며, 그 안에 끝나지 않으면 DeadlineExceeded를 던집니다.
+        """
+        metrics.incr(f"{self.name}.calls")
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            metrics.incr(f"{self.name}.coalesced")
+            if not call.done.wait(deadline.remaining() if deadline is not None else None):
+                metrics.incr(f"{self.name}.follower_timeouts")
+                raise DeadlineExceeded("요청 마감 시간 초과 (병합된 요청 대기)")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # 완료된 호출은 즉시 제거하여 이후 요청은 새로 실행되도록 합니다.
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+        return call.result, False
+
+    def in_flight(self) -> int:
+        """진행 중인 호출 수를 반환합니다."""
+        with self._lock:
+            return len(self._calls)
+
+    def coalescing_ratio(self) -> float:
+        """전체 호출 중 병합된 호출의 비율을 반환합니다."""
+        return metrics.ratio(f"{self.name}.coalesced", f"{self.name}.calls")
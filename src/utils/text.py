@@ -0,0 +1,36 @@
+"""
+Text Utilities
+텍스트 처리 유틸리티 모듈
+"""
+
+import re
+from typing import List, Optional
+
+# 조항 참조 ("제15조", "제 15 조", "제15조의2")
+ARTICLE_REFERENCE_PATTERN = re.compile(r'제\s*(\d+)\s*조(?:\s*의\s*(\d+))?')
+
+# 조항 제목 ("제15조(보험계약의 성립)") - 본문 속 참조와 구분하기 위해 괄호 제목이 있는 것만
+ARTICLE_HEADING_PATTERN = re.compile(r'제\s*(\d+)\s*조(?:\s*의\s*(\d+))?\s*[(（]([^)）\n]{1,40})[)）]')
+
+
+def normalize_query(query: str) -> str:
+    """질문을 비교용 키로 정규화합니다 (공백 정리, 소문자화)."""
+    return " ".join(query.split()).lower()
+
+
+def normalize_article(number: str, sub_number: Optional[str] = None) -> str:
+    """조항 번호를 "제15조" / "제15조의2" 형태로 정규화합니다."""
+    article = f"제{int(number)}조"
+    if sub_number:
+        article += f"의{int(sub_number)}"
+    return article
+
+
+def find_article_references(text: str) -> List[str]:
+    """텍스트에 언급된 조항을 등장 순서대로 (중복 없이) 반환합니다."""
+    articles = []
+    for match in ARTICLE_REFERENCE_PATTERN.finditer(text):
+        article = normalize_article(match.group(1), match.group(2))
+        if article not in articles:
+            articles.append(article)
+    return articles
@@ -0,0 +1,313 @@
+"""
+Request Tracing
+요청 추적 모듈
+
+검색, 컨텍스트 구성, 답변 생성, 수집 단계를 span으로 기록합니다. 외부 서비스 없이
+로컬 파일(OpenTelemetry OTLP JSON 형식, 한 줄에 배치 하나)에 내보내며 크기 기준으로 회전합니다.
+
+- 헤드 샘플링: 루트 span을 만들 때 TRACE_SAMPLE_RATE 확률로 추적 여부를 정하고, 하위 span은
+  부모의 결정을 따릅니다. 추적하지 않는 요청은 공유 no-op span만 사용하므로 비용이 거의 없습니다.
+- 현재 span은 contextvar로 전파합니다. 스레드 풀에 작업을 넘길 때는 submit_in_context()로
+  컨텍스트를 복사하여 하위 스레드의 span도 같은 트리에 붙습니다.
+- span은 끝날 때 큐에 넣고 백그라운드 스레드가 모아서 기록하므로 요청 경로에서 파일을 쓰지 않습니다.
+  큐는 TRACE_QUEUE_SIZE개로 제한되며, 기록이 밀려 가득 차면 새 span은 버리고 `tracing.dropped`로 셉니다.
+- DEBUG_MODE에서는 모든 요청을 추적합니다.
+
+파일은 TRACE_EXPORT_DIR/spans-<pid>.jsonl (prefork 워커마다 따로)이며, OpenTelemetry Collector의
+otlpjsonfile receiver 등으로 읽을 수 있습니다.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .config import get_settings
+from .metrics import metrics
+
+SERVICE_NAME = "insurance-rag"
+SCOPE_NAME = "insurance_rag.tracing"
+
+# OTLP span kind / status code
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+# 내보내기 배치 크기와 최대 대기 시간(초)
+EXPORT_BATCH_SIZE = 512
+EXPORT_INTERVAL_SECONDS = 1.0
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """기록되는 span 하나"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns",
+                 "attributes", "events", "status")
+
+    recording = True
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int,
+                 attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.events: List[Dict[str, Any]] = []
+        self.status = (STATUS_UNSET, "")
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, **attributes) -> None:
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes})
+
+    def record_exception(self, error: BaseException) -> None:
+        self.add_event("exception", **{"exception.type": type(error).__name__, "exception.message": str(error)})
+        self.status = (STATUS_ERROR, f"{type(error).__name__}: {error}")
+
+    def end(self) -> None:
+        if not self.end_ns:
+            self.end_ns = time.time_ns()
+            _exporter.put(self)
+
+
+class _NoopSpan:
+    """추적하지 않는 요청이 공유하는 span (모든 메서드가 아무것도 하지 않음)"""
+
+    recording = False
+    trace_id = span_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def add_event(self, name: str, **attributes) -> None:
+        pass
+
+    def record_exception(self, error: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_span():
+    """현재 span을 반환합니다. 없으면 no-op span을 반환합니다."""
+    return _current_span.get() or NOOP_SPAN
+
+
+def _sample() -> bool:
+    settings = get_settings()
+    rate = 1.0 if settings.debug_mode else settings.trace_sample_rate
+    return rate > 0 and (rate >= 1 or random.random() < rate)
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, sampled: Optional[bool] = None, **attributes) -> Iterator:
+    """name span을 현재 span의 하위로 열고 닫습니다.
+
+    현재 span이 없으면 새 추적(루트 span)을 시작하며, sampled가 None이면 헤드 샘플링으로
+    추적 여부를 정합니다 (수집처럼 드문 작업은 sampled=True로 항상 추적).
+    블록에서 예외가 나면 span에 기록하고 그대로 다시 던집니다.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        if not (_sample() if sampled is None else sampled):
+            token = _current_span.set(NOOP_SPAN)
+            try:
+                yield NOOP_SPAN
+            finally:
+                _current_span.reset(token)
+            return
+        metrics.incr("tracing.traces_sampled")
+        trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+    elif not parent.recording:
+        yield parent
+        return
+    else:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+
+    current = Span(name, trace_id, parent_id, kind, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def submit_in_context(executor, fn: Callable[..., Any], *args, **kwargs):
+    """현재 컨텍스트(현재 span 포함)를 복사하여 executor에서 fn을 실행합니다."""
+    context = contextvars.copy_context()
+    return executor.submit(context.run, fn, *args, **kwargs)
+
+
+# ----------------------------------------------------------------------
+# 내보내기 (OTLP JSON, 회전 파일)
+# ----------------------------------------------------------------------
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_attribute_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def _attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _attribute_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def _otlp_span(item: Span) -> Dict[str, Any]:
+    data = {
+        "traceId": item.trace_id,
+        "spanId": item.span_id,
+        "name": item.name,
+        "kind": item.kind,
+        "startTimeUnixNano": str(item.start_ns),
+        "endTimeUnixNano": str(item.end_ns),
+        "attributes": _attributes(item.attributes),
+        "status": {"code": item.status[0]},
+    }
+    if item.parent_id:
+        data["parentSpanId"] = item.parent_id
+    if item.status[1]:
+        data["status"]["message"] = item.status[1]
+    if item.events:
+        data["events"] = [
+            {"name": event["name"], "timeUnixNano": str(event["time_ns"]), "attributes": _attributes(event["attributes"])}
+            for event in item.events
+        ]
+    return data
+
+
+def otlp_batch(spans: List[Span]) -> Dict[str, Any]:
+    """span 목록을 OTLP JSON ExportTraceServiceRequest 형태로 만듭니다."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _attributes({"service.name": SERVICE_NAME, "process.pid": os.getpid()})},
+            "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": [_otlp_span(item) for item in spans]}],
+        }]
+    }
+
+
+class SpanExporter:
+    """끝난 span을 큐에 모아 백그라운드 스레드에서 회전 파일에 기록합니다.
+
+    fork된 워커에서는 처음 사용할 때 자기 프로세스의 스레드와 파일을 새로 엽니다.
+    """
+
+    def __init__(self):
+        self._pid = None
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue()
+        self._handler: Optional[RotatingFileHandler] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            settings = get_settings()
+            os.makedirs(settings.trace_export_dir, exist_ok=True)
+            path = os.path.join(settings.trace_export_dir, f"spans-{os.getpid()}.jsonl")
+            self._queue = queue.Queue(maxsize=settings.trace_queue_size)
+            self._handler = RotatingFileHandler(path, maxBytes=settings.trace_max_bytes,
+                                                backupCount=settings.trace_backup_count, encoding="utf-8")
+            self._handler.setFormatter(logging.Formatter("%(message)s"))
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def put(self, item: Span) -> None:
+        if self._pid != os.getpid():
+            try:
+                self._start()
+            except OSError as e:
+                metrics.incr("tracing.export_errors")
+                print(f"⚠️ 추적 파일을 열 수 없습니다: {e}")
+                return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # 요청 경로를 막지 않도록 기다리지 않고 버립니다.
+            metrics.incr("tracing.dropped")
+
+    def _drain(self, first: Optional[Span]) -> List[Span]:
+        batch = [first] if first is not None else []
+        while len(batch) < EXPORT_BATCH_SIZE:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                batch.append(item)
+        return batch
+
+    def _write(self, batch: List[Span]) -> None:
+        if not batch:
+            return
+        try:
+            line = json.dumps(otlp_batch(batch), ensure_ascii=False, separators=(",", ":"))
+            self._handler.handle(logging.makeLogRecord({"msg": line}))
+            metrics.incr("tracing.spans_exported", len(batch))
+        except Exception:
+            metrics.incr("tracing.export_errors")
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=EXPORT_INTERVAL_SECONDS)
+            except queue.Empty:
+                continue
+            self._write(self._drain(first))
+
+    def flush(self) -> None:
+        """큐에 남은 span을 지금 기록합니다 (프로세스 종료 시 호출)."""
+        if self._pid != os.getpid() or self._handler is None:
+            return
+        while True:
+            batch = self._drain(None)
+            if not batch:
+                break
+            self._write(batch)
+        self._handler.flush()
+
+
+_exporter = SpanExporter()
+atexit.register(_exporter.flush)
+
+
+def flush() -> None:
+    """기록 대기 중인 span을 파일에 씁니다."""
+    _exporter.flush()
@@ -0,0 +1,41 @@
+"""
+테스트 공통 설정
+
+모든 테스트는 임시 디렉터리의 저장소 경로와 추적 비활성화 설정으로 실행하며,
+프로세스 전역 상태(설정, 의존성 보호 객체, 메트릭)를 테스트마다 초기화합니다.
+"""
+
+import pytest
+
+from src.rag.fakes import build_fake_system, sample_corpus
+from src.utils.config import reload_settings
+from src.utils.metrics import metrics
+from src.utils.resilience import reset_dependencies
+
+
+@pytest.fixture(autouse=True)
+def isolated_settings(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHUNK_STORE_PATH", str(tmp_path / "chunks"))
+    monkeypatch.setenv("ANSWER_STORE_PATH", str(tmp_path / "answers.json"))
+    monkeypatch.setenv("UPLOAD_JOB_PATH", str(tmp_path / "upload_job"))
+    monkeypatch.setenv("TRACE_EXPORT_DIR", str(tmp_path / "traces"))
+    monkeypatch.setenv("TRACE_SAMPLE_RATE", "0")
+    monkeypatch.setenv("SEARCH_NAMESPACES", "default")
+    monkeypatch.setenv("SETTINGS_RELOAD_INTERVAL", "0")
+    monkeypatch.setenv("RETRY_BASE_DELAY", "0.01")
+    monkeypatch.setenv("DEBUG_MODE", "false")
+    settings = reload_settings()
+    reset_dependencies()
+    metrics.reset()
+    yield settings
+    reset_dependencies()
+
+
+@pytest.fixture
+def corpus():
+    return sample_corpus()
+
+
+@pytest.fixture
+def fake_system(corpus):
+    return build_fake_system(corpus=corpus)
@@ -0,0 +1,167 @@
+"""ask() 파이프라인 테스트 (가짜 Pinecone/OpenAI)"""
+
+import threading
+import time
+
+from src.data.chunk_store import ChunkCorpus
+from src.rag.answer_store import AnswerStore
+from src.rag.fakes import FakeGenerationBackend, FakeIndex, build_fake_system, sample_corpus
+from src.rag.system import NO_ANSWER, TIMEOUT_ANSWER, InsuranceRAGSystem, result_outcome
+from src.utils.config import reload_settings
+from src.utils.deadline import DeadlineExceeded
+from src.utils.metrics import metrics
+
+
+def test_ask_generates_answer_with_sources(fake_system):
+    result = fake_system.ask("보험계약은 어떻게 성립되나요?", use_precomputed=False)
+
+    assert result["answer"].startswith("[fake:")
+    assert result["sources"]
+    assert not result["timed_out"]
+    assert result_outcome(result) == "generated"
+
+
+def test_concurrent_identical_questions_are_coalesced(corpus):
+    system = build_fake_system(corpus=corpus, llm_latency=0.3)
+    results = []
+
+    def ask():
+        results.append(system.ask("청약은 언제 철회할 수 있나요?", use_precomputed=False, timeout=5))
+
+    threads = [threading.Thread(target=ask) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 4
+    assert sum(result["coalesced"] for result in results) == 3
+    assert system.openai_backend.faults.calls == 1
+    assert len({result["answer"] for result in results}) == 1
+    # 공유된 결과라도 호출자별 사본이어야 함
+    assert len({id(result["sources"]) for result in results}) == 4
+
+
+def test_slow_generation_returns_timeout_result_within_deadline(corpus):
+    system = build_fake_system(corpus=corpus, llm_latency=3.0)
+
+    started = time.monotonic()
+    result = system.ask("보험금은 언제 지급되나요?", use_precomputed=False, timeout=0.3)
+    elapsed = time.monotonic() - started
+
+    assert elapsed < 1.5
+    assert result["timed_out"]
+    assert result["fallback"]
+    assert result_outcome(result) == "timeout"
+    assert metrics.get("ask.timeouts") == 1
+
+
+def test_coalesced_follower_waits_only_for_its_own_deadline(corpus):
+    system = build_fake_system(corpus=corpus, llm_latency=1.0)
+    leader = {}
+    thread = threading.Thread(target=lambda: leader.update(
+        system.ask("계약을 해지하면 환급금이 있나요?", use_precomputed=False, timeout=5)))
+    thread.start()
+    time.sleep(0.1)
+
+    started = time.monotonic()
+    follower = system.ask("계약을 해지하면 환급금이 있나요?", use_precomputed=False, timeout=0.2)
+    elapsed = time.monotonic() - started
+    thread.join()
+
+    assert elapsed < 0.8
+    assert follower["timed_out"] and follower["coalesced"]
+    assert follower["answer"] == TIMEOUT_ANSWER
+    assert not leader["timed_out"]
+
+
+def test_deadline_error_in_own_call_is_not_reported_as_coalesced(fake_system, monkeypatch):
+    def expire(*args, **kwargs):
+        raise DeadlineExceeded("마감 시간 초과")
+
+    monkeypatch.setattr(fake_system, "_ask", expire)
+    result = fake_system.ask("보험금은 언제 지급되나요?", use_precomputed=False)
+
+    assert result["timed_out"]
+    assert result["coalesced"] is False
+
+
+def test_ask_searches_only_requested_namespaces(corpus):
+    store = ChunkCorpus.replace_namespace(None, corpus.take([0, 1, 2]), "product-a")
+    store = ChunkCorpus.replace_namespace(store, corpus.take([3, 4, 5]), "product-b")
+    system = build_fake_system(corpus=store)
+
+    result = system.ask("보험료 납입이 연체되면 어떻게 되나요?", use_precomputed=False,
+                        namespaces=["product-a"])
+
+    assert result["sources"]
+    assert {source["namespace"] for source in result["sources"]} == {"product-a"}
+    assert all(source["id"] in ("sample#chunk_0", "sample#chunk_1", "sample#chunk_2") for source in result["sources"])
+
+
+def test_filter_limits_sources_to_matching_pages(fake_system):
+    result = fake_system.ask("보험금 지급과 계약 해지", use_precomputed=False, filter={"page_start": {"$gte": 5}})
+
+    assert result["sources"]
+    assert all(source["page_start"] >= 5 for source in result["sources"])
+    assert all(source["doc_id"] == "sample" for source in result["sources"])
+
+
+def test_filter_without_matches_returns_no_answer(fake_system):
+    result = fake_system.ask("보험계약 성립", use_precomputed=False, filter={"doc_id": "없는문서"})
+
+    assert result["answer"] == NO_ANSWER
+    assert result_outcome(result) == "no_answer"
+
+
+def test_exact_lookup_only_for_lookup_questions(fake_system):
+    lookup = fake_system.ask("제17조 내용", use_precomputed=False)
+    assert lookup["sources"][0]["retrieval"] == "exact"
+    assert "제17조" in lookup["sources"][0]["articles"]
+
+    question = fake_system.ask("제17조에 따라 청약을 철회하면 보험료는 돌려받나요?", use_precomputed=False)
+    assert all(source["retrieval"] != "exact" for source in question["sources"])
+    assert metrics.get("ask.lexical_exact") == 1
+
+
+def test_exact_lookup_requires_both_article_and_quoted_phrase(fake_system):
+    both = fake_system.exact_lookup("제17조 '철회' 내용")
+    assert both and all("제17조" in hit["articles"] for hit in both)
+
+    assert fake_system.exact_lookup("제15조 '철회' 내용") == []
+    assert fake_system.exact_lookup("제99조 '철회' 내용") == []
+    assert fake_system.exact_lookup("'철회' 내용")
+
+
+def test_precomputed_chunk_answer_requires_a_similar_question(fake_system, monkeypatch):
+    monkeypatch.setenv("HIGH_CONFIDENCE_SCORE", "0")
+    reload_settings()
+    for i in range(len(fake_system.content_store)):
+        fake_system.answer_store.put_for_chunk(fake_system.content_store.chunk_id(i), "미리 만든 답변", [],
+                                               question="청약을 철회할 수 있나요?")
+
+    similar = fake_system.ask("청약 철회할 수 있나요")
+    assert similar["gate"] == "precomputed"
+    assert similar["answer"] == "미리 만든 답변"
+
+    different = fake_system.ask("보험료는 돌려받나요?")
+    assert different["gate"] is None
+    assert different["answer"].startswith("[fake:")
+
+
+def test_local_stores_are_reloaded_when_files_change(corpus):
+    settings = reload_settings()
+    corpus.save(settings.chunk_store_path)
+    system = InsuranceRAGSystem(index=FakeIndex(corpus), generator=FakeGenerationBackend())
+    assert len(system.answer_store) == 0
+    assert not system.refresh_local_stores(force=True)
+
+    answers = AnswerStore(settings.answer_store_path)
+    answers.put_for_question("청약을 철회할 수 있나요?", "미리 만든 답변", [], {})
+    answers.save()
+    sample_corpus().take([0, 1]).save(settings.chunk_store_path)
+
+    assert system.refresh_local_stores(force=True)
+    assert len(system.content_store) == 2
+    assert system.ask("청약을 철회할 수 있나요?")["gate"] == "faq"
+    assert metrics.get("ask.store_reloads") == 1
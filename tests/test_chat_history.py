@@ -0,0 +1,31 @@
+"""대화 기록 테스트 (참고자료 본문 LRU, 네임스페이스 구분)"""
+
+from src.utils.chat_history import ChatHistory
+
+
+def test_source_contents_are_kept_per_namespace():
+    history = ChatHistory(max_contents=2)
+    history.add_assistant("답변", sources=[
+        {"id": "policy#chunk_0", "namespace": "product-a", "content": "A 상품 본문"},
+        {"id": "policy#chunk_0", "namespace": "product-b", "content": "B 상품 본문"},
+    ])
+
+    assert history.source_content("policy#chunk_0", "product-a") == "A 상품 본문"
+    assert history.source_content("policy#chunk_0", "product-b") == "B 상품 본문"
+    assert "content" not in history.last("assistant")["sources"][0]
+
+
+def test_evicted_contents_are_reloaded_by_namespace():
+    texts = {("product-a", "policy#chunk_0"): "A 상품 본문", ("product-b", "policy#chunk_0"): "B 상품 본문"}
+    calls = []
+
+    def loader(chunk_id, namespace):
+        calls.append((namespace, chunk_id))
+        return texts.get((namespace, chunk_id))
+
+    history = ChatHistory(max_contents=1, content_loader=loader)
+    assert history.source_content("policy#chunk_0", "product-b") == "B 상품 본문"
+    assert history.source_content("policy#chunk_0", "product-a") == "A 상품 본문"
+    assert history.source_content("policy#chunk_0", "product-b") == "B 상품 본문"
+    assert calls == [("product-b", "policy#chunk_0"), ("product-a", "policy#chunk_0"),
+                     ("product-b", "policy#chunk_0")]
@@ -0,0 +1,71 @@
+"""컬럼형 청크 저장소 테스트 (저장/로드, 네임스페이스)"""
+
+from src.data.chunk_store import DEFAULT_NAMESPACE, ChunkCorpus
+from src.data.uploader import _iter_upsert_batches
+
+
+def test_save_and_load_roundtrip_keeps_records_and_fingerprint(tmp_path, corpus):
+    corpus.save(str(tmp_path))
+
+    loaded = ChunkCorpus.load(str(tmp_path))
+    try:
+        assert len(loaded) == len(corpus)
+        assert list(loaded) == list(corpus)
+        assert loaded.metadata(2) == corpus.metadata(2)
+        assert loaded.fingerprint == corpus.fingerprint
+        assert loaded.position("sample#chunk_5") == 5
+    finally:
+        loaded.close()
+
+
+def test_take_and_concat_keep_ids_and_metadata(corpus):
+    merged = ChunkCorpus.concat([corpus.take([4, 5]), corpus.take([0])])
+
+    assert [merged.chunk_id(i) for i in range(len(merged))] == ["sample#chunk_4", "sample#chunk_5", "sample#chunk_0"]
+    assert merged.metadata(2) == corpus.metadata(0)
+    assert merged[-1]["content"] == corpus.text(0)
+
+
+def test_replace_namespace_keeps_other_namespaces(corpus):
+    store = ChunkCorpus.replace_namespace(None, corpus.take([0, 1]), "product-a")
+    store = ChunkCorpus.replace_namespace(store, corpus.take([2, 3]), "product-b")
+    store = ChunkCorpus.replace_namespace(store, corpus.take([4]), "product-a")
+
+    assert store.namespaces == ["product-b", "product-a"]
+    assert [store.chunk_id(i) for i in range(len(store))] == ["sample#chunk_2", "sample#chunk_3", "sample#chunk_4"]
+
+
+def test_position_is_scoped_by_namespace(corpus):
+    store = ChunkCorpus.replace_namespace(None, corpus.take([0, 1]), "product-a")
+    store = ChunkCorpus.replace_namespace(store, corpus.take([1, 2]), "product-b")
+
+    assert store.position("sample#chunk_1") == 1
+    assert store.position("sample#chunk_1", "product-b") == 2
+    assert store.position("sample#chunk_2", "product-a") is None
+    assert store.metadata(2)["namespace"] == "product-b"
+
+
+def test_positions_in_returns_none_when_every_chunk_qualifies(corpus):
+    store = ChunkCorpus.replace_namespace(None, corpus.take([0, 1]), "product-a")
+    store = ChunkCorpus.replace_namespace(store, corpus.take([2]), "product-b")
+
+    assert store.positions_in(["product-b"]) == frozenset({2})
+    assert store.positions_in(["product-a", "product-b"]) is None
+    assert store.positions_in(["missing"]) == frozenset()
+
+
+def test_store_without_namespace_column_reads_as_default(corpus):
+    assert corpus.namespaces == [DEFAULT_NAMESPACE]
+    assert corpus.namespace(0) == DEFAULT_NAMESPACE
+    assert corpus.position("sample#chunk_0", "product-a") == 0
+
+
+def test_list_records_convert_like_corpus_records(corpus):
+    store = ChunkCorpus.replace_namespace(None, corpus, "product-a")
+    assert list(_iter_upsert_batches(list(store), 4)) == list(store.upsert_batches(4))
+
+    record = {"id": "a#chunk_0", "content": "본문", "metadata": {
+        "namespace": "product-a", "articles": [], "references": [{"id": "b#chunk_1", "article": "제3조"}]}}
+    [[converted]] = _iter_upsert_batches([record], 10)
+    assert converted == {"id": "a#chunk_0", "text": "본문", "reference_ids": ["b#chunk_1"]}
+    assert record["metadata"]["references"] == [{"id": "b#chunk_1", "article": "제3조"}]
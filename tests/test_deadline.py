@@ -0,0 +1,55 @@
+"""요청 마감 시간과 단계별 스레드 풀 테스트"""
+
+import threading
+import time
+
+import pytest
+
+from src.utils.deadline import Deadline, DeadlineExceeded, StagePool, run_with_deadline
+from src.utils.metrics import metrics
+
+
+def test_deadline_remaining_and_expiry():
+    unlimited = Deadline()
+    assert unlimited.remaining() is None and not unlimited.expired
+
+    deadline = Deadline(0.05)
+    assert 0 < deadline.remaining() <= 0.05
+    time.sleep(0.06)
+    assert deadline.expired and deadline.remaining() == 0.0
+    with pytest.raises(DeadlineExceeded):
+        deadline.check("retrieval")
+
+
+def test_run_with_deadline_gives_up_on_slow_calls():
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        run_with_deadline(time.sleep, Deadline(0.1), 1.0, stage="test")
+    assert time.monotonic() - started < 0.5
+
+    assert run_with_deadline(lambda: "ok", None) == "ok"
+    with pytest.raises(DeadlineExceeded):
+        run_with_deadline(lambda: "late", Deadline(0.0), stage="test")
+
+
+def test_stage_pool_rejects_instead_of_queueing_when_full():
+    pool = StagePool("test_full", 1)
+    release = threading.Event()
+    try:
+        busy = pool.submit(release.wait, 2)
+        assert pool.submit(lambda: None, wait=False) is None
+        with pytest.raises(DeadlineExceeded):
+            pool.submit(lambda: None, deadline=Deadline(0.05))
+        assert metrics.get("pool.test_full.rejected") == 2
+
+        pool.abandon(busy)
+        assert pool.stats() == {"size": 1, "in_use": 1, "abandoned": 1}
+    finally:
+        release.set()
+    busy.result(timeout=1)
+    # 슬롯은 완료 콜백에서 반납하므로 result()보다 조금 늦을 수 있음
+    for _ in range(100):
+        if pool.stats()["in_use"] == 0:
+            break
+        time.sleep(0.01)
+    assert pool.stats() == {"size": 1, "in_use": 0, "abandoned": 0}
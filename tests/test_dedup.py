@@ -0,0 +1,75 @@
+"""MinHash/LSH 중복 제거와 문서 필터 테스트"""
+
+from src.data.chunk_store import ChunkCorpus
+from src.data.dedup import deduplicate_corpus, find_duplicate_clusters, jaccard, minhash_signature, shingle_hashes
+from src.data.ingestion import create_records_from_chunks
+from src.rag.fakes import FakeIndex, matches_filter
+from src.rag.system import expand_doc_id_filter
+
+DISPUTE_CLAUSE = ("제40조(분쟁의 조정) 계약에 관하여 분쟁이 있는 경우 분쟁 당사자 또는 기타 이해관계인과 "
+                  "회사는 금융감독원장에게 조정을 신청할 수 있습니다.")
+
+
+def two_product_corpus() -> ChunkCorpus:
+    product_a = create_records_from_chunks(
+        ["제1조(목적) 상품A는 질병 입원비를 보장합니다.", DISPUTE_CLAUSE],
+        doc_id="productA", pages=[(1, 1), (9, 9)], articles=[["제1조"], ["제40조"]])
+    product_b = create_records_from_chunks(
+        ["제1조(목적) 상품B는 상해 수술비를 보장합니다.", DISPUTE_CLAUSE + " "],
+        doc_id="productB", pages=[(1, 1), (12, 12)], articles=[["제1조"], ["제40조"]])
+    return ChunkCorpus.concat([product_a, product_b])
+
+
+def test_minhash_similarity_tracks_jaccard():
+    a = shingle_hashes(DISPUTE_CLAUSE)
+    b = shingle_hashes(DISPUTE_CLAUSE.replace("금융감독원장", "금융감독원"))
+    c = shingle_hashes("제9조(보험금의 지급절차) 회사는 청구서류를 접수한 날부터 3영업일 이내에 지급합니다.")
+
+    sig_a, sig_b, sig_c = (minhash_signature(hashes) for hashes in (a, b, c))
+    estimate = sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+    assert abs(estimate - jaccard(a, b)) < 0.15
+    assert sum(x == y for x, y in zip(sig_a, sig_c)) / len(sig_a) < 0.2
+
+
+def test_find_duplicate_clusters_groups_near_duplicates_only():
+    texts = [DISPUTE_CLAUSE, "제1조(목적) 상품A는 질병 입원비를 보장합니다.", DISPUTE_CLAUSE + " "]
+
+    assert find_duplicate_clusters(texts, threshold=0.85) == {0: [2]}
+
+
+def test_deduplicate_corpus_merges_locations_and_documents():
+    corpus = two_product_corpus()
+    deduplicated, report = deduplicate_corpus(corpus, threshold=0.85, batch_size=1)
+
+    assert report["chunks_before"] == 4 and report["chunks_after"] == 3
+    assert report["duplicates_removed"] == 1 and report["batches_saved"] == 1
+
+    position = deduplicated.position("productA#chunk_1")
+    metadata = deduplicated.metadata(position)
+    assert metadata["doc_id"] == "productA"
+    assert metadata["doc_ids"] == ["productA", "productB"]
+    assert metadata["references"] == [{"id": "productB#chunk_1", "doc_id": "productB",
+                                       "page_start": 12, "page_end": 12}]
+    assert deduplicated.upsert_record(position)["reference_ids"] == ["productB#chunk_1"]
+    assert deduplicated.position("productB#chunk_1") is None
+
+
+def test_doc_id_filter_matches_merged_clause():
+    deduplicated, _ = deduplicate_corpus(two_product_corpus(), threshold=0.85)
+    index = FakeIndex(deduplicated)
+    records = index.records["default"].values()
+
+    matched = {record["id"] for record in records if matches_filter(record, expand_doc_id_filter({"doc_id": "productB"}))}
+    assert matched == {"productA#chunk_1", "productB#chunk_0"}
+
+    # 중복 제거 없이 올린(doc_ids가 없는) 레코드도 그대로 찾음
+    assert matches_filter({"doc_id": "productB"}, expand_doc_id_filter({"doc_id": {"$in": ["productB"]}}))
+
+
+def test_expand_doc_id_filter_keeps_other_conditions():
+    expanded = expand_doc_id_filter({"doc_id": "A", "page_start": {"$lte": 3}})
+
+    assert expanded == {"$and": [{"page_start": {"$lte": 3}},
+                                 {"$or": [{"doc_id": "A"}, {"doc_ids": {"$in": ["A"]}}]}]}
+    assert expand_doc_id_filter({"doc_id": {"$ne": "A"}}) == {"doc_id": {"$ne": "A"}}
@@ -0,0 +1,45 @@
+"""로컬 역색인 테스트 (BM25, 조항 조회, 저장/로드)"""
+
+from src.data.inverted_index import InvertedIndex, is_lookup_query
+
+
+def test_bm25_ranks_relevant_chunk_first(corpus):
+    index = InvertedIndex.build(corpus)
+
+    position, score = index.search("청약 철회 기간", top_k=3)[0]
+    assert corpus.chunk_id(position) == "sample#chunk_2"
+    assert score > 0
+
+
+def test_bm25_search_respects_within_and_article_boost(corpus):
+    index = InvertedIndex.build(corpus)
+    target = corpus.position("sample#chunk_2")
+
+    assert all(position != target for position, _ in index.search("청약 철회", within={0, 1}))
+    assert index.search("제27조 납입최고")[0][0] == corpus.position("sample#chunk_3")
+    assert index.lookup_articles(["제9조"]) == [corpus.position("sample#chunk_4")]
+
+
+def test_find_phrase_checks_chunk_text(corpus):
+    index = InvertedIndex.build(corpus)
+
+    assert index.find_phrase("해지환급금", corpus) == [corpus.position("sample#chunk_5")]
+    assert index.find_phrase("없는 용어", corpus) == []
+
+
+def test_index_save_and_load_roundtrip(tmp_path, corpus):
+    index = InvertedIndex.build(corpus)
+    index.save(str(tmp_path))
+
+    loaded = InvertedIndex.load(str(tmp_path))
+    try:
+        assert loaded.fingerprint == index.fingerprint
+        assert loaded.search("해지환급금") == index.search("해지환급금")
+    finally:
+        loaded.close()
+
+
+def test_is_lookup_query():
+    assert is_lookup_query("제17조 내용")
+    assert is_lookup_query("제17조")
+    assert not is_lookup_query("제17조에 따라 청약을 철회하면 보험료는 돌려받나요?")
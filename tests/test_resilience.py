@@ -0,0 +1,168 @@
+"""외부 호출 보호 테스트 (토큰 버킷, 429 재시도, 서킷 브레이커, 적응형 동시성 제한)"""
+
+import time
+
+import pytest
+
+from src.rag.fakes import FakeServiceError, FaultInjector
+from src.utils.deadline import Deadline, DeadlineExceeded
+from src.utils.metrics import metrics
+from src.utils.resilience import (
+    AdaptiveConcurrencyLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    Dependency,
+    TokenBucket,
+)
+
+
+def make_dependency(**options):
+    defaults = {"rate": 1000, "max_concurrency": 8, "max_retries": 3, "base_delay": 0.001,
+                "max_delay": 0.01, "failure_threshold": 5, "recovery_timeout": 30.0}
+    defaults.update(options)
+    return Dependency("test", **defaults)
+
+
+def recovering_call(faults, failures):
+    """처음 failures번은 faults가 주입한 오류를 던지고 그 뒤로는 성공하는 호출"""
+
+    def call(timeout=None):
+        if faults.calls >= failures:
+            faults.error_rate = 0.0
+            faults.timeout_rate = 0.0
+        faults.before_call(timeout)
+        return "ok"
+
+    return call
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(rate=20, capacity=1)
+
+    assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0)
+
+    started = time.monotonic()
+    assert bucket.acquire(timeout=1)
+    assert 0.02 < time.monotonic() - started < 0.5
+
+
+def test_injected_429s_are_retried_until_success():
+    faults = FaultInjector(error_rate=1.0)
+    dependency = make_dependency()
+
+    assert dependency.call(recovering_call(faults, failures=2)) == "ok"
+    assert faults.calls == 3
+    assert metrics.get("test.retries") == 2
+    assert dependency.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_injected_timeouts_are_retried():
+    faults = FaultInjector(timeout_rate=1.0)
+
+    assert make_dependency().call(recovering_call(faults, failures=1)) == "ok"
+    assert faults.calls == 2
+
+
+def test_non_retryable_errors_are_raised_immediately():
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise FakeServiceError(400, "bad request")
+
+    dependency = make_dependency(failure_threshold=1)
+    with pytest.raises(FakeServiceError):
+        dependency.call(bad_request)
+    assert len(calls) == 1
+    assert dependency.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_opens_after_failures_and_recovers_through_half_open():
+    faults = FaultInjector(error_rate=1.0)
+    dependency = make_dependency(max_retries=0, failure_threshold=2, recovery_timeout=0.1)
+
+    for _ in range(2):
+        with pytest.raises(FakeServiceError):
+            dependency.call(faults.before_call)
+    assert dependency.breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        dependency.call(faults.before_call)
+    assert faults.calls == 2
+    assert metrics.get("test.circuit_rejected") == 1
+
+    time.sleep(0.15)
+    assert dependency.breaker.state == CircuitBreaker.HALF_OPEN
+    faults.error_rate = 0.0
+    dependency.call(faults.before_call)
+    assert dependency.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_half_open_probe_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    assert breaker.allow()
+    # 시험 호출이 진행 중이면 다른 호출은 거부
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_deadline_cut_calls_do_not_count_as_failures():
+    faults = FaultInjector(latency=1.0)
+    dependency = make_dependency(failure_threshold=1)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        dependency.call(faults.before_call, deadline=Deadline(0.1), timeout_arg="timeout")
+    assert time.monotonic() - started < 0.5
+    assert dependency.breaker.state == CircuitBreaker.CLOSED
+    assert dependency.limiter.limit == 8
+
+
+def test_limiter_halves_on_overload_and_grows_back_additively():
+    limiter = AdaptiveConcurrencyLimiter(initial=8, min_limit=1)
+
+    for expected in (4, 2, 1, 1):
+        assert limiter.acquire(timeout=0)
+        limiter.release(overloaded=True)
+        assert limiter.limit == expected
+
+    for _ in range(3):
+        assert limiter.acquire(timeout=0)
+        limiter.release()
+    assert limiter.limit == 2
+
+    for _ in range(100):
+        assert limiter.acquire(timeout=0)
+        limiter.release()
+    assert limiter.limit == 8
+
+
+def test_limiter_blocks_callers_over_the_limit():
+    limiter = AdaptiveConcurrencyLimiter(initial=1)
+
+    assert limiter.acquire(timeout=0)
+    assert not limiter.acquire(timeout=0.01)
+    limiter.release()
+    assert limiter.acquire(timeout=0)
+
+
+def test_injected_429s_shrink_dependency_concurrency():
+    faults = FaultInjector(error_rate=1.0)
+    dependency = make_dependency(max_retries=2)
+
+    with pytest.raises(FakeServiceError):
+        dependency.call(faults.before_call)
+    assert faults.calls == 3
+    assert dependency.limiter.limit == 1
+    assert metrics.get("test.failures") == 1
+
+    faults.error_rate = 0.0
+    for _ in range(10):
+        dependency.call(faults.before_call)
+    assert dependency.limiter.limit > 1
@@ -0,0 +1,92 @@
+"""검색 보조 기능 테스트 (헤지 요청, 동시 검색, 순위 융합)"""
+
+import threading
+
+import pytest
+
+from src.rag import retrieval
+from src.rag.retrieval import fan_out_search, hedged_call, reciprocal_rank_fusion
+from src.utils.deadline import Deadline, DeadlineExceeded, StagePool
+from src.utils.metrics import metrics
+
+
+def test_hedged_call_uses_the_faster_duplicate():
+    calls = []
+    release = threading.Event()
+
+    def search():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(2)
+            return "slow"
+        return "hedge"
+
+    try:
+        assert hedged_call(search, hedge_after=0.05, deadline=Deadline(1.0), name="test") == "hedge"
+    finally:
+        release.set()
+    assert metrics.get("test.hedged") == 1 and metrics.get("test.hedge_wins") == 1
+
+
+def test_fan_out_search_merges_shards_by_score():
+    hits = fan_out_search({
+        "a": lambda: [{"id": "a1", "score": 0.5}, {"id": "a2", "score": 0.2}],
+        "b": lambda: [{"id": "b1", "score": 0.9}],
+    }, top_k=2, deadline=Deadline(1.0))
+
+    assert [(hit["id"], hit["origin"]) for hit in hits] == [("b1", "b"), ("a1", "a")]
+
+
+def test_fan_out_search_returns_partial_results_after_deadline():
+    release = threading.Event()
+
+    def slow():
+        release.wait(2)
+        return [{"id": "slow", "score": 1.0}]
+
+    try:
+        hits = fan_out_search({"fast": lambda: [{"id": "fast", "score": 0.1}], "slow": slow},
+                              top_k=5, deadline=Deadline(0.2))
+    finally:
+        release.set()
+
+    assert [hit["id"] for hit in hits] == ["fast"]
+    assert metrics.get("retrieval.partial_fanout") == 1
+
+
+def test_fan_out_search_raises_when_every_shard_times_out():
+    def expired():
+        raise DeadlineExceeded("shard")
+
+    with pytest.raises(DeadlineExceeded):
+        fan_out_search({"a": expired, "b": expired}, top_k=5, deadline=Deadline(1.0))
+
+
+def test_fan_out_search_abandons_submitted_shards_when_submit_fails(monkeypatch):
+    pool = StagePool("test-fanout", max_workers=1)
+    monkeypatch.setattr(retrieval, "get_pool", lambda stage: pool)
+    release = threading.Event()
+
+    def slow():
+        release.wait(2)
+        return []
+
+    try:
+        with pytest.raises(DeadlineExceeded):
+            fan_out_search({"a": slow, "b": slow}, top_k=5, deadline=Deadline(0.1))
+        assert pool.stats()["abandoned"] == 1
+        assert metrics.get("pool.test-fanout.abandoned") == 1
+    finally:
+        release.set()
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    dense = [{"id": "a", "score": 0.9}, {"id": "b", "score": 0.8}, {"id": "c", "score": 0.7}]
+    lexical = [{"id": "c", "score": 12.0}, {"id": "d", "score": 3.0}]
+
+    fused = reciprocal_rank_fusion({"dense": dense, "lexical": lexical}, top_k=3)
+
+    assert [hit["id"] for hit in fused] == ["c", "a", "b"]
+    assert fused[0]["retrievers"] == ["dense", "lexical"]
+    # 원래 점수는 먼저 나온 결과의 값을 그대로 유지
+    assert fused[0]["score"] == 0.7
@@ -0,0 +1,69 @@
+"""HTTP 질의 서비스 테스트 (SSE 스트리밍, 입력 검증)"""
+
+import http.client
+import json
+import threading
+
+import pytest
+
+from src.service.server import QueryService, _bind, _make_server
+
+
+@pytest.fixture
+def server(fake_system):
+    httpd = _make_server(_bind("127.0.0.1", 0), QueryService(fake_system))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def post(server, path, body, headers=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+    connection.request("POST", path, body=data, headers=headers or {})
+    response = connection.getresponse()
+    return response.status, response.getheader("Content-Type"), response.read().decode("utf-8")
+
+
+def parse_events(text):
+    events = []
+    for block in text.split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "event" in lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_sends_generation_deltas_before_final_answer(server):
+    status, content_type, text = post(server, "/ask/stream", {"question": "보험계약은 어떻게 성립되나요?"})
+
+    assert status == 200
+    assert content_type.startswith("text/event-stream")
+    events = parse_events(text)
+    names = [name for name, _ in events]
+    assert names.count("delta") > 1
+    assert names[names.count("delta"):] == ["answer", "sources", "done"]
+    answer = events[names.index("answer")][1]["text"]
+    assert "".join(data["text"] for name, data in events if name == "delta") == answer
+    assert events[-1][1]["coalesced"] is False
+
+
+def test_stream_rejects_invalid_payload_before_opening_stream(server):
+    for body in ({"question": ""}, {"question": "보험금은?", "timeout": -1}, {"question": "보험금은?", "filter": []}):
+        status, content_type, text = post(server, "/ask/stream", body)
+        assert status == 400
+        assert content_type.startswith("application/json")
+        assert "error" in json.loads(text)
+
+
+def test_malformed_content_length_returns_400(server):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    connection.putrequest("POST", "/ask")
+    connection.putheader("Content-Length", "abc")
+    connection.endheaders()
+    response = connection.getresponse()
+
+    assert response.status == 400
+    assert "Content-Length" in json.loads(response.read())["error"]
@@ -0,0 +1,81 @@
+"""업로드 스크립트 마무리 단계 테스트 (로컬 저장소 반영, 이전 청크 삭제)"""
+
+import os
+
+from src.data.chunk_store import ChunkCorpus
+from src.data.inverted_index import INDEX_META_FILE
+from src.data.upload_job import UploadJob
+from src.data.uploader import resume_upload, upload_to_pinecone
+from src.rag.answer_store import AnswerStore
+from src.rag.fakes import FakeIndex, build_fake_system
+from src.utils.config import get_config, reload_settings
+from upload_data import build_faq_after_upload, finish_upload, legacy_chunk_ids, merge_into_chunk_store, stale_chunk_ids
+
+
+def test_local_store_and_stale_ids_are_applied_only_after_upload_succeeds(corpus):
+    config = get_config()
+    old = ChunkCorpus.replace_namespace(None, corpus.take([0, 1, 2, 3]), "default")
+    old.save(config["chunk_store_path"])
+    index = FakeIndex(old)
+
+    records = corpus.take([0, 1, 2])
+    store, previous_ids = merge_into_chunk_store(config["chunk_store_path"], records, "default")
+    stale_ids = stale_chunk_ids(records, previous_ids)
+    assert stale_ids == ["sample#chunk_3"]
+
+    index.faults.error_rate = 1.0
+    assert not upload_to_pinecone(records, index=index, stale_ids=stale_ids, local_store=store)
+    # 업로드가 실패하면 로컬 저장소는 그대로이며, 지울 ID와 반영할 코퍼스는 작업에 남음
+    assert len(ChunkCorpus.load(config["chunk_store_path"])) == 4
+    job = UploadJob.open(config["upload_job_path"])
+    assert job.stale_ids == stale_ids and job.local_store_path() is not None
+
+    index.faults.error_rate = 0.0
+    assert resume_upload(retry_dead_letters=True, index=index)
+    assert finish_upload(config, UploadJob.open(config["upload_job_path"]), index=index)
+
+    published = ChunkCorpus.load(config["chunk_store_path"])
+    assert [published.chunk_id(i) for i in range(len(published))] == [records.chunk_id(i) for i in range(3)]
+    assert os.path.exists(os.path.join(config["chunk_store_path"], INDEX_META_FILE))
+    assert sorted(index.records["default"]) == ["sample#chunk_0", "sample#chunk_1", "sample#chunk_2"]
+    assert UploadJob.open(config["upload_job_path"]).local_store_path() is None
+
+
+def test_resumed_upload_builds_faq_answers_in_the_job_namespace(tmp_path, monkeypatch, corpus):
+    questions = tmp_path / "faq.txt"
+    questions.write_text("청약은 언제 철회할 수 있나요?\n", encoding="utf-8")
+    monkeypatch.setenv("FAQ_QUESTIONS_PATH", str(questions))
+    config = reload_settings().as_dict()
+    index = FakeIndex()
+
+    index.faults.error_rate = 1.0
+    store = ChunkCorpus.replace_namespace(None, corpus, "product-a")
+    assert not upload_to_pinecone(corpus, namespace="product-a", index=index, local_store=store)
+    index.faults.error_rate = 0.0
+    assert resume_upload(retry_dead_letters=True, index=index)
+
+    job = UploadJob.open(config["upload_job_path"])
+    assert finish_upload(config, job, index=index)
+    assert build_faq_after_upload(config, job, index=index, rag=build_fake_system())
+
+    answers = AnswerStore.load(config["answer_store_path"])
+    assert list(answers.by_question) == ["product-a"]
+    assert answers.get_for_question("청약은 언제 철회할 수 있나요?", ["product-a"])["source_ids"]
+
+
+def test_legacy_chunk_ids_are_deleted_after_reupload(corpus):
+    config = get_config()
+    index = FakeIndex()
+    index.upsert_records(namespace="default", records=[
+        {"id": f"chunk_{i}", "text": corpus.text(i)} for i in range(len(corpus))] + [
+        {"id": "chunk_notes#chunk_0", "text": "다른 문서"}])
+
+    legacy = legacy_chunk_ids("default", index=index)
+    assert legacy == {f"chunk_{i}" for i in range(len(corpus))}
+
+    stale_ids = stale_chunk_ids(corpus, legacy)
+    assert upload_to_pinecone(corpus, index=index, stale_ids=stale_ids, local_store=corpus.with_namespace("default"))
+    assert finish_upload(config, UploadJob.open(config["upload_job_path"]), index=index)
+
+    expected = ["chunk_notes#chunk_0"] + [corpus.chunk_id(i) for i in range(len(corpus))]
+    assert sorted(index.records["default"]) == sorted(expected)
@@ -0,0 +1,108 @@
+"""체크포인트 업로드 작업 테스트 (재개, dead-letter, 덮어쓰기 방지)"""
+
+import pytest
+
+from src.data.upload_job import SHARD_DIR, UnfinishedJobError, UploadJob
+from src.data.uploader import upload_to_pinecone
+from src.rag.fakes import FakeIndex, FakeServiceError
+from src.utils.resilience import Dependency
+
+
+def make_batches(count, prefix="chunk"):
+    for number in range(count):
+        yield [{"id": f"{prefix}_{number}", "text": f"본문 {number}"}]
+
+
+def make_guard():
+    # 재시도 없이 바로 실패를 돌려주는 보호 객체 (테스트 시간 단축)
+    return Dependency("test", rate=1000, max_concurrency=4, max_retries=0, failure_threshold=100)
+
+
+class FlakyUpsert:
+    """지정한 배치 번호(레코드 ID 기준)에서 실패하는 upsert"""
+
+    def __init__(self, failing_ids=(), stop_after=None):
+        self.failing_ids = set(failing_ids)
+        self.stop_after = stop_after
+        self.uploaded = []
+
+    def __call__(self, namespace, records):
+        if self.stop_after is not None and len(self.uploaded) >= self.stop_after:
+            raise KeyboardInterrupt
+        if records[0]["id"] in self.failing_ids:
+            raise FakeServiceError(500, "injected")
+        self.uploaded.append(records[0]["id"])
+
+
+def test_create_writes_shards_and_resumes_same_records(tmp_path):
+    path = str(tmp_path / "job")
+    job = UploadJob.create(path, make_batches(250), "index", "default", batches_per_shard=100)
+
+    assert job.total_batches == 250
+    assert job.info["shards"] == ["00000.jsonl", "00001.jsonl", "00002.jsonl"]
+    assert list(job.iter_batches([249])) == [(249, [{"id": "chunk_249", "text": "본문 249"}])]
+
+    again = UploadJob.create(path, make_batches(250), "index", "default", batches_per_shard=100)
+    assert again.info["fingerprint"] == job.info["fingerprint"]
+    assert again.info["created_at"] == job.info["created_at"]
+
+
+def test_interrupted_run_resumes_from_unacked_batches(tmp_path):
+    path = str(tmp_path / "job")
+    job = UploadJob.create(path, make_batches(5), "index", "default")
+    first = FlakyUpsert(stop_after=2)
+    with pytest.raises(KeyboardInterrupt):
+        job.run(first, make_guard())
+    assert first.uploaded == ["chunk_0", "chunk_1"]
+
+    resumed = UploadJob.create(path, make_batches(5), "index", "default")
+    second = FlakyUpsert()
+    stats = resumed.run(second, make_guard())
+
+    assert second.uploaded == ["chunk_2", "chunk_3", "chunk_4"]
+    assert stats["acked"] == 5 and stats["skipped"] == 2
+
+
+def test_failed_batches_go_to_dead_letters_and_can_be_retried(tmp_path):
+    job = UploadJob.create(str(tmp_path / "job"), make_batches(4), "index", "default")
+    stats = job.run(FlakyUpsert(failing_ids={"chunk_1"}), make_guard())
+
+    assert stats["failed"] == 1 and stats["acked"] == 3
+    assert list(job.dead_letters()) == [1]
+    assert "FakeServiceError" in job.dead_letters()[1]["error"]
+    assert job.pending() == []
+
+    retry = FlakyUpsert()
+    stats = job.run(retry, make_guard(), retry_dead_letters=True)
+    assert retry.uploaded == ["chunk_1"]
+    assert stats["acked"] == 4 and stats["dead_letters"] == 0
+
+
+def test_unfinished_job_is_not_replaced_without_restart(tmp_path):
+    path = str(tmp_path / "job")
+    job = UploadJob.create(path, make_batches(3), "index", "default")
+    job.run(FlakyUpsert(failing_ids={"chunk_2"}), make_guard())
+
+    with pytest.raises(UnfinishedJobError):
+        UploadJob.create(path, make_batches(2, prefix="other"), "index", "default")
+    assert UploadJob.open(path).info["fingerprint"] == job.info["fingerprint"]
+    assert list(UploadJob.open(path).dead_letters()) == [2]
+
+    restarted = UploadJob.create(path, make_batches(2, prefix="other"), "index", "default", resume=False)
+    assert restarted.total_batches == 2
+    assert restarted.dead_letters() == {}
+    assert sorted((tmp_path / "job" / SHARD_DIR).iterdir())[0].name == "00000.jsonl"
+
+
+def test_finished_job_is_replaced_by_new_records(tmp_path):
+    path = str(tmp_path / "job")
+    UploadJob.create(path, make_batches(2), "index", "default").run(FlakyUpsert(), make_guard())
+
+    job = UploadJob.create(path, make_batches(3, prefix="next"), "index", "default")
+    assert job.total_batches == 3 and job.acked() == set()
+
+
+def test_upload_to_pinecone_uploads_corpus_into_namespace(tmp_path, corpus):
+    index = FakeIndex()
+    assert upload_to_pinecone(corpus, namespace="product-a", job_path=str(tmp_path / "job"), index=index)
+    assert len(index.records["product-a"]) == len(corpus)
@@ -4,12 +4,18 @@ Data Upload Script
 데이터 업로드 스크립트
 
 사용법:
-    python upload_data.py [PDF_파일_경로]
+    python upload_data.py [PDF_파일_경로 ...] [--namespace NAMESPACE] [--skip-faq] [--restart]
+    python upload_data.py --resume | --retry-dead-letters
     
 예시:
     python upload_data.py ./docs/embeding_test_pdf.pdf
+    python upload_data.py ./docs/상품A.pdf ./docs/상품B.pdf
+    python upload_data.py --resume              # 중단된 업로드를 PDF 재처리 없이 이어서 실행
+    python upload_data.py --retry-dead-letters  # 실패한 배치만 다시 업로드
 """
 
+import argparse
+import re
 import sys
 import os
 from pathlib import Path
@@ -18,11 +24,154 @@ from pathlib import Path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-from src.data import ingest_pdf_to_pinecone, upload_to_pinecone
+from src.data import (ChunkCorpus, InvertedIndex, delete_from_pinecone, ingest_pdf_to_pinecone, list_chunk_ids,
+                      upload_to_pinecone, wait_for_namespace_count)
+from src.data.chunk_store import META_FILE
+from src.data.dedup import deduplicate_corpus
+from src.data.upload_job import UploadJob
+from src.data.uploader import resume_upload
 from src.utils.config import get_config, validate_config
+from src.utils.metrics import metrics
+from src.utils.tracing import span
+
+# 문서 ID가 없던 이전 청크 ID 형식 ("chunk_{n}"; 현재는 "{doc_id}#chunk_{n}")
+LEGACY_CHUNK_ID = re.compile(r"chunk_\d+")
+
+def parse_args():
+    """명령행 인자를 파싱합니다."""
+    parser = argparse.ArgumentParser(description="보험 약관 데이터 업로드")
+    parser.add_argument("pdf_paths", nargs="*", default=["./docs/embeding_test_pdf.pdf"],
+                        help="PDF 파일 경로 (여러 개면 문서 ID로 구분하여 함께 업로드)")
+    parser.add_argument("--namespace", default="default", help="업로드할 Pinecone 네임스페이스 (예: 상품별)")
+    parser.add_argument("--skip-faq", action="store_true", help="FAQ 답변 사전 생성 단계를 건너뜁니다")
+    parser.add_argument("--restart", action="store_true",
+                        help="기존 업로드 작업(끝나지 않은 다른 작업 포함)을 버리고 처음부터 다시 업로드합니다")
+    parser.add_argument("--resume", action="store_true",
+                        help="PDF를 다시 처리하지 않고 중단된 업로드 작업을 이어서 실행합니다")
+    parser.add_argument("--retry-dead-letters", action="store_true",
+                        help="업로드 작업에서 실패로 기록된 배치만 다시 업로드합니다")
+    return parser.parse_args()
+
+def merge_into_chunk_store(path, records, namespace):
+    """
+    기존 청크 저장소에서 namespace의 청크를 records로 바꾼 코퍼스와,
+    교체 전 namespace에 있던 청크 ID 집합을 반환합니다 (다른 네임스페이스 유지).
+    """
+    existing = None
+    if os.path.exists(os.path.join(path, META_FILE)):
+        try:
+            existing = ChunkCorpus.load(path)
+        except Exception as e:
+            print(f"⚠️ 기존 청크 저장소를 읽지 못해 새로 만듭니다: {e}")
+    
+    previous_ids = set()
+    if existing is not None:
+        previous_ids = {existing.chunk_id(i) for i in range(len(existing)) if existing.namespace(i) == namespace}
+    merged = ChunkCorpus.replace_namespace(existing, records, namespace)
+    if existing is not None:
+        # 병합 결과는 메모리에 복사되어 있으므로 저장 전에 기존 파일의 mmap을 닫습니다.
+        existing.close()
+    return merged, previous_ids
+
+def legacy_chunk_ids(namespace, index=None):
+    """
+    네임스페이스에 남아 있는 이전 형식(chunk_{n})의 청크 ID를 반환합니다. 로컬 저장소에 없는 ID도
+    인덱스에서 직접 찾으므로, 새 형식으로 다시 업로드하면 이전 레코드가 함께 지워집니다.
+    """
+    ids = list_chunk_ids(namespace, prefix="chunk_", index=index)
+    if ids is None:
+        print("⚠️ 이전 형식의 청크 ID를 조회하지 못했습니다. 남아 있으면 인덱스 반영 대기가 끝나지 않을 수 있습니다.")
+        return set()
+    return {chunk_id for chunk_id in ids if LEGACY_CHUNK_ID.fullmatch(chunk_id)}
+
+def stale_chunk_ids(records, previous_ids):
+    """
+    인덱스에서 지워야 할 청크 ID를 반환합니다: 이전 업로드에는 있었지만 이번에 만들지 않은 청크와
+    중복 제거로 다른 청크에 합쳐진 청크 (이전에 중복 제거 없이 올린 인덱스에 남아 있을 수 있음)
+    """
+    current = {records.chunk_id(i) for i in range(len(records))}
+    merged = {ref["id"] for i in range(len(records)) for ref in records.references(i)}
+    return sorted((set(previous_ids) | merged) - current)
+
+def publish_chunk_store(job, path):
+    """
+    업로드 작업에 함께 기록한 코퍼스를 로컬 청크 저장소(path)로 저장하고 역색인을 다시 만듭니다.
+    반영할 코퍼스가 없으면(이미 반영함) False를 반환합니다.
+    """
+    staged_path = job.local_store_path()
+    if staged_path is None:
+        return False
+    
+    store = ChunkCorpus.load(staged_path)
+    try:
+        store.save(path)
+        print(f"💾 청크 저장소 저장 완료: {path} "
+              f"(네임스페이스 {', '.join(store.namespaces)}; {len(store)}개 청크, {store.nbytes:,} bytes)")
+        
+        # 로컬 역색인 (조항/용어 정확 조회, 키워드 순위 융합용; 모든 네임스페이스 포함)
+        lexical_index = InvertedIndex.build(store)
+        lexical_index.save(path)
+        print(f"🔎 역색인 저장 완료: 용어 {len(lexical_index.terms):,}개 ({lexical_index.nbytes:,} bytes)")
+    finally:
+        store.close()
+    job.discard_local_store()
+    return True
+
+def finish_upload(config, job, index=None):
+    """
+    모든 배치가 확인된 업로드 작업을 마무리합니다: 로컬 청크 저장소/역색인을 반영하고,
+    작업에 기록한 이전/중복 청크를 인덱스에서 삭제합니다 (남아 있으면 같은 조항이 중복 검색됨).
+    삭제까지 끝나면 True를 반환합니다. 실패해도 작업에 남아 있으므로 --resume으로 다시 실행할 수 있습니다.
+    """
+    publish_chunk_store(job, config["chunk_store_path"])
+    
+    stale_ids = job.stale_ids
+    if not stale_ids:
+        return True
+    if delete_from_pinecone(stale_ids, index_name=job.info["index_name"], namespace=job.info["namespace"],
+                            index=index):
+        print(f"🗑️ 인덱스에서 이전/중복 청크 {len(stale_ids)}개 삭제")
+        return True
+    print(f"⚠️ 이전/중복 청크 {len(stale_ids)}개를 삭제하지 못했습니다. --resume으로 다시 실행하세요.")
+    return False
+
+def build_faq_answers(config, namespace, rag=None):
+    """FAQ 질문 목록의 답변을 namespace에서 미리 생성하여 답변 저장소에 저장합니다 (rag 기본값: 새 RAG 시스템)."""
+    from src.rag import InsuranceRAGSystem
+    from src.rag.faq import load_faq_questions, build_faq_store
+    
+    questions = load_faq_questions(config["faq_questions_path"])
+    if not questions:
+        print(f"⚠️ FAQ 질문 목록이 없습니다: {config['faq_questions_path']}")
+        return
+    
+    print(f"\n💡 FAQ 답변 사전 생성 ({len(questions)}개 질문, 네임스페이스 {namespace})...")
+    if rag is None:
+        rag = InsuranceRAGSystem()
+    stats = build_faq_store(rag, questions, namespace=namespace)
+    print(f"✅ FAQ 답변 저장 완료: 생성 {stats['built']}개, 재사용 {stats['reused']}개, 실패 {stats['failed']}개")
+    print(f"  - 저장 위치: {config['answer_store_path']}")
+
+def build_faq_after_upload(config, job, index=None, rag=None):
+    """
+    업로드 작업의 레코드가 인덱스에 반영될 때까지 기다린 뒤, 작업의 네임스페이스에서 FAQ 답변을
+    미리 생성합니다 (근거 청크가 바뀐 답변만 다시 생성). 업로드는 검색에 바로 반영되지 않으므로
+    레코드 수가 맞기 전에 만든 답변은 이전 청크를 근거로 할 수 있습니다. 생성했으면 True를 반환합니다.
+    """
+    namespace = job.info["namespace"]
+    print(f"\n⏳ 인덱스 반영 대기 (최대 {config['index_sync_timeout_seconds']:g}초)...")
+    if wait_for_namespace_count(job.info["total_records"], namespace=namespace, index_name=job.info["index_name"],
+                                index=index):
+        build_faq_answers(config, namespace, rag)
+        return True
+    print("⚠️ 인덱스에 아직 반영되지 않아 FAQ 답변 사전 생성을 건너뜁니다. "
+          "반영된 뒤 --resume으로 다시 실행하세요.")
+    return False
 
 def main():
     """메인 함수"""
+    args = parse_args()
+    config = get_config()
     try:
         # 설정 검증
         validate_config()
@@ -31,22 +180,32 @@ def main():
         print("📚 보험 약관 데이터 업로드 시스템")
         print("=" * 50)
         
-        # PDF 파일 경로 확인
-        if len(sys.argv) > 1:
-            pdf_path = sys.argv[1]
-        else:
-            pdf_path = "./docs/embeding_test_pdf.pdf"
+        # 체크포인트에서 이어서 업로드 (PDF 재처리 없음)
+        if args.resume or args.retry_dead_letters:
+            print(f"\n🔁 업로드 작업 재개: {config['upload_job_path']}")
+            success = resume_upload(retry_dead_letters=args.retry_dead_letters)
+            if success:
+                print("\n🎉 모든 배치가 업로드되었습니다!")
+                job = UploadJob.open(config["upload_job_path"])
+                # 이전 청크를 지우지 못했으면 레코드 수가 맞지 않으므로 FAQ 생성은 다음 --resume으로 미룹니다.
+                if finish_upload(config, job) and not args.skip_faq:
+                    build_faq_after_upload(config, job)
+            else:
+                print("\n💥 아직 업로드되지 않은 배치가 있습니다. 다시 --resume 하거나 --retry-dead-letters로 실패 배치를 재시도하세요.")
+            return success
         
-        if not os.path.exists(pdf_path):
-            print(f"❌ PDF 파일을 찾을 수 없습니다: {pdf_path}")
-            print("\n사용법: python upload_data.py [PDF_파일_경로]")
-            return False
+        # PDF 파일 경로 확인
+        for pdf_path in args.pdf_paths:
+            if not os.path.exists(pdf_path):
+                print(f"❌ PDF 파일을 찾을 수 없습니다: {pdf_path}")
+                print("\n사용법: python upload_data.py [PDF_파일_경로 ...]")
+                return False
         
-        print(f"📄 처리할 PDF 파일: {pdf_path}")
+        print(f"📄 처리할 PDF 파일: {', '.join(args.pdf_paths)}")
         print(f"🎯 대상 인덱스: {config['pinecone_index_name']}")
         
-        # PDF 데이터 처리
-        records = ingest_pdf_to_pinecone(pdf_path)
+        # PDF 데이터 처리 (문서 ID, 쪽 범위, 조항 메타데이터 포함)
+        records = ChunkCorpus.concat([ingest_pdf_to_pinecone(pdf_path) for pdf_path in args.pdf_paths])
         
         if not records:
             print("❌ 레코드 생성 실패")
@@ -54,22 +213,61 @@ def main():
         
         print(f"✅ {len(records)}개 레코드 생성 완료")
         
+        # 문서 전체에서 거의 같은 청크(반복되는 정의/분쟁 조항 등)는 한 번만 저장
+        dedup_report = None
+        if config["dedup_enabled"]:
+            records, dedup_report = deduplicate_corpus(
+                records,
+                threshold=config["dedup_threshold"],
+                batch_size=config["upload_batch_size"],
+                embedding_model=config["embedding_model"],
+            )
+            print(f"🧹 중복 청크 제거: {dedup_report['chunks_before']}개 → {dedup_report['chunks_after']}개 "
+                  f"({dedup_report['clusters']}개 묶음에서 {dedup_report['duplicates_removed']}개 제거)")
+            print(f"  - 인덱스 크기 절감(추정): {dedup_report['index_bytes_saved']:,} bytes "
+                  f"(본문 {dedup_report['text_bytes_saved']:,} bytes 포함)")
+            print(f"  - 업로드 배치 절감: {dedup_report['batches_saved']}개")
+        
+        # 컬럼형 청크 저장소 (검색 시 로컬 콘텐츠 조회에 사용)
+        # 저장소는 모든 네임스페이스가 공유하므로 이 네임스페이스의 청크만 교체합니다.
+        # 로컬 저장소와 역색인은 업로드가 모두 확인된 뒤에 반영하여 인덱스와 어긋나지 않게 하고,
+        # 지울 이전 청크 ID와 함께 업로드 작업에 기록해 두어 --resume에서도 같은 정리를 합니다.
+        store, previous_ids = merge_into_chunk_store(config["chunk_store_path"], records, args.namespace)
+        stale_ids = stale_chunk_ids(records, previous_ids | legacy_chunk_ids(args.namespace))
+        
         # Pinecone에 업로드
         print("\n🚀 Pinecone 업로드 시작...")
-        success = upload_to_pinecone(records)
+        # 체크포인트(UPLOAD_JOB_PATH)에 기록한 뒤 업로드; 같은 레코드의 작업이 있으면 이어서 실행
+        success = upload_to_pinecone(records, namespace=args.namespace, resume=not args.restart,
+                                     stale_ids=stale_ids, local_store=store)
         
         if success:
             print("\n🎉 모든 데이터가 성공적으로 업로드되었습니다!")
+            job = UploadJob.open(config["upload_job_path"])
+            finished = finish_upload(config, job)
             
             # 업로드 결과 요약
             print("\n📊 업로드 요약:")
+            print(f"  - 문서 수: {len(args.pdf_paths)}")
             print(f"  - 총 청크 수: {len(records)}")
             print(f"  - 인덱스 이름: {config['pinecone_index_name']}")
-            print(f"  - 네임스페이스: default")
+            print(f"  - 네임스페이스: {args.namespace}")
+            
+            # 이번 업로드의 배치당 평균 시간으로 중복 제거가 줄인 업로드 시간 추정
+            acked = metrics.get("upload.batches_acked")
+            if dedup_report and dedup_report["batches_saved"] and acked:
+                per_batch = metrics.get("upload.batch_seconds") / acked
+                print(f"  - 중복 제거로 절감한 업로드 시간(추정): {dedup_report['batches_saved'] * per_batch:.1f}초 "
+                      f"(배치당 평균 {per_batch:.2f}초)")
+            
+            # FAQ 답변 사전 생성 (이전 청크를 지우고 인덱스에 반영된 뒤)
+            if finished and not args.skip_faq:
+                build_faq_after_upload(config, job)
             
             return True
         else:
             print("\n💥 업로드 중 오류가 발생했습니다.")
+            print("   같은 명령을 다시 실행하거나 --resume으로 확인되지 않은 배치부터 이어서 올릴 수 있습니다.")
             return False
             
     except Exception as e:
@@ -80,5 +278,7 @@ def main():
         return False
 
 if __name__ == "__main__":
-    success = main()
+    # PDF 처리, 중복 제거, 색인, 업로드 단계를 하나의 추적으로 묶습니다.
+    with span("ingest.run", sampled=True):
+        success = main()
     sys.exit(0 if success else 1)